@@ -0,0 +1,135 @@
+"""
+Benchmark: aceites de propostas concorrentes (PropostaService.aceitar_proposta).
+
+Cria solicitações de tomadores entre poucos usuários (contas "quentes": as mesmas linhas de saldo
+disputadas por várias transações) e as aceita em paralelo, uma sessão por thread. Mede:
+  - aceites/s e latência por aceite (p50/p95/p99);
+  - comandos SQL e commits por aceite (ida e volta ao banco);
+  - erros por tipo (ex.: deadlock, saldo insuficiente).
+Ao final confere que a soma dos saldos não mudou e que cada negociação aceita tem um empréstimo.
+
+Uso (a partir de src/backend, com DATABASE_URL apontando para um banco de teste populado; o
+benchmark grava propostas, negociações, empréstimos e move saldo entre os usuários):
+    PYTHONPATH=src python benchmarks/bench_aceites.py --aceites 400 --threads 8 --usuarios 6
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, text
+
+from app.database.database import SessionLocal, engine
+from app.models.proposta import PropostaCreate
+from app.services.proposta import PropostaService
+
+
+contadores = threading.local()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _contar_comando(*_args):
+    contadores.comandos = getattr(contadores, "comandos", 0) + 1
+
+
+@event.listens_for(engine, "commit")
+def _contar_commit(*_args):
+    contadores.commits = getattr(contadores, "commits", 0) + 1
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+def criar_solicitacoes(usuarios, quantidade, valor, semente):
+    """Solicitações (proposta, investidor) entre pares de usuários distintos sorteados."""
+    rng = random.Random(semente)
+    db = SessionLocal()
+    try:
+        solicitacoes = []
+        for _ in range(quantidade):
+            tomador, investidor = rng.sample(usuarios, 2)
+            proposta = PropostaService.criar_proposta(db, PropostaCreate(
+                id_autor=tomador,
+                autor_tipo="tomador",
+                taxa_analisada="1.5-2.5",
+                taxa_sugerida="1.8-2.2",
+                prazo_meses=12,
+                tipo="inicial",
+                status="pendente",
+                valor=valor,
+                negociavel=True,
+                id_investidor_destino=investidor,
+            ))
+            solicitacoes.append((proposta.id, investidor))
+        return solicitacoes
+    finally:
+        db.close()
+
+
+def aceitar(solicitacao):
+    proposta_id, investidor = solicitacao
+    contadores.comandos = contadores.commits = 0
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        negociacao = PropostaService.aceitar_proposta(db, proposta_id, investidor, "investidor")
+        return time.perf_counter() - inicio, contadores.comandos, contadores.commits, None, negociacao.id
+    except Exception as exc:
+        db.rollback()
+        return time.perf_counter() - inicio, contadores.comandos, contadores.commits, type(exc).__name__, None
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aceites", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--usuarios", type=int, default=6, help="usuários envolvidos (menos = mais disputa)")
+    parser.add_argument("--valor", type=float, default=1.0, help="valor de cada empréstimo")
+    args = parser.parse_args()
+
+    with engine.connect() as conexao:
+        usuarios = list(conexao.execute(
+            text("SELECT id FROM usuarios ORDER BY id LIMIT :limite"), {"limite": args.usuarios}
+        ).scalars())
+        if len(usuarios) < 2:
+            raise SystemExit("São necessários pelo menos 2 usuários no banco.")
+        saldo_antes = conexao.execute(text("SELECT sum(saldo_cc) FROM usuarios")).scalar()
+
+    solicitacoes = criar_solicitacoes(usuarios, args.aceites, args.valor, semente=7)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        resultados = list(executor.map(aceitar, solicitacoes))
+    total = time.perf_counter() - inicio
+
+    sucessos = [r for r in resultados if r[3] is None]
+    erros = Counter(r[3] for r in resultados if r[3] is not None)
+    print(f"{len(resultados)} aceites entre {len(usuarios)} usuários, {args.threads} threads")
+    print(f"aceites/s: {len(sucessos) / total:,.1f} | erros: {dict(erros) or 0}")
+    if sucessos:
+        latencias = [r[0] * 1e3 for r in sucessos]
+        print(f"latência p50 {statistics.median(latencias):7.2f} ms | p95 {percentil(latencias, 0.95):7.2f} ms | "
+              f"p99 {percentil(latencias, 0.99):7.2f} ms")
+        print(f"por aceite: {statistics.mean(r[1] for r in sucessos):.1f} comandos SQL, "
+              f"{statistics.mean(r[2] for r in sucessos):.1f} commits")
+
+    with engine.connect() as conexao:
+        saldo_depois = conexao.execute(text("SELECT sum(saldo_cc) FROM usuarios")).scalar()
+        sem_emprestimo = conexao.execute(
+            text("SELECT count(*) FROM negociacoes n WHERE n.id = ANY(:ids) "
+                 "AND NOT EXISTS (SELECT 1 FROM emprestimos e WHERE e.id_negociacoes = n.id)"),
+            {"ids": [r[4] for r in sucessos]},
+        ).scalar()
+    print(f"soma dos saldos: {saldo_antes} -> {saldo_depois} | negociações aceitas sem empréstimo: {sem_emprestimo}")
+
+
+if __name__ == "__main__":
+    main()
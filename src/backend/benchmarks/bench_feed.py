@@ -0,0 +1,139 @@
+"""
+Benchmark: distribuição (fan-out) do feed de eventos SSE para muitas conexões.
+
+Abre N conexões no broker de app/services/feed_eventos.py (metade filtrando por perfil, metade por
+usuário), publica M eventos de uma thread (como os serviços, que rodam no threadpool) e mede:
+  - a vazão da publicação (a thread que publica não espera as conexões), em ritmo fixo ou em rajada;
+  - a latência da publicação até a mensagem sair da fila de cada conexão (p50/p95/p99);
+  - com ``--lentos``, conexões que consomem devagar: enchem a fila, recebem ``resync`` e não
+    atrasam as demais.
+
+Uso (a partir de src/backend; não precisa de banco nem de servidor):
+    PYTHONPATH=src python benchmarks/bench_feed.py --conexoes 1000 --eventos 2000 --taxa 2000 --lentos 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import threading
+import time
+
+from app.services.feed_eventos import EVENTO_RESYNC, PERFIS, FeedEventos
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+def publicar(feed, eventos, usuarios, taxa, instantes, fim):
+    rng = random.Random(7)
+    inicio = time.perf_counter()
+    for indice in range(eventos):
+        if taxa:
+            # Ritmo de ``taxa`` eventos/s (0 = rajada)
+            atraso = inicio + indice / taxa - time.perf_counter()
+            if atraso > 0:
+                time.sleep(atraso)
+        autor = rng.randrange(usuarios)
+        perfil = rng.choice(PERFIS)
+        # Os ids do broker novo são sequenciais a partir de 1 e só esta thread publica
+        instantes[indice + 1] = time.perf_counter()
+        feed.publicar(
+            "proposta_criada",
+            {"id_autor": autor, "autor_tipo": perfil, "valor": 1000.0, "prazo_meses": 12},
+            usuarios=(autor, rng.randrange(usuarios)),
+            perfis=(perfil,),
+        )
+    fim["publicacao"] = time.perf_counter() - inicio
+
+
+async def consumir(assinante, instantes, latencias, contagem, atraso, ativo):
+    async for lote in assinante.mensagens(keepalive=0.05, duracao=float("inf")):
+        if lote is None:
+            if not ativo.is_set() and not assinante.pendentes:
+                return
+            continue
+        recebido = time.perf_counter()
+        mensagens = lote.split("\n\n")[:-1]
+        for mensagem in mensagens:
+            if f"event: {EVENTO_RESYNC}" in mensagem:
+                contagem["resync"] += 1
+            else:
+                id_evento = int(mensagem.split("\n", 1)[0].rsplit(":", 1)[1])
+                latencias.append(recebido - instantes[id_evento])
+                contagem["entregues"] += 1
+        if atraso:
+            # Cliente lento: leva ``atraso`` segundos por mensagem
+            await asyncio.sleep(atraso * len(mensagens))
+
+
+async def executar(args):
+    feed = FeedEventos(tamanho_fila=args.fila, historico=args.eventos)
+    rng = random.Random(11)
+    instantes = {}
+    ativo = threading.Event()
+    ativo.set()
+
+    rapidos = {"latencias": [], "contagem": {"entregues": 0, "resync": 0}}
+    lentos = {"latencias": [], "contagem": {"entregues": 0, "resync": 0}}
+    tarefas = []
+    for indice in range(args.conexoes):
+        if indice % 2:
+            assinante = feed.assinar(perfil=rng.choice(PERFIS))
+        else:
+            assinante = feed.assinar(usuario_id=rng.randrange(args.usuarios))
+        lento = indice < args.lentos
+        grupo = lentos if lento else rapidos
+        tarefas.append(asyncio.create_task(consumir(
+            assinante, instantes, grupo["latencias"], grupo["contagem"], args.atraso_lento if lento else 0.0, ativo
+        )))
+
+    fim = {}
+    inicio = time.perf_counter()
+    publicador = threading.Thread(target=publicar, args=(feed, args.eventos, args.usuarios, args.taxa, instantes, fim))
+    publicador.start()
+    while publicador.is_alive():
+        await asyncio.sleep(0.01)
+    # Tempo para as conexões esvaziarem as filas
+    await asyncio.sleep(args.espera)
+    ativo.clear()
+    await asyncio.gather(*tarefas)
+    total = time.perf_counter() - inicio
+
+    estatisticas = feed.estatisticas()
+    print(f"{args.conexoes} conexões ({args.lentos} lentas), {args.eventos} eventos publicados, fila de {args.fila}")
+    print(f"publicação: {fim['publicacao'] * 1e3:.1f} ms ({args.eventos / fim['publicacao']:,.0f} eventos/s na thread, "
+          f"alvo {args.taxa:,.0f}/s)" if args.taxa else f"publicação em rajada: {fim['publicacao'] * 1e3:.1f} ms "
+          f"({args.eventos / fim['publicacao']:,.0f} eventos/s na thread)")
+    for nome, grupo in (("rápidas", rapidos), ("lentas", lentos)):
+        latencias = grupo["latencias"]
+        if not latencias:
+            continue
+        contagem = grupo["contagem"]
+        print(
+            f"conexões {nome:<8} entregues {contagem['entregues']:>9,} | resync {contagem['resync']:>5} | "
+            f"latência p50 {statistics.median(latencias) * 1e3:7.2f} ms | p95 {percentil(latencias, 0.95) * 1e3:7.2f} ms | "
+            f"p99 {percentil(latencias, 0.99) * 1e3:7.2f} ms"
+        )
+    print(f"entregas/s: {(rapidos['contagem']['entregues'] + lentos['contagem']['entregues']) / total:,.0f} "
+          f"| descartados por fila cheia: {estatisticas['descartados']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conexoes", type=int, default=1000)
+    parser.add_argument("--eventos", type=int, default=2000)
+    parser.add_argument("--taxa", type=float, default=2000, help="eventos/s publicados (0 = rajada)")
+    parser.add_argument("--usuarios", type=int, default=500, help="ids de usuário sorteados para autores e filtros")
+    parser.add_argument("--lentos", type=int, default=50, help="conexões que consomem devagar")
+    parser.add_argument("--atraso-lento", type=float, default=0.01, help="segundos por mensagem nas conexões lentas")
+    parser.add_argument("--fila", type=int, default=256, help="tamanho da fila de cada conexão")
+    parser.add_argument("--espera", type=float, default=0.5, help="segundos para esvaziar as filas no fim")
+    args = parser.parse_args()
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: inferência do modelo de crédito, sklearn x motor NumPy.
+
+Compara, com os artefatos treinados:
+  - uma linha: ``pd.DataFrame([analise])`` + ``scaler.transform`` + ``predict_proba`` (caminho antigo)
+    contra ``MotorLogisticoNumpy.probabilidade``;
+  - N linhas: o mesmo em lote;
+e confere que a maior diferença entre as probabilidades fica dentro da tolerância.
+
+Uso (a partir de src/backend; não precisa de banco):
+    PYTHONPATH=src python benchmarks/bench_inferencia.py --repeticoes 2000 --linhas 1000
+"""
+
+import argparse
+import os
+import statistics
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model.model_analise_credito import FEATURE_COLUMNS
+from model.model_numpy import TOLERANCIA, MotorLogisticoNumpy, amostra_validacao
+
+
+DIRETORIO_MODELO = os.path.join(os.path.dirname(__file__), "..", "src", "model")
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def resumo(nome, tempos):
+    tempos_us = sorted(t * 1e6 for t in tempos)
+    p95 = tempos_us[int(len(tempos_us) * 0.95) - 1] if len(tempos_us) > 1 else tempos_us[0]
+    print(f"{nome:<22} média {statistics.mean(tempos_us):10.1f} µs | p50 {statistics.median(tempos_us):10.1f} µs | p95 {p95:10.1f} µs")
+    return statistics.median(tempos_us)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--linhas", type=int, default=1000, help="tamanho do lote na comparação em lote")
+    parser.add_argument("--modelo", default=os.path.join(DIRETORIO_MODELO, "model_credit.joblib"))
+    parser.add_argument("--scaler", default=os.path.join(DIRETORIO_MODELO, "scaler_credit.joblib"))
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", category=UserWarning)
+    model = joblib.load(args.modelo)
+    scaler = joblib.load(args.scaler)
+    motor = MotorLogisticoNumpy.de_sklearn(model, scaler, FEATURE_COLUMNS)
+
+    X = amostra_validacao(scaler, FEATURE_COLUMNS, linhas=max(args.linhas, 1), semente=7)
+    diferenca = motor.validar(model, scaler, X)
+    print(f"maior diferença sklearn x NumPy em {len(X)} linhas: {diferenca:.2e} (tolerância {TOLERANCIA:.0e})")
+
+    analise = dict(zip(FEATURE_COLUMNS, X[0].tolist()))
+
+    def sklearn_linha():
+        return model.predict_proba(scaler.transform(pd.DataFrame([analise])))[0][1]
+
+    def numpy_linha():
+        return motor.probabilidade(analise)
+
+    assert abs(sklearn_linha() - numpy_linha()) <= TOLERANCIA
+
+    df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+
+    def sklearn_lote():
+        return model.predict_proba(scaler.transform(df))[:, 1]
+
+    def numpy_lote():
+        return motor.probabilidades(df.to_numpy(dtype=float))
+
+    for funcao in (sklearn_linha, numpy_linha, sklearn_lote, numpy_lote):
+        medir(funcao, 20)  # aquecimento
+
+    print(f"uma linha ({args.repeticoes} repetições):")
+    antigo = resumo("  sklearn + DataFrame", medir(sklearn_linha, args.repeticoes))
+    novo = resumo("  NumPy", medir(numpy_linha, args.repeticoes))
+    print(f"  ganho p50: {antigo / novo:.1f}x")
+
+    repeticoes_lote = max(1, args.repeticoes // 20)
+    print(f"{len(X)} linhas ({repeticoes_lote} repetições):")
+    antigo = resumo("  sklearn", medir(sklearn_lote, repeticoes_lote))
+    novo = resumo("  NumPy", medir(numpy_lote, repeticoes_lote))
+    print(f"  ganho p50: {antigo / novo:.1f}x")
+    assert np.allclose(sklearn_lote(), numpy_lote(), rtol=0, atol=TOLERANCIA)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: ranking de diversidade das recomendações para investidores, laço Python x pool NumPy.
+
+Gera um pool sintético de propostas abertas e uma carteira e compara:
+  - pontuar cada proposta em Python e ordenar o pool inteiro (caminho antigo, sem o banco);
+  - ``pontuar`` + ``top_k`` de app/services/ranking_propostas.py nos modos "exata" e "distancia";
+  - a segunda página (filtro do cursor + top-k);
+e confere que a página do modo "exata" é a mesma do laço Python.
+
+Uso (a partir de src/backend; não precisa de banco):
+    PYTHONPATH=src python benchmarks/bench_ranking.py --propostas 100000 --limite 50
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.resumo_carteira import ResumoCarteira, arredondar_taxa
+from app.services.ranking_propostas import Candidatos, pontuar, top_k
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def resumo(nome, tempos):
+    tempos_ms = sorted(t * 1e3 for t in tempos)
+    p95 = tempos_ms[int(len(tempos_ms) * 0.95) - 1] if len(tempos_ms) > 1 else tempos_ms[0]
+    print(f"{nome:<26} média {statistics.mean(tempos_ms):9.2f} ms | p50 {statistics.median(tempos_ms):9.2f} ms | p95 {p95:9.2f} ms")
+    return statistics.median(tempos_ms)
+
+
+def gerar_linhas(quantidade, semente):
+    """Linhas (id, valor, prazo, taxa_min, taxa_max, criado_em) com valores repetidos, como no feed real."""
+    rng = np.random.default_rng(semente)
+    inicio = datetime(2025, 1, 1)
+    valores = rng.choice(np.arange(1000, 50001, 500), quantidade).astype(float)
+    prazos = rng.choice([6, 12, 18, 24, 36, 48], quantidade)
+    taxas_min = np.round(rng.uniform(0.8, 2.5, quantidade), 1)
+    taxas_max = np.round(taxas_min + rng.uniform(0.2, 1.5, quantidade), 1)
+    segundos = rng.integers(0, 300 * 86400, quantidade)
+    return [
+        (
+            i + 1,
+            float(valores[i]),
+            int(prazos[i]),
+            arredondar_taxa(taxas_min[i]),
+            arredondar_taxa(taxas_max[i]),
+            inicio + timedelta(seconds=int(segundos[i])),
+        )
+        for i in range(quantidade)
+    ]
+
+
+def ranking_python(linhas, carteira, limite):
+    """Mesma regra do modo "exata", proposta a proposta (pontos em meios pontos)."""
+
+    def pontos(linha):
+        _, valor, prazo, taxa_min, taxa_max, _ = linha
+        return (
+            2 * (valor not in carteira.valores)
+            + 2 * (prazo not in carteira.prazos)
+            + (taxa_min not in carteira.taxas)
+            + (taxa_max not in carteira.taxas)
+        )
+
+    ordenadas = sorted(linhas, key=lambda linha: (pontos(linha), linha[5], linha[0]), reverse=True)
+    return [linha[0] for linha in ordenadas[:limite]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--propostas", type=int, default=100000)
+    parser.add_argument("--carteira", type=int, default=40, help="propostas na carteira do investidor")
+    parser.add_argument("--limite", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.propostas, semente=7)
+    candidatos = Candidatos.de_linhas(linhas)
+    carteira = ResumoCarteira().com((linha[1], linha[2], linha[3], linha[4]) for linha in gerar_linhas(args.carteira, semente=11))
+    print(f"{len(candidatos)} propostas abertas, carteira com {len(carteira.valores)} valores, "
+          f"{len(carteira.prazos)} prazos e {len(carteira.taxas)} taxas distintos")
+
+    def pagina(modo, apos=None):
+        pontos = pontuar(candidatos, carteira, modo)
+        return pontos, top_k(candidatos, pontos, args.limite + 1, apos)
+
+    pontos, indices = pagina("exata")
+    esperado = ranking_python(linhas, carteira, args.limite)
+    assert candidatos.ids[indices[: args.limite]].tolist() == esperado, "ranking NumPy diverge do laço Python"
+
+    ultimo = indices[args.limite - 1]
+    apos = (float(pontos[ultimo]), int(candidatos.criado_em[ultimo]), int(candidatos.ids[ultimo]))
+    segunda = top_k(candidatos, pontos, args.limite, apos)
+    assert not set(segunda.tolist()) & set(indices[: args.limite].tolist())
+
+    repeticoes_python = max(1, args.repeticoes // 10)
+    print(f"primeira página de {args.limite}:")
+    antigo = resumo("  laço Python + sort", medir(lambda: ranking_python(linhas, carteira, args.limite), repeticoes_python))
+    novo = resumo("  NumPy exata", medir(lambda: pagina("exata"), args.repeticoes))
+    resumo("  NumPy distancia", medir(lambda: pagina("distancia"), args.repeticoes))
+    print(f"  ganho p50 (exata): {antigo / novo:.1f}x")
+    print("segunda página (cursor):")
+    resumo("  NumPy exata", medir(lambda: pagina("exata", apos), args.repeticoes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: consultas ao Serasa contra o stub local (``serasa_stub.py``).
+
+Compara, para o mesmo conjunto de CPFs (com repetições, como num lote de recálculo):
+  - ingênuo: uma requisição sequencial por CPF, abrindo conexão nova a cada chamada;
+  - cliente, cache frio: ``ClienteSerasa.consultar_lote`` (keep-alive, concorrência limitada, CPFs deduplicados);
+  - cliente, cache quente: a mesma chamada de novo (só cache);
+e mostra como o circuit breaker corta as chamadas quando o bureau está fora.
+
+Uso (a partir de src/backend; não precisa de banco):
+    PYTHONPATH=src python benchmarks/bench_serasa.py --cpfs 200 --latencia-ms 20
+"""
+
+import argparse
+import random
+import time
+
+import requests
+
+from app.services.cache import CacheTTL
+from app.services.serasa import CircuitBreaker, ClienteSerasa, SerasaIndisponivelError
+from serasa_stub import iniciar_stub
+
+
+def cronometrar(nome, funcao, servidor):
+    antes = servidor.requisicoes
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<24} {duracao * 1000:9.1f} ms | {servidor.requisicoes - antes:5d} requisições ao bureau")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cpfs", type=int, default=200, help="quantidade de CPFs no lote (com repetições)")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    args = parser.parse_args()
+
+    servidor, url = iniciar_stub(latencia_ms=args.latencia_ms)
+    random.seed(42)
+    distintos = [f"{random.randrange(10 ** 11):011d}" for _ in range(max(1, args.cpfs * 3 // 4))]
+    cpfs = [random.choice(distintos) for _ in range(args.cpfs)]
+
+    def ingenuo():
+        return {cpf: requests.post(f"{url}/score", json={"cpf": cpf}, timeout=(1, 2)).json()["score"] for cpf in cpfs}
+
+    cliente = ClienteSerasa(url, concorrencia=args.concorrencia, cache=CacheTTL(ttl=600))
+    print(f"{len(cpfs)} CPFs ({len(set(cpfs))} distintos), latência do stub {args.latencia_ms} ms")
+    esperado = cronometrar("ingênuo (sequencial)", ingenuo, servidor)
+    frio = cronometrar("cliente, cache frio", lambda: cliente.consultar_lote(cpfs), servidor)
+    quente = cronometrar("cliente, cache quente", lambda: cliente.consultar_lote(cpfs), servidor)
+    assert frio == esperado and quente == esperado, "scores divergentes entre os caminhos"
+    print(f"cache: {cliente.cache.estatisticas()}")
+    cliente.fechar()
+
+    # Bureau fora do ar: após algumas falhas o circuito abre e as demais chamadas falham na hora
+    servidor.shutdown()
+    servidor.server_close()
+    fora = ClienteSerasa(url, concorrencia=args.concorrencia, breaker=CircuitBreaker(limite_falhas=5, tempo_aberto=30))
+    inicio = time.perf_counter()
+    falhas = 0
+    for cpf in distintos[:50]:
+        try:
+            fora.consultar(cpf)
+        except SerasaIndisponivelError:
+            falhas += 1
+    print(f"bureau fora do ar: {falhas} falhas em {(time.perf_counter() - inicio) * 1000:.1f} ms (circuito {fora.breaker.estado})")
+    fora.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Servidor local que imita a API de score do Serasa, para testes e benchmarks do cliente.
+
+``POST /score`` com ``{"cpf": "..."}`` responde ``{"score": int}`` após ``--latencia-ms``; o score é
+determinístico por CPF. Com ``--taxa-erro`` uma fração das respostas é 503.
+
+Uso (a partir de src/backend):
+    python benchmarks/serasa_stub.py --porta 8089 --latencia-ms 50
+    SERASA_API_URL=http://127.0.0.1:8089 uvicorn ...
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubSerasaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho)
+        servidor = self.server
+        with servidor.lock:
+            servidor.requisicoes += 1
+
+        if self.path.rstrip("/") != "/score":
+            self._responder(404, {"erro": "rota não encontrada"})
+            return
+        try:
+            cpf = str(json.loads(corpo)["cpf"])
+        except (ValueError, KeyError, TypeError):
+            self._responder(400, {"erro": "cpf obrigatório"})
+            return
+
+        time.sleep(servidor.latencia)
+        if servidor.taxa_erro and random.random() < servidor.taxa_erro:
+            self._responder(503, {"erro": "indisponível"})
+            return
+
+        digest = int(hashlib.sha256(cpf.encode()).hexdigest(), 16)
+        self._responder(200, {"cpf": cpf, "score": 300 + digest % 601})
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_stub(porta: int = 0, latencia_ms: float = 50.0, taxa_erro: float = 0.0):
+    """Sobe o stub em uma thread daemon e retorna ``(servidor, url_base)``; ``porta=0`` escolhe uma livre."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), StubSerasaHandler)
+    servidor.daemon_threads = True
+    servidor.latencia = latencia_ms / 1000
+    servidor.taxa_erro = taxa_erro
+    servidor.requisicoes = 0
+    servidor.lock = threading.Lock()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor, url = iniciar_stub(args.porta, args.latencia_ms, args.taxa_erro)
+    print(f"Stub do Serasa em {url} (latência {args.latencia_ms} ms, erro {args.taxa_erro:.0%})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ from fastapi import APIRouter, Depends, status, Body
 from app.models.usuario import UsuarioCreate
 
 from fastapi import HTTPException, Body
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
 import os
 from app.services.blockchain import (
     compile_contract_only,
@@ -29,23 +31,34 @@ from app.models.negociacao import NegociacaoCreate, NegociacaoResponse, Negociac
 
 # Imports para Proposta
 from app.services.proposta import PropostaService
+from app.services.concorrencia import ConflitoConcorrenciaError
 from app.models.proposta import PropostaCreate, PropostaResponse 
 
 # Imports para Usuários, Scores e Métricas
 from app.services.usuario import UsuarioService
 from app.services.score_credito import ScoreCreditoService
+from app.services.job_recalculo import STATUS_ATIVOS, JobRecalculoService
 from app.services.metricas import MetricasInvestidorService
+from app.services.serasa import SerasaIndisponivelError
 from app.models.usuario import UsuarioResponse
-from app.models.score import ScoreCreditoResponse, ScoreDetalhadoResponse
+from app.models.job_recalculo import JobRecalculoResponse
+from app.models.score import ModeloCreditoInfoResponse, ScoreCreditoResponse, ScoreDetalhadoResponse
+from model.model_analise_credito import registry as model_registry
 from app.models.metricas_investidor import MetricasInvestidorResponse
 
 # Imports para Recomendação de Taxa
-from app.services.calculo_taxas_juros import taxa_analisada
+from app.services.calculo_taxas_juros import taxa_analisada, taxa_analisada_lote
+from app.services.cache_taxas import cache_taxas
+from app.services.paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_PADRAO
+
+# Imports para o feed de eventos
+from app.services.feed_eventos import DURACAO_MAXIMA, INTERVALO_KEEPALIVE, PERFIS as PERFIS_FEED, feed_eventos
 from fastapi import HTTPException
 from app.services.emprestimo import EmprestimoService
 from app.models.emprestimo import EmprestimoResponse
+from app.models.evento_negociacao import EventoNegociacaoResponse
 from datetime import datetime
-from typing import Literal
+from typing import List, Literal, Optional
 
 
 # -- ROTEADOR GERAL --
@@ -59,11 +72,37 @@ class IniciarNegociacaoRequest(BaseModel):
 class AceitarPropostaRequest(BaseModel):
     usuario_id: int
     perfil: Literal["investidor", "tomador"]
+    # Versão da proposta lida pelo cliente (opcional): 409 se ela mudou desde então
+    versao: Optional[int] = None
 
 
 class RecusarPropostaRequest(BaseModel):
     usuario_id: int
     perfil: Literal["investidor", "tomador"]
+    versao: Optional[int] = None
+
+
+# Limite de combinações por chamada de POST /recomendacao/taxa/lote
+MAX_COTACOES_LOTE = 2500
+
+
+class CotacaoTaxa(BaseModel):
+    valor: float
+    prazo: int
+    score: int
+
+
+class GradeCotacaoTaxa(BaseModel):
+    valores: List[float]
+    prazos: List[int]
+    scores: List[int]
+
+
+class CotacaoTaxaLoteRequest(BaseModel):
+    user_id: int
+    tipo: str = "tomador"
+    cotacoes: List[CotacaoTaxa] = []
+    grade: Optional[GradeCotacaoTaxa] = None
 
 @router.put("/negociacoes/{negociacao_id}", response_model=NegociacaoResponse, tags=["Negociações"])
 def atualizar_negociacao_endpoint(
@@ -80,6 +119,8 @@ def atualizar_negociacao_endpoint(
         if not negociacao:
             raise HTTPException(status_code=404, detail="Negociação não encontrada")
         return negociacao
+    except ConflitoConcorrenciaError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -93,30 +134,84 @@ def obter_negociacao_por_id_endpoint(
         raise HTTPException(status_code=404, detail="Negociação não encontrada")
     return negociacao
 
+@router.get("/negociacoes/{negociacao_id}/eventos", response_model=list[EventoNegociacaoResponse], tags=["Negociações"])
+def listar_eventos_negociacao_endpoint(
+    negociacao_id: int,
+    db: Session = Depends(get_db)
+):
+    """Histórico da negociação (log de eventos), do mais antigo ao mais recente."""
+    return NegociacaoService.listar_eventos(db, negociacao_id)
+
 @router.get("/negociacoes", response_model=list[NegociacaoResponse], tags=["Negociações"])
 def listar_negociacoes_endpoint(
+    response: Response,
     status: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+    limite: int | None = None,
+    cursor: str | None = None,
     db: Session = Depends(get_db)
 ):
-    return NegociacaoService.listar_negociacoes(db, status=status)
+    """
+    Lista negociações das mais recentemente atualizadas para as mais antigas, filtrando por status e
+    por data de atualização (``desde`` inclusive, ``ate`` exclusive). Com ``limite``, retorna até
+    ``limite`` negociações e o cursor da próxima página no cabeçalho X-Proximo-Cursor; sem ele, todas.
+    """
+    try:
+        negociacoes, proximo_cursor = NegociacaoService.listar_negociacoes(
+            db, status=status, desde=desde, ate=ate, limite=limite, cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if proximo_cursor:
+        response.headers[CABECALHO_PROXIMO_CURSOR] = proximo_cursor
+    return negociacoes
 
 
 @router.get("/negociacoes/tomador/{tomador_id}", response_model=list[NegociacaoResponse], tags=["Negociações"])
 def listar_negociacoes_tomador_endpoint(
     tomador_id: int,
+    response: Response,
     status: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+    limite: int | None = None,
+    cursor: str | None = None,
     db: Session = Depends(get_db)
 ):
-    return NegociacaoService.listar_por_tomador(db, tomador_id, status=status)
+    """Negociações do tomador, com os mesmos filtros e paginação de ``GET /negociacoes``."""
+    try:
+        negociacoes, proximo_cursor = NegociacaoService.listar_por_tomador(
+            db, tomador_id, status=status, desde=desde, ate=ate, limite=limite, cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if proximo_cursor:
+        response.headers[CABECALHO_PROXIMO_CURSOR] = proximo_cursor
+    return negociacoes
 
 
 @router.get("/negociacoes/investidor/{investidor_id}", response_model=list[NegociacaoResponse], tags=["Negociações"])
 def listar_negociacoes_investidor_endpoint(
     investidor_id: int,
+    response: Response,
     status: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+    limite: int | None = None,
+    cursor: str | None = None,
     db: Session = Depends(get_db)
 ):
-    return NegociacaoService.listar_por_investidor(db, investidor_id, status=status)
+    """Negociações do investidor, com os mesmos filtros e paginação de ``GET /negociacoes``."""
+    try:
+        negociacoes, proximo_cursor = NegociacaoService.listar_por_investidor(
+            db, investidor_id, status=status, desde=desde, ate=ate, limite=limite, cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if proximo_cursor:
+        response.headers[CABECALHO_PROXIMO_CURSOR] = proximo_cursor
+    return negociacoes
 
 # --- ENDPOINTS DE PROPOSTA ---
 @router.post("/propostas", response_model=PropostaResponse, status_code=status.HTTP_201_CREATED, tags=["Propostas"])
@@ -124,7 +219,10 @@ def criar_proposta_endpoint(
     data: PropostaCreate,
     db: Session = Depends(get_db)
 ):
-    return PropostaService.criar_proposta(db, data)
+    try:
+        return PropostaService.criar_proposta(db, data)
+    except ConflitoConcorrenciaError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
 
 
 @router.post(
@@ -145,6 +243,8 @@ def iniciar_negociacao_para_proposta_endpoint(
             tomador_id=payload.tomador_id,
         )
         return negociacao
+    except ConflitoConcorrenciaError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
@@ -165,8 +265,11 @@ def aceitar_proposta_endpoint(
             proposta_id=proposta_id,
             usuario_id=payload.usuario_id,
             perfil=payload.perfil,
+            versao=payload.versao,
         )
         return negociacao
+    except ConflitoConcorrenciaError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
@@ -187,8 +290,11 @@ def recusar_proposta_endpoint(
             proposta_id=proposta_id,
             usuario_id=payload.usuario_id,
             perfil=payload.perfil,
+            versao=payload.versao,
         )
         return negociacao
+    except ConflitoConcorrenciaError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
@@ -211,49 +317,133 @@ def obter_proposta_por_id_endpoint(
     return proposta
     
 
-# Novo endpoint: Score final (modelo + Serasa)
+@router.get("/eventos", tags=["Eventos"])
+async def feed_eventos_endpoint(
+    request: Request,
+    usuario_id: int | None = None,
+    perfil: str | None = None,
+):
+    """
+    Fluxo Server-Sent Events com os eventos de propostas (``proposta_criada``, ``proposta_aceita``,
+    ``proposta_recusada``) e negociações (``negociacao_atualizada``) filtrados por usuário e/ou perfil.
+    Um evento ``resync`` indica que o cliente perdeu eventos e deve reler as listagens. A conexão é
+    encerrada periodicamente; reconexões com o cabeçalho Last-Event-ID recebem os eventos perdidos.
+    """
+    if perfil is not None and perfil not in PERFIS_FEED:
+        raise HTTPException(status_code=400, detail="perfil deve ser 'investidor' ou 'tomador'")
+    ultimo_id = request.headers.get("last-event-id")
+
+    async def gerar_eventos():
+        assinante = feed_eventos.assinar(usuario_id=usuario_id, perfil=perfil, ultimo_id=ultimo_id)
+        try:
+            yield "retry: 3000\n\n"
+            async for mensagem in assinante.mensagens(INTERVALO_KEEPALIVE, DURACAO_MAXIMA):
+                # Sem eventos no intervalo: comentário para manter a conexão (e proxies) abertos
+                yield mensagem if mensagem is not None else ": keepalive\n\n"
+        finally:
+            feed_eventos.cancelar(assinante)
+
+    return StreamingResponse(
+        gerar_eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-@router.post("/score/{user_id}", response_model=ScoreDetalhadoResponse, tags=["Scores"])
-def calcular_score_final_usuario(user_id: int, db: Session = Depends(get_db)):
-    try:
-        resultado = ScoreCreditoService.calcular_score_usuario(db, user_id)
-    except FileNotFoundError as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
-    except ValueError as exc:
-        raise HTTPException(status_code=404, detail=str(exc))
 
-    score_response = ScoreCreditoResponse.model_validate(resultado["score"])
+@router.get("/eventos/estatisticas", tags=["Eventos"])
+def estatisticas_feed_eventos_endpoint():
+    """Conexões abertas, eventos publicados e descartes por fila cheia do feed deste worker."""
+    return feed_eventos.estatisticas()
 
+
+def _score_detalhado(resultado: dict) -> ScoreDetalhadoResponse:
     return ScoreDetalhadoResponse(
-        score=score_response,
+        score=ScoreCreditoResponse.model_validate(resultado["score"]),
         score_modelo=resultado["score_modelo"],
         score_serasa=resultado["score_serasa"],
         prob_default=resultado["prob_default"],
         analise=resultado["analise"],
+        versao_modelo=resultado.get("versao_modelo"),
+        reaproveitado=resultado.get("reaproveitado", False),
     )
 
 
-@router.post("/score/recalcular", response_model=list[ScoreDetalhadoResponse], tags=["Scores"])
-def recalcular_scores(db: Session = Depends(get_db)):
+@router.post(
+    "/score/recalcular",
+    response_model=JobRecalculoResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Scores"],
+)
+def recalcular_scores(
+    tamanho_lote: int | None = None,
+    particoes: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """Agenda o recálculo de todos os scores em segundo plano; acompanhe por GET /score/recalcular/{job_id}."""
+    if (tamanho_lote is not None and tamanho_lote < 1) or (particoes is not None and particoes < 1):
+        raise HTTPException(status_code=400, detail="tamanho_lote e particoes devem ser positivos")
+    job = JobRecalculoService.criar_job(db, tamanho_lote=tamanho_lote, particoes=particoes)
+    if job.status in STATUS_ATIVOS:
+        JobRecalculoService.iniciar(job.id)
+    return JobRecalculoService.obter_status(db, job.id)
+
+
+@router.post("/score/recalcular/stream", tags=["Scores"])
+def recalcular_scores_stream(tamanho_lote: int | None = None):
+    """
+    Recalcula todos os scores de forma síncrona, respondendo em NDJSON: uma linha
+    (``ScoreDetalhadoResponse``) por usuário, enviada assim que o lote do usuário é gravado.
+    """
+    if tamanho_lote is not None and tamanho_lote < 1:
+        raise HTTPException(status_code=400, detail="tamanho_lote deve ser positivo")
+
+    def gerar_linhas():
+        try:
+            for item in ScoreCreditoService.recalcular_em_fluxo(tamanho_lote=tamanho_lote):
+                yield _score_detalhado(item).model_dump_json() + "\n"
+        except Exception as exc:
+            # O status 200 já foi enviado: o erro vai como última linha do fluxo
+            yield json.dumps({"erro": str(exc)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
+
+
+@router.get("/score/recalcular/{job_id}", response_model=JobRecalculoResponse, tags=["Scores"])
+def obter_job_recalculo(job_id: int, db: Session = Depends(get_db)):
+    """Status, progresso, vazão e falhas de um job de recálculo."""
+    job = JobRecalculoService.obter_status(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de recálculo não encontrado")
+    return job
+
+
+# Novo endpoint: Score final (modelo + Serasa)
+
+@router.post("/score/{user_id}", response_model=ScoreDetalhadoResponse, tags=["Scores"])
+def calcular_score_final_usuario(user_id: int, force: bool = False, db: Session = Depends(get_db)):
+    """
+    Score final do usuário. Se as entradas não mudaram desde o último cálculo, devolve o score
+    gravado (``reaproveitado=true``); ``force=true`` recalcula sempre.
+    """
     try:
-        resultados = ScoreCreditoService.recalcular_todos(db)
+        resultado = ScoreCreditoService.calcular_score_usuario(db, user_id, force=force)
     except FileNotFoundError as exc:
         raise HTTPException(status_code=500, detail=str(exc))
+    except SerasaIndisponivelError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+    return _score_detalhado(resultado)
 
-    resposta = []
-    for item in resultados:
-        score_response = ScoreCreditoResponse.model_validate(item["score"])
-        resposta.append(
-            ScoreDetalhadoResponse(
-                score=score_response,
-                score_modelo=item["score_modelo"],
-                score_serasa=item["score_serasa"],
-                prob_default=item["prob_default"],
-                analise=item["analise"],
-            ),
-        )
 
-    return resposta
+@router.get("/score/modelo", response_model=ModeloCreditoInfoResponse, tags=["Scores"])
+def obter_versao_modelo_endpoint():
+    """Retorna a versão dos artefatos do modelo de crédito carregados neste worker."""
+    try:
+        return model_registry.info()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
 
 @router.get("/recomendacao/taxa", tags=["Recomendação"])
 def recomendar_taxa_endpoint(
@@ -271,20 +461,62 @@ def recomendar_taxa_endpoint(
     resultado = taxa_analisada(db, user_id, valor, prazo, score, tipo)
     return resultado
 
+@router.get("/recomendacao/taxa/cache", tags=["Recomendação"])
+def estatisticas_cache_taxa_endpoint():
+    """Acertos, falhas, invalidações e ocupação do cache de recomendação de taxa deste worker."""
+    return cache_taxas.estatisticas()
+
+@router.post("/recomendacao/taxa/lote", tags=["Recomendação"])
+def recomendar_taxa_lote_endpoint(
+    payload: CotacaoTaxaLoteRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Recomenda a faixa de taxa para várias combinações de uma vez: a lista ``cotacoes`` seguida de todas
+    as combinações de ``grade`` (valores x prazos x scores). Cada item da resposta repete valor, prazo e
+    score e traz os mesmos campos de GET /recomendacao/taxa, na ordem das combinações.
+    """
+    grade = payload.grade
+    total = len(payload.cotacoes)
+    if grade is not None:
+        total += len(grade.valores) * len(grade.prazos) * len(grade.scores)
+    if total > MAX_COTACOES_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_COTACOES_LOTE} combinações por chamada")
+
+    cotacoes = [(c.valor, c.prazo, c.score) for c in payload.cotacoes]
+    if grade is not None:
+        cotacoes.extend((valor, prazo, score) for valor in grade.valores for prazo in grade.prazos for score in grade.scores)
+    return taxa_analisada_lote(db, payload.user_id, cotacoes, payload.tipo)
+
 @router.get("/internal/recommendations/solicitacoes/{user_id}", tags=["Recomendação"])
 def get_recomendacoes_endpoint(
     user_id: int,
     perfil: str,
+    response: Response,
+    limite: int = LIMITE_PADRAO,
+    cursor: str | None = None,
+    diversidade: str = "exata",
     db: Session = Depends(get_db)
 ):
     """
     Endpoint para retornar lista de propostas recomendadas, ordenadas por compatibilidade/diversidade.
+    Retorna até ``limite`` propostas; o cursor da próxima página vem no cabeçalho X-Proximo-Cursor.
+    Para investidores, ``diversidade`` escolhe a pontuação: "exata" (valores fora da carteira) ou
+    "distancia" (proporcional à distância até a carteira).
     """
-    propostas = PropostaService.get_propostas_recomendadas(
-        db=db,
-        user_id=user_id,
-        perfil=perfil
-    )
+    try:
+        propostas, proximo_cursor = PropostaService.get_propostas_recomendadas(
+            db=db,
+            user_id=user_id,
+            perfil=perfil,
+            limite=limite,
+            cursor=cursor,
+            diversidade=diversidade,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if proximo_cursor:
+        response.headers[CABECALHO_PROXIMO_CURSOR] = proximo_cursor
     return propostas
 
 
@@ -4,7 +4,7 @@ CREATE TABLE usuarios (
     id SERIAL PRIMARY KEY,
     nome varchar(160) NOT NULL,
     email varchar(160) NOT NULL UNIQUE,
-    cpf varchar(20) NOT NULL,
+    cpf varchar(20) NOT NULL UNIQUE,
     saldo_cc numeric NOT NULL DEFAULT 0,
     endereco varchar(255),
     renda_mensal numeric,
@@ -21,6 +21,9 @@ CREATE TABLE scores_credito (
     atualizado_em timestamp NOT NULL,
     analise jsonb,
     risco numeric,
+    fingerprint varchar(64),
+    score_modelo numeric,
+    score_serasa numeric,
     CONSTRAINT fk_scores_usuario
         FOREIGN KEY (id_usuarios)
         REFERENCES usuarios(id)
@@ -45,6 +48,7 @@ CREATE TABLE negociacoes (
     hash_onchain varchar,
     contrato_tx_hash varchar,
     assinado_em timestamp,
+    versao int NOT NULL DEFAULT 1,
     CONSTRAINT fk_neg_tomador
         FOREIGN KEY (id_tomador)
         REFERENCES usuarios(id)
@@ -57,7 +61,10 @@ CREATE TABLE negociacoes (
         ON DELETE NO ACTION
 );
 
-CREATE INDEX ix_neg_tomador_status ON negociacoes (id_tomador, status);
+CREATE INDEX ix_negociacoes_status_criado ON negociacoes (status, criado_em);
+CREATE INDEX ix_negociacoes_atualizado ON negociacoes (atualizado_em, id);
+CREATE INDEX ix_negociacoes_tomador_status_atualizado ON negociacoes (id_tomador, status, atualizado_em, id);
+CREATE INDEX ix_negociacoes_investidor_status_atualizado ON negociacoes (id_investidor, status, atualizado_em, id);
 
 CREATE TABLE metricas_investidor (
     id SERIAL PRIMARY KEY,
@@ -92,6 +99,9 @@ CREATE TABLE propostas (
     valor numeric,
     justificativa varchar(255),
     negociavel boolean NOT NULL,
+    taxa_min double precision,
+    taxa_max double precision,
+    versao int NOT NULL DEFAULT 1,
     CONSTRAINT fk_prop_negociacoes
         FOREIGN KEY (id_negociacoes)
         REFERENCES negociacoes(id)
@@ -105,7 +115,9 @@ CREATE TABLE propostas (
 );
 
 CREATE INDEX ix_prop_neg_data ON propostas (id_negociacoes, criado_em);
-CREATE INDEX ix_prop_autor ON propostas (id_autor);
+CREATE INDEX ix_propostas_autor_tipo_status ON propostas (id_autor, autor_tipo, status);
+CREATE INDEX ix_propostas_taxa_faixa ON propostas (taxa_min, taxa_max);
+CREATE INDEX ix_propostas_tipo_status_criado ON propostas (tipo, status, criado_em, id);
 
 CREATE TABLE emprestimos (
     id SERIAL PRIMARY KEY,
@@ -117,7 +129,7 @@ CREATE TABLE emprestimos (
     prazo int NOT NULL,
     parcela numeric NOT NULL,
     contrato_tx_hash varchar NOT NULL,
-    hash_onchain varchar NOT NULL,
+    hash_onchain varchar,
     antecipacao_onchain varchar,
     contrato_antecipacao_hash varchar,
     status varchar(20) NOT NULL DEFAULT 'ativo',
@@ -146,3 +158,144 @@ CREATE TABLE emprestimos (
         ON DELETE CASCADE
 );
 
+
+-- Agregados incrementais das features de crédito (mantidos pelo backend a cada mudança de negociação/proposta)
+CREATE TABLE features_credito (
+    id_usuarios INT PRIMARY KEY,
+    emprestimos_contratados int NOT NULL DEFAULT 0,
+    emprestimos_quitados int NOT NULL DEFAULT 0,
+    emprestimos_inadimplentes int NOT NULL DEFAULT 0,
+    soma_assinatura_epoch double precision NOT NULL DEFAULT 0,
+    soma_taxa_juros double precision NOT NULL DEFAULT 0,
+    qtd_taxa_juros int NOT NULL DEFAULT 0,
+    soma_prazo double precision NOT NULL DEFAULT 0,
+    qtd_prazo int NOT NULL DEFAULT 0,
+    divida_aberta double precision NOT NULL DEFAULT 0,
+    propostas_realizadas int NOT NULL DEFAULT 0,
+    propostas_aceitas int NOT NULL DEFAULT 0,
+    primeira_proposta_em timestamp,
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_features_usuario
+        FOREIGN KEY (id_usuarios)
+        REFERENCES usuarios(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE TABLE features_credito_negociacoes (
+    id_negociacoes INT PRIMARY KEY,
+    id_tomador INT NOT NULL,
+    emprestimos_contratados int NOT NULL DEFAULT 0,
+    emprestimos_quitados int NOT NULL DEFAULT 0,
+    emprestimos_inadimplentes int NOT NULL DEFAULT 0,
+    soma_assinatura_epoch double precision NOT NULL DEFAULT 0,
+    soma_taxa_juros double precision NOT NULL DEFAULT 0,
+    qtd_taxa_juros int NOT NULL DEFAULT 0,
+    soma_prazo double precision NOT NULL DEFAULT 0,
+    qtd_prazo int NOT NULL DEFAULT 0,
+    divida_aberta double precision NOT NULL DEFAULT 0,
+    propostas_realizadas int NOT NULL DEFAULT 0,
+    propostas_aceitas int NOT NULL DEFAULT 0,
+    primeira_proposta_em timestamp,
+    CONSTRAINT fk_features_negociacao
+        FOREIGN KEY (id_negociacoes)
+        REFERENCES negociacoes(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE INDEX ix_features_neg_tomador ON features_credito_negociacoes (id_tomador);
+
+
+-- Jobs assíncronos de recálculo de score (POST /score/recalcular) e suas partições por faixa de id
+CREATE TABLE jobs_recalculo_score (
+    id SERIAL PRIMARY KEY,
+    status varchar(20) NOT NULL DEFAULT 'pendente',
+    tamanho_lote int NOT NULL,
+    total_usuarios int NOT NULL DEFAULT 0,
+    erro text,
+    criado_em timestamp NOT NULL DEFAULT now(),
+    iniciado_em timestamp,
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    concluido_em timestamp
+);
+
+CREATE TABLE jobs_recalculo_score_particoes (
+    id SERIAL PRIMARY KEY,
+    id_job INT NOT NULL,
+    id_inicio INT NOT NULL,
+    id_fim INT NOT NULL,
+    total_usuarios int NOT NULL DEFAULT 0,
+    ultimo_id INT,
+    processados int NOT NULL DEFAULT 0,
+    falhas jsonb NOT NULL DEFAULT '[]',
+    status varchar(20) NOT NULL DEFAULT 'pendente',
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_particao_job
+        FOREIGN KEY (id_job)
+        REFERENCES jobs_recalculo_score(id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX ix_jobs_recalculo_particoes_job ON jobs_recalculo_score_particoes (id_job);
+
+
+-- Faixa de taxas aceitas (p10-p90) por decil de score do tomador (lida por GET /recomendacao/taxa).
+-- Atualizada a cada aceite de proposta e reconstruída periodicamente pelo backend.
+CREATE TABLE faixas_mercado (
+    faixa varchar(20) PRIMARY KEY,
+    score_min double precision NOT NULL,
+    score_max double precision NOT NULL,
+    taxa_min double precision,
+    taxa_max double precision,
+    quantidade int NOT NULL DEFAULT 0,
+    atualizado_em timestamp NOT NULL DEFAULT now()
+);
+
+-- Distribuição das taxas aceitas por decil de score (taxa em centésimos de ponto percentual),
+-- mantida incrementalmente a cada aceite; as faixas_mercado são calculadas a partir dela.
+CREATE TABLE histogramas_taxas (
+    decil smallint NOT NULL,
+    taxa_centesimos int NOT NULL,
+    quantidade int NOT NULL DEFAULT 0,
+    PRIMARY KEY (decil, taxa_centesimos)
+);
+
+-- Resumo da carteira de cada investidor (valores, prazos e taxas distintos das propostas que criou
+-- ou aceitou), usado pela recomendação; atualizado pelo backend a cada proposta criada ou aceita.
+CREATE TABLE perfis_carteira (
+    id_usuarios INT PRIMARY KEY,
+    valores jsonb NOT NULL DEFAULT '[]',
+    prazos jsonb NOT NULL DEFAULT '[]',
+    taxas jsonb NOT NULL DEFAULT '[]',
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_perfis_carteira_usuario
+        FOREIGN KEY (id_usuarios)
+        REFERENCES usuarios(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+-- Log de eventos das negociações (outbox): gravado na mesma transação de cada mudança de estado e
+-- entregue aos consumidores assíncronos (app/services/eventos_negociacao.py). Só recebe INSERT.
+CREATE TABLE eventos_negociacao (
+    id BIGSERIAL PRIMARY KEY,
+    id_transacao xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    id_negociacoes INT NOT NULL,
+    tipo varchar(40) NOT NULL,
+    dados jsonb NOT NULL DEFAULT '{}',
+    criado_em timestamp NOT NULL DEFAULT now()
+);
+
+CREATE INDEX ix_eventos_negociacao_transacao ON eventos_negociacao (id_transacao, id);
+CREATE INDEX ix_eventos_negociacao_negociacao ON eventos_negociacao (id_negociacoes, id);
+
+-- Posição de cada consumidor no log de eventos (último evento processado)
+CREATE TABLE consumidores_eventos (
+    consumidor varchar(40) PRIMARY KEY,
+    ultima_transacao xid8 NOT NULL DEFAULT '0',
+    ultimo_id bigint NOT NULL DEFAULT 0,
+    tentativas int NOT NULL DEFAULT 0,
+    ultimo_erro text,
+    atualizado_em timestamp NOT NULL DEFAULT now()
+);
@@ -21,8 +21,9 @@ engine = create_engine(
 # Cria uma classe Base para os modelos declarativos
 Base = declarative_base()
 
-# Configura a sessão de banco de dados
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Configura a sessão de banco de dados. Os objetos continuam carregados depois do commit: o que foi
+# gravado (e os ids devolvidos pelo INSERT ... RETURNING) já está neles, sem um novo SELECT por objeto
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 def get_db() -> Generator[Session, None, None]:
     """Retorna uma sessão de DB para a requisição e a fecha no final."""
@@ -0,0 +1,120 @@
+-- Tabelas mantidas pelo backend (features de crédito, jobs de recálculo, faixas de mercado e perfis de
+-- carteira), que em bancos antigos eram criadas pelo create_all da API. Bancos novos já as recebem de
+-- create_database.sql.
+
+-- Agregados incrementais das features de crédito (mantidos pelo backend a cada mudança de negociação/proposta)
+CREATE TABLE IF NOT EXISTS features_credito (
+    id_usuarios INT PRIMARY KEY,
+    emprestimos_contratados int NOT NULL DEFAULT 0,
+    emprestimos_quitados int NOT NULL DEFAULT 0,
+    emprestimos_inadimplentes int NOT NULL DEFAULT 0,
+    soma_assinatura_epoch double precision NOT NULL DEFAULT 0,
+    soma_taxa_juros double precision NOT NULL DEFAULT 0,
+    qtd_taxa_juros int NOT NULL DEFAULT 0,
+    soma_prazo double precision NOT NULL DEFAULT 0,
+    qtd_prazo int NOT NULL DEFAULT 0,
+    divida_aberta double precision NOT NULL DEFAULT 0,
+    propostas_realizadas int NOT NULL DEFAULT 0,
+    propostas_aceitas int NOT NULL DEFAULT 0,
+    primeira_proposta_em timestamp,
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_features_usuario
+        FOREIGN KEY (id_usuarios)
+        REFERENCES usuarios(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS features_credito_negociacoes (
+    id_negociacoes INT PRIMARY KEY,
+    id_tomador INT NOT NULL,
+    emprestimos_contratados int NOT NULL DEFAULT 0,
+    emprestimos_quitados int NOT NULL DEFAULT 0,
+    emprestimos_inadimplentes int NOT NULL DEFAULT 0,
+    soma_assinatura_epoch double precision NOT NULL DEFAULT 0,
+    soma_taxa_juros double precision NOT NULL DEFAULT 0,
+    qtd_taxa_juros int NOT NULL DEFAULT 0,
+    soma_prazo double precision NOT NULL DEFAULT 0,
+    qtd_prazo int NOT NULL DEFAULT 0,
+    divida_aberta double precision NOT NULL DEFAULT 0,
+    propostas_realizadas int NOT NULL DEFAULT 0,
+    propostas_aceitas int NOT NULL DEFAULT 0,
+    primeira_proposta_em timestamp,
+    CONSTRAINT fk_features_negociacao
+        FOREIGN KEY (id_negociacoes)
+        REFERENCES negociacoes(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS ix_features_neg_tomador ON features_credito_negociacoes (id_tomador);
+
+
+-- Jobs assíncronos de recálculo de score (POST /score/recalcular) e suas partições por faixa de id
+CREATE TABLE IF NOT EXISTS jobs_recalculo_score (
+    id SERIAL PRIMARY KEY,
+    status varchar(20) NOT NULL DEFAULT 'pendente',
+    tamanho_lote int NOT NULL,
+    total_usuarios int NOT NULL DEFAULT 0,
+    erro text,
+    criado_em timestamp NOT NULL DEFAULT now(),
+    iniciado_em timestamp,
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    concluido_em timestamp
+);
+
+CREATE TABLE IF NOT EXISTS jobs_recalculo_score_particoes (
+    id SERIAL PRIMARY KEY,
+    id_job INT NOT NULL,
+    id_inicio INT NOT NULL,
+    id_fim INT NOT NULL,
+    total_usuarios int NOT NULL DEFAULT 0,
+    ultimo_id INT,
+    processados int NOT NULL DEFAULT 0,
+    falhas jsonb NOT NULL DEFAULT '[]',
+    status varchar(20) NOT NULL DEFAULT 'pendente',
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_particao_job
+        FOREIGN KEY (id_job)
+        REFERENCES jobs_recalculo_score(id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_recalculo_particoes_job ON jobs_recalculo_score_particoes (id_job);
+
+
+-- Faixa de taxas aceitas (p10-p90) por decil de score do tomador (lida por GET /recomendacao/taxa).
+-- Atualizada a cada aceite de proposta e reconstruída periodicamente pelo backend.
+CREATE TABLE IF NOT EXISTS faixas_mercado (
+    faixa varchar(20) PRIMARY KEY,
+    score_min double precision NOT NULL,
+    score_max double precision NOT NULL,
+    taxa_min double precision,
+    taxa_max double precision,
+    quantidade int NOT NULL DEFAULT 0,
+    atualizado_em timestamp NOT NULL DEFAULT now()
+);
+
+-- Distribuição das taxas aceitas por decil de score (taxa em centésimos de ponto percentual),
+-- mantida incrementalmente a cada aceite; as faixas_mercado são calculadas a partir dela.
+CREATE TABLE IF NOT EXISTS histogramas_taxas (
+    decil smallint NOT NULL,
+    taxa_centesimos int NOT NULL,
+    quantidade int NOT NULL DEFAULT 0,
+    PRIMARY KEY (decil, taxa_centesimos)
+);
+
+-- Resumo da carteira de cada investidor (valores, prazos e taxas distintos das propostas que criou
+-- ou aceitou), usado pela recomendação; atualizado pelo backend a cada proposta criada ou aceita.
+CREATE TABLE IF NOT EXISTS perfis_carteira (
+    id_usuarios INT PRIMARY KEY,
+    valores jsonb NOT NULL DEFAULT '[]',
+    prazos jsonb NOT NULL DEFAULT '[]',
+    taxas jsonb NOT NULL DEFAULT '[]',
+    atualizado_em timestamp NOT NULL DEFAULT now(),
+    CONSTRAINT fk_perfis_carteira_usuario
+        FOREIGN KEY (id_usuarios)
+        REFERENCES usuarios(id)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
@@ -0,0 +1,5 @@
+-- Bancos criados antes do fingerprint em scores_credito: adiciona as colunas usadas para
+-- reaproveitar o score quando as entradas não mudaram (POST /score/{user_id}).
+ALTER TABLE scores_credito ADD COLUMN IF NOT EXISTS fingerprint varchar(64);
+ALTER TABLE scores_credito ADD COLUMN IF NOT EXISTS score_modelo numeric;
+ALTER TABLE scores_credito ADD COLUMN IF NOT EXISTS score_serasa numeric;
@@ -0,0 +1,22 @@
+-- Faixa numérica de propostas.taxa_sugerida ('12-15' -> 12 e 15, '10' -> 10 e 10, aceita '%' e vírgula
+-- decimal). A API mantém as colunas ao gravar; esta migração cria as colunas em bancos antigos e preenche
+-- as linhas inseridas direto no banco (inclusive os dados iniciais).
+ALTER TABLE propostas ADD COLUMN IF NOT EXISTS taxa_min double precision;
+ALTER TABLE propostas ADD COLUMN IF NOT EXISTS taxa_max double precision;
+
+UPDATE propostas p
+SET taxa_min = f.m[1]::double precision,
+    taxa_max = COALESCE(f.m[2], f.m[1])::double precision
+FROM (
+    SELECT id,
+           regexp_match(
+               replace(replace(taxa_sugerida, ',', '.'), '%', ''),
+               '^\s*(\d+(?:\.\d*)?|\.\d+)\s*(?:-\s*(\d+(?:\.\d*)?|\.\d+)\s*)?$'
+           ) AS m
+    FROM propostas
+    WHERE taxa_min IS NULL
+) f
+WHERE f.id = p.id
+    AND f.m IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_propostas_taxa_faixa ON propostas (taxa_min, taxa_max);
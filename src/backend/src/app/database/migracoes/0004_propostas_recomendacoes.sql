@@ -0,0 +1,3 @@
+-- Índice do feed de recomendações (GET /internal/recommendations/solicitacoes/{user_id}): filtro por
+-- tipo e status, ordenado pela data de criação, com o id como desempate do cursor.
+CREATE INDEX IF NOT EXISTS ix_propostas_tipo_status_criado ON propostas (tipo, status, criado_em, id);
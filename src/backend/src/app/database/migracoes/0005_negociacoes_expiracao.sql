@@ -0,0 +1,3 @@
+-- Índice da tarefa de expiração (NegociacaoService.expirar_vencidas): negociações em aberto
+-- (em_negociacao, pendente, em_andamento) criadas há 48h ou mais.
+CREATE INDEX IF NOT EXISTS ix_negociacoes_status_criado ON negociacoes (status, criado_em);
@@ -0,0 +1,8 @@
+-- Índices das listagens paginadas de negociações (GET /negociacoes, /negociacoes/tomador/{id} e
+-- /negociacoes/investidor/{id}): ordenação por (atualizado_em, id), com filtro de status por usuário.
+CREATE INDEX IF NOT EXISTS ix_negociacoes_atualizado ON negociacoes (atualizado_em, id);
+CREATE INDEX IF NOT EXISTS ix_negociacoes_tomador_status_atualizado ON negociacoes (id_tomador, status, atualizado_em, id);
+CREATE INDEX IF NOT EXISTS ix_negociacoes_investidor_status_atualizado ON negociacoes (id_investidor, status, atualizado_em, id);
+
+-- Coberto pelo prefixo de ix_negociacoes_tomador_status_atualizado
+DROP INDEX IF EXISTS ix_neg_tomador_status;
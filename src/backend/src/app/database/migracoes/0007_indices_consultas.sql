@@ -0,0 +1,13 @@
+-- Índices das consultas quentes que o create_all e o create_database.sql não tinham em comum, criados
+-- com CONCURRENTLY (sem bloquear escritas): a migração roda fora de transação, um comando por vez.
+--   - usuarios_cpf_key: unicidade do CPF declarada no modelo; o índice vira a constraint (mesmo nome da
+--     do create_all) sem nova varredura da tabela;
+--   - ix_prop_neg_data: propostas por negociação (montar_analise_usuario, histórico da negociação);
+--   - ix_propostas_autor_tipo_status: taxa_analisada e propostas por autor; substitui ix_prop_autor,
+--     que vira prefixo dele.
+-- O filtro por (tipo, status) das recomendações já é coberto por ix_propostas_tipo_status_criado.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS usuarios_cpf_key ON usuarios (cpf);
+DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'usuarios_cpf_key') THEN ALTER TABLE usuarios ADD CONSTRAINT usuarios_cpf_key UNIQUE USING INDEX usuarios_cpf_key; END IF; END $$;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prop_neg_data ON propostas (id_negociacoes, criado_em);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_propostas_autor_tipo_status ON propostas (id_autor, autor_tipo, status);
+DROP INDEX CONCURRENTLY IF EXISTS ix_prop_autor;
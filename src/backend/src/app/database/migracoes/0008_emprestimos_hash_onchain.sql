@@ -0,0 +1,3 @@
+-- O empréstimo é criado no aceite, junto com a negociação, antes do registro do contrato na
+-- blockchain: hash_onchain fica vazio até lá.
+ALTER TABLE emprestimos ALTER COLUMN hash_onchain DROP NOT NULL;
@@ -0,0 +1,4 @@
+-- Versão de negociações e propostas para a concorrência otimista (app/services/concorrencia.py).
+-- Coluna com default constante: só altera o catálogo, sem reescrever as tabelas.
+ALTER TABLE negociacoes ADD COLUMN IF NOT EXISTS versao int NOT NULL DEFAULT 1;
+ALTER TABLE propostas ADD COLUMN IF NOT EXISTS versao int NOT NULL DEFAULT 1;
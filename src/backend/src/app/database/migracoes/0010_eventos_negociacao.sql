@@ -0,0 +1,24 @@
+-- Log de eventos das negociações (outbox) e posição dos consumidores (app/services/eventos_negociacao.py).
+-- id_transacao (xid8, PostgreSQL 13+) é o id da transação que gravou o evento: os consumidores leem em
+-- ordem de (id_transacao, id) e só até o xmin do snapshot, para não pular eventos de transações que
+-- ainda não fizeram commit.
+CREATE TABLE IF NOT EXISTS eventos_negociacao (
+    id BIGSERIAL PRIMARY KEY,
+    id_transacao xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    id_negociacoes INT NOT NULL,
+    tipo varchar(40) NOT NULL,
+    dados jsonb NOT NULL DEFAULT '{}',
+    criado_em timestamp NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_eventos_negociacao_transacao ON eventos_negociacao (id_transacao, id);
+CREATE INDEX IF NOT EXISTS ix_eventos_negociacao_negociacao ON eventos_negociacao (id_negociacoes, id);
+
+CREATE TABLE IF NOT EXISTS consumidores_eventos (
+    consumidor varchar(40) PRIMARY KEY,
+    ultima_transacao xid8 NOT NULL DEFAULT '0',
+    ultimo_id bigint NOT NULL DEFAULT 0,
+    tentativas int NOT NULL DEFAULT 0,
+    ultimo_erro text,
+    atualizado_em timestamp NOT NULL DEFAULT now()
+);
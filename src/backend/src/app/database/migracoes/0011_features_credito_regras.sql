@@ -0,0 +1,6 @@
+-- Regras das features de crédito unificadas com as do treino (app/services/features_credito.py): a
+-- dívida em aberto passa a somar os empréstimos assinados e ainda não encerrados, e as propostas aceitas
+-- passam a contar só com a negociação assinada. As contribuições gravadas com a regra anterior são
+-- descartadas; a primeira leitura de cada usuário as recria a partir do histórico.
+DELETE FROM features_credito_negociacoes;
+DELETE FROM features_credito;
@@ -0,0 +1,14 @@
+-- Índices de 0003 a 0006 (faixa de taxa das propostas, feed de recomendações, expiração e listagens de
+-- negociações) com CONCURRENTLY, sem bloquear escritas: a migração roda fora de transação, um comando por
+-- vez. Onde as migrações anteriores já os criaram, só confere que existem e estão válidos (o executor
+-- remove e recria um índice deixado inválido por uma criação interrompida). As migrações já aplicadas não
+-- são alteradas.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_propostas_taxa_faixa ON propostas (taxa_min, taxa_max);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_propostas_tipo_status_criado ON propostas (tipo, status, criado_em, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_negociacoes_status_criado ON negociacoes (status, criado_em);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_negociacoes_atualizado ON negociacoes (atualizado_em, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_negociacoes_tomador_status_atualizado ON negociacoes (id_tomador, status, atualizado_em, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_negociacoes_investidor_status_atualizado ON negociacoes (id_investidor, status, atualizado_em, id);
+
+-- Coberto pelo prefixo de ix_negociacoes_tomador_status_atualizado
+DROP INDEX CONCURRENTLY IF EXISTS ix_neg_tomador_status;
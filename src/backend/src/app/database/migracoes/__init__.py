@@ -0,0 +1,275 @@
+"""
+Migrações versionadas do esquema do banco.
+
+Cada arquivo ``NNNN_descricao.sql`` desta pasta é uma migração; as pendentes são aplicadas em ordem de
+versão (NNNN) e registradas em ``schema_migracoes`` (versão, nome, checksum, data e duração). Regras:
+  - banco vazio (sem a tabela ``usuarios``): antes das migrações aplica o esquema base,
+    ``app/database/create_database.sql``;
+  - cada migração roda numa transação, junto com o seu registro em ``schema_migracoes``;
+  - migrações com ``CONCURRENTLY`` (índices criados sem bloquear escritas) rodam fora de transação, um
+    comando por vez (separados por ``;`` fora de strings, comentários e blocos ``$$``). Precisam ser
+    idempotentes (``IF NOT EXISTS``/``IF EXISTS``): se forem interrompidas, rodam de novo do início, e um
+    índice deixado inválido pela execução interrompida é removido e recriado;
+  - ``lock_timeout`` (``MIGRACOES_LOCK_TIMEOUT``) faz uma migração falhar em vez de enfileirar as
+    consultas da API atrás de um lock de tabela;
+  - um advisory lock serializa as instâncias: workers que sobem juntos esperam o primeiro terminar e
+    encontram as migrações já aplicadas.
+
+A API aplica as pendentes na inicialização (desligável com ``MIGRACOES_NA_INICIALIZACAO=0``, para
+aplicar antes do deploy). Por linha de comando: ``python -m app.database.migracoes [--status]``.
+Mudanças de esquema entram como nova migração e também em ``create_database.sql`` (esquema de bancos
+novos) e nos modelos.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+logger = logging.getLogger(__name__)
+
+PASTA_MIGRACOES = Path(__file__).resolve().parent
+ESQUEMA_BASE = PASTA_MIGRACOES.parent / "create_database.sql"
+
+LOCK_TIMEOUT = os.getenv("MIGRACOES_LOCK_TIMEOUT", "10s")
+
+# Chave do advisory lock que serializa a aplicação das migrações
+_CHAVE_LOCK = 5022
+_ESPERA_LOCK = 0.5
+
+_NOME_ARQUIVO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_CONCURRENTLY = re.compile(r"\bCONCURRENTLY\b", re.IGNORECASE)
+_ASPAS_DOLAR = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+_INDICE_CONCORRENTE = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE
+)
+
+_TABELA_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migracoes (
+    versao int PRIMARY KEY,
+    nome varchar(120) NOT NULL,
+    checksum varchar(64) NOT NULL,
+    aplicada_em timestamp NOT NULL DEFAULT now(),
+    duracao_ms int NOT NULL
+)
+"""
+
+
+@dataclass(frozen=True)
+class Migracao:
+    versao: int
+    nome: str
+    caminho: Path
+
+    @property
+    def sql(self) -> str:
+        return self.caminho.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.caminho.read_bytes()).hexdigest()
+
+    @property
+    def sem_transacao(self) -> bool:
+        return bool(_CONCURRENTLY.search(_sem_comentarios(self.sql)))
+
+
+def _sem_comentarios(sql: str) -> str:
+    return "\n".join(linha for linha in sql.splitlines() if not linha.lstrip().startswith("--"))
+
+
+def dividir_comandos(sql: str) -> List[str]:
+    """
+    Comandos de um arquivo SQL, separados por ``;``. Um ``;`` dentro de string, identificador entre aspas,
+    comentário ou corpo entre aspas de dólar (``$$ ... $$``, ``$tag$ ... $tag$``, como em blocos ``DO`` e
+    funções) não separa comandos. Trechos só com comentários são descartados. Levanta ValueError se uma
+    string, comentário ou aspas de dólar não for fechado.
+    """
+    comandos: List[str] = []
+    inicio = posicao = 0
+    tem_comando = False  # já há um token (fora de comentários) no comando corrente, que começa em inicio
+    while posicao < len(sql):
+        caractere = sql[posicao]
+        if sql.startswith("--", posicao):
+            fim = sql.find("\n", posicao)
+            posicao = len(sql) if fim < 0 else fim + 1
+            continue
+        if sql.startswith("/*", posicao):
+            posicao = _fechamento(sql, "*/", posicao + 2, "comentário")
+            continue
+        if caractere == ";":
+            if tem_comando:
+                comandos.append(sql[inicio:posicao].rstrip())
+            tem_comando = False
+            posicao += 1
+            continue
+
+        marcador = _ASPAS_DOLAR.match(sql, posicao) if caractere == "$" else None
+        if caractere in "'\"":
+            fim = _fechamento(sql, caractere, posicao + 1, "string")
+            # Aspas duplicadas são a aspa escapada: a string continua
+            while sql.startswith(caractere, fim):
+                fim = _fechamento(sql, caractere, fim + 1, "string")
+        elif marcador and not _continua_identificador(sql, posicao):
+            fim = _fechamento(sql, marcador.group(), marcador.end(), "aspas de dólar")
+        else:
+            fim = posicao + 1
+        if not tem_comando and not caractere.isspace():
+            inicio, tem_comando = posicao, True
+        posicao = fim
+    if tem_comando:
+        comandos.append(sql[inicio:].rstrip())
+    return comandos
+
+
+def _fechamento(sql: str, fecho: str, posicao: int, trecho: str) -> int:
+    """Posição logo depois de ``fecho`` a partir de ``posicao``; ValueError se não houver."""
+    fim = sql.find(fecho, posicao)
+    if fim < 0:
+        raise ValueError(f"SQL inválido: {trecho} sem fechamento")
+    return fim + len(fecho)
+
+
+def _continua_identificador(sql: str, posicao: int) -> bool:
+    # Em abc$def$ o $ faz parte do identificador, não abre aspas de dólar
+    return posicao > 0 and (sql[posicao - 1].isalnum() or sql[posicao - 1] in "_$")
+
+
+def listar_migracoes(pasta: Path = PASTA_MIGRACOES) -> List[Migracao]:
+    """Migrações da pasta, em ordem de versão. Levanta ValueError para versões repetidas."""
+    migracoes: Dict[int, Migracao] = {}
+    for caminho in sorted(pasta.glob("*.sql")):
+        encontrado = _NOME_ARQUIVO.match(caminho.name)
+        if not encontrado:
+            raise ValueError(f"Nome de migração inválido: {caminho.name} (esperado NNNN_descricao.sql)")
+        versao = int(encontrado.group(1))
+        if versao in migracoes:
+            raise ValueError(f"Versão de migração repetida: {versao:04d}")
+        migracoes[versao] = Migracao(versao, encontrado.group(2), caminho)
+    return [migracoes[versao] for versao in sorted(migracoes)]
+
+
+def _executar(conexao: Connection, sql: str) -> None:
+    # Cursor do driver: o SQL das migrações pode ter '%', que o SQLAlchemy trataria como parâmetro
+    cursor = conexao.connection.cursor()
+    try:
+        cursor.execute(sql)
+    finally:
+        cursor.close()
+
+
+def _registradas(conexao: Connection) -> Dict[int, Tuple[str, datetime]]:
+    return {
+        versao: (checksum, aplicada_em)
+        for versao, checksum, aplicada_em in conexao.execute(
+            text("SELECT versao, checksum, aplicada_em FROM schema_migracoes")
+        )
+    }
+
+
+def _registrar(conexao: Connection, migracao: Migracao, inicio: float) -> None:
+    conexao.execute(
+        text(
+            "INSERT INTO schema_migracoes (versao, nome, checksum, duracao_ms) "
+            "VALUES (:versao, :nome, :checksum, :duracao_ms)"
+        ),
+        {
+            "versao": migracao.versao,
+            "nome": migracao.nome,
+            "checksum": migracao.checksum,
+            "duracao_ms": int((time.monotonic() - inicio) * 1000),
+        },
+    )
+
+
+def _remover_indice_invalido(conexao: Connection, comando: str) -> None:
+    """Antes de um CREATE INDEX CONCURRENTLY IF NOT EXISTS: remove o índice se uma execução interrompida o deixou inválido."""
+    encontrado = _INDICE_CONCORRENTE.search(comando)
+    if not encontrado:
+        return
+    nome = encontrado.group(1)
+    invalido = conexao.execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :nome AND pg_table_is_visible(c.oid)"
+        ),
+        {"nome": nome},
+    ).scalar()
+    if invalido:
+        logger.warning("Índice %s inválido (criação interrompida): removendo para recriar", nome)
+        _executar(conexao, f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+
+
+def _obter_lock(conexao: Connection) -> None:
+    # Tentativas em vez de pg_advisory_lock: uma instância parada no lock mantém uma consulta aberta, e o
+    # CREATE INDEX CONCURRENTLY da instância que aplica espera por ela (deadlock)
+    while not conexao.execute(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": _CHAVE_LOCK}).scalar():
+        time.sleep(_ESPERA_LOCK)
+
+
+def _aplicar(engine: Engine, conexao_lock: Connection, migracao: Migracao) -> None:
+    inicio = time.monotonic()
+    if migracao.sem_transacao:
+        for comando in dividir_comandos(migracao.sql):
+            _remover_indice_invalido(conexao_lock, comando)
+            _executar(conexao_lock, comando)
+        _registrar(conexao_lock, migracao, inicio)
+    else:
+        with engine.begin() as conexao:
+            conexao.execute(text("SELECT set_config('lock_timeout', :valor, true)"), {"valor": LOCK_TIMEOUT})
+            _executar(conexao, migracao.sql)
+            _registrar(conexao, migracao, inicio)
+    logger.info("Migração %04d_%s aplicada em %.1fs", migracao.versao, migracao.nome, time.monotonic() - inicio)
+
+
+def aplicar_migracoes(engine: Engine, pasta: Path = PASTA_MIGRACOES) -> List[int]:
+    """Aplica as migrações pendentes (e o esquema base num banco vazio). Retorna as versões aplicadas."""
+    migracoes = listar_migracoes(pasta)
+    aplicadas = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text("SELECT set_config('lock_timeout', :valor, false)"), {"valor": LOCK_TIMEOUT})
+        _obter_lock(conexao)
+        try:
+            _executar(conexao, _TABELA_SQL)
+            registradas = _registradas(conexao)
+            if not registradas and conexao.execute(text("SELECT to_regclass('usuarios') IS NULL")).scalar():
+                logger.info("Banco vazio: aplicando o esquema base (%s)", ESQUEMA_BASE.name)
+                with engine.begin() as transacao:
+                    _executar(transacao, ESQUEMA_BASE.read_text(encoding="utf-8"))
+
+            for migracao in migracoes:
+                if migracao.versao in registradas:
+                    if registradas[migracao.versao][0] != migracao.checksum:
+                        logger.warning(
+                            "Migração %04d_%s foi alterada depois de aplicada (checksum diferente)",
+                            migracao.versao,
+                            migracao.nome,
+                        )
+                    continue
+                _aplicar(engine, conexao, migracao)
+                aplicadas.append(migracao.versao)
+        finally:
+            conexao.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": _CHAVE_LOCK})
+    return aplicadas
+
+
+def status_migracoes(engine: Engine, pasta: Path = PASTA_MIGRACOES) -> List[Tuple[Migracao, Optional[datetime]]]:
+    """(migração, data de aplicação ou None se pendente) de cada migração da pasta."""
+    with engine.connect() as conexao:
+        if conexao.execute(text("SELECT to_regclass('schema_migracoes') IS NULL")).scalar():
+            registradas = {}
+        else:
+            registradas = _registradas(conexao)
+    return [
+        (migracao, registradas[migracao.versao][1] if migracao.versao in registradas else None)
+        for migracao in listar_migracoes(pasta)
+    ]
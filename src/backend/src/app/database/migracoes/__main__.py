@@ -0,0 +1,32 @@
+"""
+Aplica as migrações pendentes ou mostra o estado de cada uma.
+
+Uso (a partir de src/backend/src, com DATABASE_URL definida):
+    python -m app.database.migracoes           # aplica as pendentes
+    python -m app.database.migracoes --status  # lista aplicadas e pendentes
+"""
+
+import argparse
+import logging
+
+from app.database.database import engine
+from app.database.migracoes import aplicar_migracoes, status_migracoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="só lista as migrações, sem aplicar")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not args.status:
+        aplicadas = aplicar_migracoes(engine)
+        print(f"{len(aplicadas)} migração(ões) aplicada(s)")
+    for migracao, aplicada_em in status_migracoes(engine):
+        situacao = aplicada_em.isoformat(sep=" ", timespec="seconds") if aplicada_em else "pendente"
+        modo = " (fora de transação)" if migracao.sem_transacao else ""
+        print(f"{migracao.versao:04d}_{migracao.nome:<32} {situacao}{modo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,42 @@
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routers import router
-from app.database.database import Base, engine
-from app.models import negociacao, proposta
+from app.database.database import engine
+from app.database.migracoes import aplicar_migracoes
+from app.services.agendador import agendador
+from app.services.eventos_negociacao import CONSUMIDORES, INTERVALO_DESPACHO, despachar_agendado
+from app.services.faixa_mercado import INTERVALO_RECONSTRUCAO, FaixaMercadoService
+from app.services.job_recalculo import JobRecalculoService
+from app.services.negociacao import INTERVALO_EXPIRACAO, NegociacaoService
+from app.services.paginacao import CABECALHO_PROXIMO_CURSOR
+
+# Com 0, as migrações são aplicadas antes do deploy (python -m app.database.migracoes)
+MIGRACOES_NA_INICIALIZACAO = os.getenv("MIGRACOES_NA_INICIALIZACAO", "1") != "0"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	if MIGRACOES_NA_INICIALIZACAO:
+		aplicar_migracoes(engine)
+	# Retoma jobs de recálculo interrompidos a partir do último lote confirmado
+	JobRecalculoService.retomar_pendentes()
+	agendador.agendar("faixas_mercado", INTERVALO_RECONSTRUCAO, FaixaMercadoService.reconstruir_agendado)
+	agendador.agendar("expiracao_negociacoes", INTERVALO_EXPIRACAO, NegociacaoService.expirar_agendado)
+	# Consumidores do log de eventos das negociações (features de crédito, métricas, blockchain)
+	for nome in CONSUMIDORES:
+		agendador.agendar(f"eventos_{nome}", INTERVALO_DESPACHO, partial(despachar_agendado, nome))
+	agendador.iniciar()
+	yield
+	agendador.parar()
+	JobRecalculoService.encerrar()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="NegociaAi API")
+app = FastAPI(title="NegociaAi API", lifespan=lifespan)
 
 app.add_middleware(
 	CORSMiddleware,
@@ -19,6 +48,7 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	expose_headers=[CABECALHO_PROXIMO_CURSOR],
 )
 
 app.include_router(router)
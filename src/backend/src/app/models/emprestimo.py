@@ -25,7 +25,7 @@ class Emprestimo(Base):
     prazo = Column(Integer, nullable=False)
     parcela = Column(Float, nullable=False)
     contrato_tx_hash = Column(String, nullable=False)
-    hash_onchain = Column(String, nullable=False)
+    hash_onchain = Column(String, nullable=True)
     antecipacao_onchain = Column(String, nullable=True)
     contrato_antecipacao_hash = Column(String, nullable=True)
     status = Column(String(20), nullable=False, default="ativo")
@@ -45,7 +45,7 @@ class EmprestimoBase(BaseModel):
     prazo: int
     parcela: float
     contrato_tx_hash: str
-    hash_onchain: str
+    hash_onchain: Optional[str] = None
     antecipacao_onchain: Optional[str] = None
     contrato_antecipacao_hash: Optional[str] = None
     status: Optional[str] = "ativo"
@@ -0,0 +1,85 @@
+"""Modelos do log de eventos das negociações (outbox) e das posições dos seus consumidores."""
+
+from datetime import datetime
+from typing import Any, Dict
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String, Text, cast, text
+from sqlalchemy.types import UserDefinedType
+
+from app.database.database import Base
+
+
+class XID8(UserDefinedType):
+	"""
+	Tipo ``xid8`` do PostgreSQL (id de transação de 64 bits), como int no Python. O valor vai ao banco como
+	texto com ``CAST(... AS xid8)`` (não há cast de inteiro para xid8) e volta como int, para comparar
+	numericamente dos dois lados.
+	"""
+
+	cache_ok = True
+
+	def get_col_spec(self, **kw) -> str:
+		return "xid8"
+
+	def bind_processor(self, dialect):
+		def processar(valor):
+			return None if valor is None else str(valor)
+		return processar
+
+	def bind_expression(self, bindvalue):
+		return cast(bindvalue, self)
+
+	def result_processor(self, dialect, coltype):
+		def processar(valor):
+			return None if valor is None else int(valor)
+		return processar
+
+
+class EventoNegociacao(Base):
+	"""
+	Evento de uma negociação, gravado na mesma transação da mudança (só INSERT: o log não é alterado).
+	``id_transacao`` (xid8 da transação que gravou) ordena a leitura dos consumidores; ver
+	app/services/eventos_negociacao.py.
+	"""
+
+	__tablename__ = "eventos_negociacao"
+
+	id = Column(BigInteger, primary_key=True, autoincrement=True)
+	id_transacao = Column(XID8, nullable=False, server_default=text("pg_current_xact_id()"))
+	id_negociacoes = Column(Integer, nullable=False)
+	tipo = Column(String(40), nullable=False)
+	dados = Column(JSON, nullable=False, default=dict)
+	criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+	__table_args__ = (
+		# Leitura dos consumidores, em ordem de (transação, id)
+		Index("ix_eventos_negociacao_transacao", "id_transacao", "id"),
+		# Histórico de uma negociação (GET /negociacoes/{id}/eventos)
+		Index("ix_eventos_negociacao_negociacao", "id_negociacoes", "id"),
+	)
+
+
+class ConsumidorEventos(Base):
+	"""Posição de cada consumidor no log (último evento processado) e falhas seguidas no evento atual."""
+
+	__tablename__ = "consumidores_eventos"
+
+	consumidor = Column(String(40), primary_key=True)
+	ultima_transacao = Column(XID8, nullable=False, server_default=text("'0'"))
+	ultimo_id = Column(BigInteger, nullable=False, default=0)
+	tentativas = Column(Integer, nullable=False, default=0)
+	ultimo_erro = Column(Text, nullable=True)
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class EventoNegociacaoResponse(BaseModel):
+	"""Evento do histórico de uma negociação."""
+
+	id: int
+	id_negociacoes: int
+	tipo: str
+	dados: Dict[str, Any]
+	criado_em: datetime
+
+	model_config = ConfigDict(from_attributes=True)
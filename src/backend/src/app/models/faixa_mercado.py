@@ -0,0 +1,41 @@
+"""
+Modelos das tabelas ``faixas_mercado`` (faixa de taxas aceitas no mercado por decil de score) e
+``histogramas_taxas`` (distribuição das taxas aceitas por decil de score, de onde as faixas saem).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, SmallInteger, String
+
+from app.database.database import Base
+
+
+class FaixaMercado(Base):
+	"""
+	Percentis (p10 e p90) das taxas aceitas de tomadores no decil de score; ``quantidade`` é o número de
+	amostras usadas (decis com poucas amostras juntam os decis vizinhos). Atualizada a cada aceite a
+	partir de ``histogramas_taxas`` e reconstruída periodicamente a partir das propostas.
+	"""
+
+	__tablename__ = "faixas_mercado"
+
+	faixa = Column(String(20), primary_key=True)
+	score_min = Column(Float, nullable=False)
+	score_max = Column(Float, nullable=False)
+	taxa_min = Column(Float, nullable=True)
+	taxa_max = Column(Float, nullable=True)
+	quantidade = Column(Integer, nullable=False, default=0)
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class HistogramaTaxa(Base):
+	"""
+	Quantidade de amostras de taxa aceita (as duas pontas da faixa de cada proposta aceita) por decil
+	de score do tomador e por taxa, em centésimos de ponto percentual.
+	"""
+
+	__tablename__ = "histogramas_taxas"
+
+	decil = Column(SmallInteger, primary_key=True)
+	taxa_centesimos = Column(Integer, primary_key=True)
+	quantidade = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,66 @@
+"""Modelos do armazenamento incremental de features de crédito (``features_credito``)."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer
+
+from app.database.database import Base
+
+
+# Contadores somáveis mantidos tanto por negociação quanto por usuário
+CONTADORES_FEATURES = (
+	"emprestimos_contratados",
+	"emprestimos_quitados",
+	"emprestimos_inadimplentes",
+	"soma_assinatura_epoch",
+	"soma_taxa_juros",
+	"qtd_taxa_juros",
+	"soma_prazo",
+	"qtd_prazo",
+	"divida_aberta",
+	"propostas_realizadas",
+	"propostas_aceitas",
+)
+
+
+class FeaturesCredito(Base):
+	"""Agregados do histórico do usuário como tomador; uma linha por usuário."""
+
+	__tablename__ = "features_credito"
+
+	id_usuarios = Column(Integer, primary_key=True)
+	emprestimos_contratados = Column(Integer, nullable=False, default=0)
+	emprestimos_quitados = Column(Integer, nullable=False, default=0)
+	emprestimos_inadimplentes = Column(Integer, nullable=False, default=0)
+	soma_assinatura_epoch = Column(Float, nullable=False, default=0)
+	soma_taxa_juros = Column(Float, nullable=False, default=0)
+	qtd_taxa_juros = Column(Integer, nullable=False, default=0)
+	soma_prazo = Column(Float, nullable=False, default=0)
+	qtd_prazo = Column(Integer, nullable=False, default=0)
+	divida_aberta = Column(Float, nullable=False, default=0)
+	propostas_realizadas = Column(Integer, nullable=False, default=0)
+	propostas_aceitas = Column(Integer, nullable=False, default=0)
+	primeira_proposta_em = Column(DateTime, nullable=True)
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FeaturesCreditoNegociacao(Base):
+	"""Contribuição de cada negociação para os agregados do tomador (base do cálculo incremental)."""
+
+	__tablename__ = "features_credito_negociacoes"
+	__table_args__ = (Index("ix_features_neg_tomador", "id_tomador"),)
+
+	id_negociacoes = Column(Integer, primary_key=True)
+	id_tomador = Column(Integer, nullable=False)
+	emprestimos_contratados = Column(Integer, nullable=False, default=0)
+	emprestimos_quitados = Column(Integer, nullable=False, default=0)
+	emprestimos_inadimplentes = Column(Integer, nullable=False, default=0)
+	soma_assinatura_epoch = Column(Float, nullable=False, default=0)
+	soma_taxa_juros = Column(Float, nullable=False, default=0)
+	qtd_taxa_juros = Column(Integer, nullable=False, default=0)
+	soma_prazo = Column(Float, nullable=False, default=0)
+	qtd_prazo = Column(Integer, nullable=False, default=0)
+	divida_aberta = Column(Float, nullable=False, default=0)
+	propostas_realizadas = Column(Integer, nullable=False, default=0)
+	propostas_aceitas = Column(Integer, nullable=False, default=0)
+	primeira_proposta_em = Column(DateTime, nullable=True)
@@ -0,0 +1,88 @@
+"""Modelos dos jobs assíncronos de recálculo de score (``jobs_recalculo_score``)."""
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+
+from app.database.database import Base
+
+
+class JobRecalculo(Base):
+	"""Um pedido de recálculo de todos os scores, dividido em partições por faixa de ``usuarios.id``."""
+
+	__tablename__ = "jobs_recalculo_score"
+
+	id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+	status = Column(String(20), nullable=False, default="pendente")
+	tamanho_lote = Column(Integer, nullable=False)
+	total_usuarios = Column(Integer, nullable=False, default=0)
+	erro = Column(Text, nullable=True)
+	criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+	iniciado_em = Column(DateTime, nullable=True)
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+	concluido_em = Column(DateTime, nullable=True)
+
+
+class JobRecalculoParticao(Base):
+	"""
+	Faixa [id_inicio, id_fim] processada por um worker. ``ultimo_id`` e ``processados`` são gravados
+	no mesmo commit dos scores de cada lote, então a retomada continua do último lote confirmado.
+	"""
+
+	__tablename__ = "jobs_recalculo_score_particoes"
+	__table_args__ = (Index("ix_jobs_recalculo_particoes_job", "id_job"),)
+
+	id = Column(Integer, primary_key=True, autoincrement=True)
+	id_job = Column(Integer, ForeignKey("jobs_recalculo_score.id", ondelete="CASCADE"), nullable=False)
+	id_inicio = Column(Integer, nullable=False)
+	id_fim = Column(Integer, nullable=False)
+	total_usuarios = Column(Integer, nullable=False, default=0)
+	ultimo_id = Column(Integer, nullable=True)
+	processados = Column(Integer, nullable=False, default=0)
+	falhas = Column(JSON, nullable=False, default=list)
+	status = Column(String(20), nullable=False, default="pendente")
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FalhaRecalculoResponse(BaseModel):
+	"""Usuário que não pôde ser pontuado durante o job."""
+
+	id_usuario: Optional[int] = None
+	erro: str
+
+
+class ParticaoRecalculoResponse(BaseModel):
+	"""Progresso de uma partição do job."""
+
+	id: int
+	id_inicio: int
+	id_fim: int
+	total_usuarios: int
+	ultimo_id: Optional[int] = None
+	processados: int
+	status: str
+
+	model_config = ConfigDict(from_attributes=True)
+
+
+class JobRecalculoResponse(BaseModel):
+	"""Status, progresso e vazão de um job de recálculo."""
+
+	id: int
+	status: str
+	tamanho_lote: int
+	total_usuarios: int
+	processados: int
+	progresso: float
+	usuarios_por_segundo: Optional[float] = None
+	erro: Optional[str] = None
+	criado_em: datetime
+	iniciado_em: Optional[datetime] = None
+	atualizado_em: datetime
+	concluido_em: Optional[datetime] = None
+	particoes: List[ParticaoRecalculoResponse] = []
+	falhas: List[FalhaRecalculoResponse] = []
+
+	model_config = ConfigDict(from_attributes=True)
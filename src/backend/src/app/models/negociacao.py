@@ -5,7 +5,7 @@ Modelo de dados para a entidade Negociação, de acordo com o banco de dados.
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import Column, String, Float, Integer, DateTime
+from sqlalchemy import Column, String, Float, Integer, DateTime, Index
 from app.database.database import Base
 
 # 1. SQLAlchemy Model (Definição da Tabela)
@@ -26,6 +26,19 @@ class Negociacao(Base):
     assinado_em = Column(DateTime, nullable=True)
     criado_em = Column(DateTime, default=datetime.now, nullable=False)
     atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+    # Concorrência otimista: todo UPDATE confere e incrementa a versão (ver app/services/concorrencia.py)
+    versao = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": versao}
+
+    __table_args__ = (
+        # Tarefa de expiração: negociações em aberto por data de criação
+        Index("ix_negociacoes_status_criado", "status", "criado_em"),
+        # Listagens paginadas por (atualizado_em, id), gerais e por tomador/investidor com status
+        Index("ix_negociacoes_atualizado", "atualizado_em", "id"),
+        Index("ix_negociacoes_tomador_status_atualizado", "id_tomador", "status", "atualizado_em", "id"),
+        Index("ix_negociacoes_investidor_status_atualizado", "id_investidor", "status", "atualizado_em", "id"),
+    )
 
 # 2. Pydantic Schemas (Definição da API)
 class NegociacaoBase(BaseModel):
@@ -48,6 +61,7 @@ class NegociacaoResponse(NegociacaoBase):
     id: int
     criado_em: datetime
     atualizado_em: datetime
+    versao: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -62,3 +76,5 @@ class NegociacaoUpdate(BaseModel):
     hash_onchain: Optional[str] = None
     contrato_tx_hash: Optional[str] = None
     assinado_em: Optional[datetime] = None
+    # Versão lida pelo cliente: a atualização só vale se a negociação ainda estiver nela
+    versao: Optional[int] = None
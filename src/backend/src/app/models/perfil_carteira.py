@@ -0,0 +1,23 @@
+"""Modelo da tabela ``perfis_carteira`` (resumo da carteira de cada investidor para a recomendação)."""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Integer
+
+from app.database.database import Base
+
+
+class PerfilCarteira(Base):
+	"""
+	Valores, prazos e taxas (pontas da faixa, 2 casas) distintos das propostas da carteira do investidor:
+	as que ele criou como investidor e as solicitações de tomadores que ele aceitou.
+	Atualizado a cada proposta criada ou aceita pelo investidor.
+	"""
+
+	__tablename__ = "perfis_carteira"
+
+	id_usuarios = Column(Integer, primary_key=True)
+	valores = Column(JSON, nullable=False, default=list)
+	prazos = Column(JSON, nullable=False, default=list)
+	taxas = Column(JSON, nullable=False, default=list)
+	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
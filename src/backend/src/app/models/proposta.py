@@ -2,12 +2,27 @@
 Modelo de dados para a entidade Proposta, de acordo com o banco de dados. 
 """
 
+import re
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import Column, String, Float, Integer, DateTime, Boolean
+from sqlalchemy import Column, String, Float, Integer, DateTime, Boolean, Index
+from sqlalchemy.orm import validates
 from app.database.database import Base
 
+_TAXA_PADRAO = re.compile(r"^\s*(\d+(?:\.\d*)?|\.\d+)\s*(?:-\s*(\d+(?:\.\d*)?|\.\d+)\s*)?$")
+
+
+def faixa_taxa(taxa: Optional[str]) -> Optional[Tuple[float, float]]:
+    """(mínima, máxima) de uma taxa em texto ('12-15', '10', '1,2-2,4%'); None fora do formato."""
+    if not taxa:
+        return None
+    m = _TAXA_PADRAO.match(taxa.replace(",", ".").replace("%", ""))
+    if m is None:
+        return None
+    return float(m.group(1)), float(m.group(2) or m.group(1))
+
+
 # 1. SQLAlchemy Model (Definição da Tabela)
 class Proposta(Base):
     __tablename__ = "propostas"
@@ -26,6 +41,32 @@ class Proposta(Base):
     negociavel = Column(Boolean)
     justificativa = Column(String(255), nullable=True)
     criado_em = Column(DateTime, default=datetime.now, nullable=False)
+    # Faixa numérica de taxa_sugerida, mantida pelo validador abaixo (NULL se o texto está fora do formato)
+    taxa_min = Column(Float, nullable=True)
+    taxa_max = Column(Float, nullable=True)
+    # Concorrência otimista: todo UPDATE confere e incrementa a versão (ver app/services/concorrencia.py)
+    versao = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": versao}
+
+    __table_args__ = (
+        Index("ix_prop_neg_data", "id_negociacoes", "criado_em"),
+        Index("ix_propostas_autor_tipo_status", "id_autor", "autor_tipo", "status"),
+        Index("ix_propostas_taxa_faixa", "taxa_min", "taxa_max"),
+        Index("ix_propostas_tipo_status_criado", "tipo", "status", "criado_em", "id"),
+    )
+
+    @validates("taxa_sugerida")
+    def _sincronizar_faixa(self, _chave, taxa_sugerida):
+        self.taxa_min, self.taxa_max = faixa_taxa(taxa_sugerida) or (None, None)
+        return taxa_sugerida
+
+    @property
+    def taxa_media(self) -> Optional[float]:
+        """Ponto médio da faixa de taxa_sugerida."""
+        if self.taxa_min is None or self.taxa_max is None:
+            return None
+        return round((self.taxa_min + self.taxa_max) / 2, 4)
 
 # 2. Pydantic Schemas (Definição da API)
 class PropostaBase(BaseModel):
@@ -49,5 +90,8 @@ class PropostaCreate(PropostaBase):
 class PropostaResponse(PropostaBase):
     id: int
     criado_em: datetime
+    taxa_min: Optional[float] = None
+    taxa_max: Optional[float] = None
+    versao: int
 
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
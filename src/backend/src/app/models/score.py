@@ -4,7 +4,7 @@ from datetime import datetime
 from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import Column, DateTime, Float, Integer, JSON
+from sqlalchemy import Column, DateTime, Float, Integer, JSON, String
 
 from app.database.database import Base
 
@@ -20,6 +20,10 @@ class ScoreCredito(Base):
 	atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
 	analise = Column(JSON, nullable=True)
 	risco = Column(Float, nullable=True)
+	# Entradas do último cálculo: permitem devolver o score gravado sem recalcular
+	fingerprint = Column(String(64), nullable=True)
+	score_modelo = Column(Float, nullable=True)
+	score_serasa = Column(Float, nullable=True)
 
 
 class ScoreCreditoResponse(BaseModel):
@@ -43,5 +47,18 @@ class ScoreDetalhadoResponse(BaseModel):
 	score_serasa: float
 	prob_default: float
 	analise: Dict[str, Any]
+	versao_modelo: Optional[str] = None
+	reaproveitado: bool = False
 
 	model_config = ConfigDict(from_attributes=True)
+
+
+class ModeloCreditoInfoResponse(BaseModel):
+	"""Versão dos artefatos do modelo carregados no worker."""
+
+	versao: str
+	carregado_em: datetime
+	model_path: str
+	scaler_path: str
+	modelo: str
+	motor: Optional[str] = None
@@ -0,0 +1,93 @@
+"""
+Agendador de tarefas periódicas em segundo plano (uma thread daemon por tarefa).
+
+As tarefas são registradas na inicialização da API (lifespan em ``app/main.py``). Como cada worker
+da API tem o seu agendador, tarefas que não podem rodar em paralelo devem se proteger no banco
+(ex.: ``pg_try_advisory_xact_lock``).
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TarefaPeriodica:
+    nome: str
+    intervalo: float
+    funcao: Callable[[], object]
+    atraso_inicial: float = 0.0
+    execucoes: int = 0
+    falhas: int = 0
+    _thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+
+class Agendador:
+    """Executa cada tarefa a cada ``intervalo`` segundos até ``parar()``; erros são registrados e não param a tarefa."""
+
+    def __init__(self):
+        self._tarefas: Dict[str, TarefaPeriodica] = {}
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._iniciado = False
+
+    def agendar(self, nome: str, intervalo: float, funcao: Callable[[], object], atraso_inicial: float = 0.0) -> None:
+        """Registra a tarefa (substitui uma de mesmo nome ainda não iniciada); se o agendador já roda, inicia na hora."""
+        tarefa = TarefaPeriodica(nome, intervalo, funcao, atraso_inicial)
+        with self._lock:
+            if nome in self._tarefas and self._tarefas[nome]._thread is not None:
+                raise ValueError(f"Tarefa '{nome}' já está em execução")
+            self._tarefas[nome] = tarefa
+            if self._iniciado:
+                self._iniciar_tarefa(tarefa)
+
+    def _iniciar_tarefa(self, tarefa: TarefaPeriodica) -> None:
+        tarefa._thread = threading.Thread(target=self._executar, args=(tarefa,), name=f"agendador-{tarefa.nome}", daemon=True)
+        tarefa._thread.start()
+
+    def _executar(self, tarefa: TarefaPeriodica) -> None:
+        if self._parar.wait(tarefa.atraso_inicial):
+            return
+        while True:
+            try:
+                tarefa.funcao()
+                tarefa.execucoes += 1
+            except Exception:
+                tarefa.falhas += 1
+                logger.exception("Falha na tarefa agendada '%s'", tarefa.nome)
+            if self._parar.wait(tarefa.intervalo):
+                return
+
+    def iniciar(self) -> None:
+        with self._lock:
+            if self._iniciado:
+                return
+            self._iniciado = True
+            self._parar.clear()
+            for tarefa in self._tarefas.values():
+                self._iniciar_tarefa(tarefa)
+
+    def parar(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            self._iniciado = False
+            self._parar.set()
+            threads = [tarefa._thread for tarefa in self._tarefas.values() if tarefa._thread is not None]
+            for tarefa in self._tarefas.values():
+                tarefa._thread = None
+        for thread in threads:
+            thread.join(timeout)
+
+    def tarefas(self) -> List[Dict[str, object]]:
+        with self._lock:
+            return [
+                {"nome": t.nome, "intervalo": t.intervalo, "execucoes": t.execucoes, "falhas": t.falhas}
+                for t in self._tarefas.values()
+            ]
+
+
+# Agendador do processo da API
+agendador = Agendador()
@@ -0,0 +1,118 @@
+"""
+Cache em memória com expiração (TTL) e descarte LRU, seguro para uso entre threads.
+
+É local ao processo: cada worker da API tem o seu. Usado pelos serviços que consultam dados
+caros ou externos (ex.: score do Serasa por CPF). Entradas podem receber tags para serem
+invalidadas em grupo (ex.: todas as entradas de um usuário).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """Mapa chave -> valor com no máximo ``max_itens`` entradas, cada uma válida por ``ttl`` segundos."""
+
+    def __init__(self, max_itens: int = 10000, ttl: float = 300.0):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any, Tuple[Hashable, ...]]]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        # Incrementada a cada invalidação: cálculos iniciados antes dela não são guardados
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def _remover(self, chave: Hashable) -> None:
+        _, _, tags = self._itens.pop(chave)
+        for tag in tags:
+            chaves = self._tags.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._tags[tag]
+
+    def obter(self, chave: Hashable, padrao: Any = None) -> Any:
+        """Retorna o valor em cache (renovando sua posição LRU) ou ``padrao`` se ausente/expirado."""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] <= agora:
+                if item is not None:
+                    self._remover(chave)
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def _definir(self, chave: Hashable, valor: Any, ttl: Optional[float], tags: Tuple[Hashable, ...]) -> None:
+        if chave in self._itens:
+            self._remover(chave)
+        self._itens[chave] = (time.monotonic() + (self.ttl if ttl is None else ttl), valor, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(chave)
+        while len(self._itens) > self.max_itens:
+            self._remover(next(iter(self._itens)))
+
+    def definir(self, chave: Hashable, valor: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = ()) -> None:
+        with self._lock:
+            self._definir(chave, valor, ttl, tuple(tags))
+
+    def obter_ou_calcular(self, chave: Hashable, calcular: Callable[[], Any], tags: Iterable[Hashable] = ()) -> Any:
+        """
+        Retorna o valor em cache ou calcula, guarda e retorna (o cálculo roda fora do lock).
+        Se houver invalidação durante o cálculo, o valor é retornado mas não guardado.
+        """
+        valor = self.obter(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            with self._lock:
+                geracao = self._geracao
+            valor = calcular()
+            with self._lock:
+                if self._geracao == geracao:
+                    self._definir(chave, valor, None, tuple(tags))
+        return valor
+
+    def invalidar(self, chave: Hashable) -> None:
+        with self._lock:
+            self._geracao += 1
+            if chave in self._itens:
+                self._remover(chave)
+                self.invalidacoes += 1
+
+    def invalidar_tag(self, tag: Hashable) -> int:
+        """Remove todas as entradas com a tag e retorna quantas eram."""
+        with self._lock:
+            self._geracao += 1
+            chaves = list(self._tags.get(tag, ()))
+            for chave in chaves:
+                self._remover(chave)
+            self.invalidacoes += len(chaves)
+            return len(chaves)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._itens.clear()
+            self._tags.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl_segundos": self.ttl,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": round(self.acertos / total, 4) if total else None,
+            }
@@ -0,0 +1,47 @@
+"""
+Cache das recomendações de taxa (``taxa_analisada``) do processo da API.
+
+A chave é (usuário, tipo, faixa de score, valor quantizado, prazo): o score só entra no cálculo pela
+faixa de mercado, e o valor é arredondado para 3 algarismos significativos (a distância ao histórico
+é relativa ao valor, então o erro do peso fica abaixo de 0,5%). Cada entrada tem as tags do usuário e
+da faixa; o aceite de uma proposta invalida só o histórico do autor e as faixas de mercado que mudaram,
+e a reconstrução das faixas de mercado invalida as faixas que mudaram.
+"""
+
+import os
+from typing import Hashable, Tuple
+
+from app.services.cache import CacheTTL
+
+
+cache_taxas = CacheTTL(
+    max_itens=int(os.getenv("TAXA_CACHE_MAX_ITENS", "10000")),
+    ttl=float(os.getenv("TAXA_CACHE_TTL", "300")),
+)
+
+
+def quantizar_valor(valor: float) -> float:
+    """Valor arredondado para 3 algarismos significativos (12345 -> 12300, 87.5 -> 87.5)."""
+    return float(f"{float(valor):.3g}")
+
+
+def chave_taxa(user_id: int, tipo: str, faixa: str, valor: float, prazo: int) -> Tuple[Hashable, ...]:
+    return (user_id, tipo, faixa, quantizar_valor(valor), int(prazo))
+
+
+def tag_usuario(user_id: int) -> Tuple[str, int]:
+    return ("usuario", user_id)
+
+
+def tag_faixa(faixa: str) -> Tuple[str, str]:
+    return ("faixa", faixa)
+
+
+def invalidar_usuario(user_id: int) -> int:
+    """Invalida as recomendações que usam o histórico do usuário."""
+    return cache_taxas.invalidar_tag(tag_usuario(user_id))
+
+
+def invalidar_faixa(faixa: str) -> int:
+    """Invalida as recomendações que usam a faixa de mercado da faixa de score."""
+    return cache_taxas.invalidar_tag(tag_faixa(faixa))
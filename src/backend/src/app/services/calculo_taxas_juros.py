@@ -1,28 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional, Sequence
 from sqlalchemy import text
+import numpy as np
 
-def parse_taxa_range(valor: str) -> Tuple[float, float]:
-	"""
-	Converte string de taxa ('1.2-2.4', '1.2') para tupla (min, max).
-	"""
-	if valor is None:
-		return (0.0, 0.0)
-	valor = valor.replace(',', '.').strip()
-	if '-' in valor:
-		partes = valor.split('-')
-		try:
-			min_t = float(partes[0].replace('%', '').strip())
-			max_t = float(partes[1].replace('%', '').strip())
-			return (min_t, max_t)
-		except Exception:
-			return (0.0, 0.0)
-	else:
-		try:
-			t = float(valor.replace('%', '').strip())
-			return (t, t)
-		except Exception:
-			return (0.0, 0.0)
+from app.services.cache_taxas import cache_taxas, chave_taxa, quantizar_valor, tag_faixa, tag_usuario
+from app.services.faixa_mercado import FaixaMercadoService, faixa_do_score
 
 """
 Este arquivo é responsável por guardar os cálculos estratégicos de taxas de juros aplicáveis aos empréstimos, com base nas regras de negócio definidas.
@@ -32,33 +14,10 @@ Inclui funções para recomendação de taxa (taxa_analisada) e matching de opor
 
 def faixa_mercado_por_score(db: Session, score: int) -> Tuple[float, float]:
 	"""
-	Busca no banco a faixa de mercado (min, max) para o score informado.
-	Agrupa propostas aceitas por faixa de score do tomador.
+	Faixa de mercado (min, max) para o score informado, lida da tabela ``faixas_mercado``
+	(percentis p10-p90 das taxas aceitas no decil de score do tomador).
 	"""
-	# Score ranges
-	if score >= 800:
-		score_min, score_max = 800, 1000
-	elif score >= 500:
-		score_min, score_max = 500, 799
-	else:
-		score_min, score_max = 0, 499
-
-	# Busca taxas de propostas aceitas para tomadores na faixa
-	query = db.execute(text(
-		"""
-		SELECT p.taxa_sugerida
-		FROM propostas p
-		JOIN negociacoes n ON n.id = p.id_negociacoes
-		JOIN scores_credito s ON n.id_tomador = s.id_usuarios
-		WHERE p.status = 'aceita'
-			AND s.valor_score BETWEEN :score_min AND :score_max
-		"""),
-		{"score_min": score_min, "score_max": score_max}
-	)
-	taxas = [parse_taxa_range(row[0]) for row in query.fetchall() if row[0] is not None]
-	min_taxa = min([t[0] for t in taxas]) if taxas else 10.0
-	max_taxa = max([t[1] for t in taxas]) if taxas else 30.0
-	return min_taxa, max_taxa
+	return FaixaMercadoService.obter_faixa(db, score)
 
 
 def taxa_analisada(
@@ -67,59 +26,75 @@ def taxa_analisada(
 	valor: float,
 	prazo: int,
 	score: int,
-	tipo: str = "tomador"
+	tipo: str = "tomador",
+	usar_cache: bool = True
 ) -> Dict[str, Any]:
 	"""
 	Calcula a taxa sugerida (taxa_analisada) para uma nova proposta, considerando:
 	- Faixa de mercado (por score, buscada do banco)
 	- Histórico do usuário (taxas médias de propostas semelhantes)
 	Retorna taxa sugerida, faixa de mercado e mensagem de contexto.
+	O cálculo usa o valor quantizado (mesma chave de ``cache_taxas``, ver app/services/cache_taxas.py), com
+	ou sem cache e também em taxa_analisada_lote; com usar_cache, o resultado vem do cache.
 	"""
-	min_taxa, max_taxa = faixa_mercado_por_score(db, score)
+	valor = quantizar_valor(valor)
+	if not usar_cache:
+		return _calcular_taxa_analisada(db, user_id, valor, prazo, score, tipo)
 
-	# Buscar histórico de taxas do usuário para propostas semelhantes
+	faixa = faixa_do_score(score)[0]
+	resultado = cache_taxas.obter_ou_calcular(
+		chave_taxa(user_id, tipo, faixa, valor, prazo),
+		lambda: _calcular_taxa_analisada(db, user_id, valor, prazo, score, tipo),
+		tags=(tag_usuario(user_id), tag_faixa(faixa)),
+	)
+	return dict(resultado)
 
 
-	query = db.execute(text(
+def _calcular_taxa_analisada(
+	db: Session,
+	user_id: int,
+	valor: float,
+	prazo: int,
+	score: int,
+	tipo: str
+) -> Dict[str, Any]:
+	min_taxa, max_taxa = faixa_mercado_por_score(db, score)
+
+	# Histórico de taxas do usuário: média ponderada pela distância de valor e prazo à proposta atual
+	media_min, media_max = db.execute(text(
 		"""
-		SELECT p.taxa_sugerida, p.valor, p.prazo_meses
+		SELECT SUM(p.taxa_min * d.peso) / SUM(d.peso), SUM(p.taxa_max * d.peso) / SUM(d.peso)
 		FROM propostas p
+		CROSS JOIN LATERAL (
+			SELECT 1 / (1 + ABS(p.valor - :valor) / NULLIF(:valor, 0) + ABS(p.prazo_meses - :prazo) / :prazo_divisor) AS peso
+		) d
 		WHERE p.id_autor = :user_id
 			AND p.autor_tipo = :autor_tipo
 			AND p.status = 'aceita'
+			AND p.taxa_min IS NOT NULL
+			AND p.valor IS NOT NULL
 		"""),
-		{"user_id": user_id, "autor_tipo": tipo}
-	)
-	rows = query.fetchall()
-	print('DEBUG taxas_usuario raw:', rows)
-	# Média ponderada por distância
-	min_weighted_sum = 0.0
-	max_weighted_sum = 0.0
-	total_weight = 0.0
-	min_vals = []
-	max_vals = []
-	for row in rows:
-		taxa_str, valor_hist, prazo_hist = row
-		if taxa_str is not None and valor_hist is not None and prazo_hist is not None:
-			min_t, max_t = parse_taxa_range(taxa_str)
-			valor_hist_f = float(valor_hist)
-			prazo_hist_f = float(prazo_hist)
-			d = abs(valor_hist_f - valor) / valor + abs(prazo_hist_f - prazo) / (prazo if prazo else 1)
-			peso = 1 / (1 + d)
-			min_weighted_sum += min_t * peso
-			max_weighted_sum += max_t * peso
-			total_weight += peso
-			min_vals.append(min_t)
-			max_vals.append(max_t)
-	if total_weight > 0:
-		media_min = round(min_weighted_sum / total_weight, 2)
-		media_max = round(max_weighted_sum / total_weight, 2)
-	elif min_vals:
-		media_min = round(sum(min_vals) / len(min_vals), 2)
-		media_max = round(sum(max_vals) / len(max_vals), 2)
-	else:
-		media_min = None
-		media_max = None
+		{
+			"user_id": user_id,
+			"autor_tipo": tipo,
+			"valor": float(valor),
+			"prazo": float(prazo),
+			"prazo_divisor": float(prazo) if prazo else 1.0,
+		}
+	).one()
+	return _sugestao(min_taxa, max_taxa, media_min, media_max)
+
+
+def _sugestao(
+	min_taxa: float,
+	max_taxa: float,
+	media_min: Optional[float],
+	media_max: Optional[float],
+) -> Dict[str, Any]:
+	"""Monta a resposta de taxa_analisada a partir da faixa de mercado e da média do histórico (ou None)."""
+	if media_min is not None and media_max is not None:
+		media_min = round(float(media_min), 2)
+		media_max = round(float(media_max), 2)
 
 	# Lógica de sugestão: se histórico existe, pondera com faixa de mercado
 	if media_min is not None and media_max is not None:
@@ -137,4 +112,62 @@ def taxa_analisada(
 		"faixa_mercado": [min_taxa, max_taxa],
 		"mensagem": mensagem,
 		"media_taxa_usuario": f"{media_min}-{media_max}" if media_min is not None and media_max is not None else None
-	}
\ No newline at end of file
+	}
+
+
+def taxa_analisada_lote(
+	db: Session,
+	user_id: int,
+	cotacoes: Sequence[Tuple[float, int, int]],
+	tipo: str = "tomador"
+) -> List[Dict[str, Any]]:
+	"""
+	taxa_analisada para várias combinações (valor, prazo, score) do mesmo usuário.
+	Faixas de mercado e histórico são lidos uma vez; as médias ponderadas de todas as combinações
+	saem de uma única conta matricial (combinações x propostas do histórico), com o mesmo peso
+	de taxa_analisada. Retorna um resultado por combinação, na ordem recebida.
+	"""
+	if not cotacoes:
+		return []
+
+	faixas = FaixaMercadoService.obter_faixas(db)
+	historico = db.execute(text(
+		"""
+		SELECT p.taxa_min, p.taxa_max, p.valor, p.prazo_meses
+		FROM propostas p
+		WHERE p.id_autor = :user_id
+			AND p.autor_tipo = :autor_tipo
+			AND p.status = 'aceita'
+			AND p.taxa_min IS NOT NULL
+			AND p.valor IS NOT NULL
+		"""),
+		{"user_id": user_id, "autor_tipo": tipo}
+	).fetchall()
+
+	# Valor quantizado como em taxa_analisada: cada combinação tem o mesmo resultado da consulta avulsa
+	valores = np.array([quantizar_valor(c[0]) for c in cotacoes])
+	prazos = np.array([float(c[1]) for c in cotacoes])
+	medias_min = np.full(len(cotacoes), np.nan)
+	medias_max = np.full(len(cotacoes), np.nan)
+	if historico:
+		h_min, h_max, h_valor, h_prazo = np.array(historico, dtype=np.float64).T
+		# Valor 0 não tem distância definida (NULLIF em taxa_analisada): a combinação fica sem histórico
+		valido = valores != 0
+		divisor_valor = np.where(valido, valores, 1.0)[:, None]
+		divisor_prazo = np.where(prazos != 0, prazos, 1.0)[:, None]
+		pesos = 1 / (
+			1
+			+ np.abs(h_valor[None, :] - valores[:, None]) / divisor_valor
+			+ np.abs(h_prazo[None, :] - prazos[:, None]) / divisor_prazo
+		)
+		soma_pesos = pesos.sum(axis=1)
+		medias_min = np.where(valido, (pesos @ h_min) / soma_pesos, np.nan)
+		medias_max = np.where(valido, (pesos @ h_max) / soma_pesos, np.nan)
+
+	resultados = []
+	for (valor, prazo, score), media_min, media_max in zip(cotacoes, medias_min.tolist(), medias_max.tolist()):
+		min_taxa, max_taxa = faixas[faixa_do_score(score)[0]]
+		sem_historico = np.isnan(media_min)
+		resultado = _sugestao(min_taxa, max_taxa, None if sem_historico else media_min, None if sem_historico else media_max)
+		resultados.append({"valor": valor, "prazo": prazo, "score": score, **resultado})
+	return resultados
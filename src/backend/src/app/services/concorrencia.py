@@ -0,0 +1,44 @@
+"""
+Controle de concorrência otimista de negociações e propostas.
+
+As duas tabelas têm a coluna ``versao`` (``version_id_col`` dos modelos): todo UPDATE do ORM leva
+``WHERE versao = <versão lida>`` e incrementa a versão. Se outra transação gravou a linha depois da
+leitura, o UPDATE não encontra a linha e o SQLAlchemy levanta StaleDataError, convertida aqui em
+ConflitoConcorrenciaError (HTTP 409: o cliente relê e tenta de novo). O cliente também pode mandar a
+versão que leu (``versao``) para a gravação só valer se ninguém tiver mudado a linha desde então.
+"""
+
+from functools import wraps
+from typing import Optional
+
+from sqlalchemy.orm.exc import StaleDataError
+
+
+class ConflitoConcorrenciaError(RuntimeError):
+    """A negociação ou proposta foi alterada por outra requisição desde que foi lida."""
+
+
+def verificar_versao(objeto, versao_esperada: Optional[int]) -> None:
+    """Levanta ConflitoConcorrenciaError se o cliente informou uma versão diferente da atual."""
+    if versao_esperada is not None and objeto.versao != versao_esperada:
+        raise ConflitoConcorrenciaError(
+            f"{type(objeto).__name__} {objeto.id} está na versão {objeto.versao}, não na {versao_esperada}"
+        )
+
+
+def detectar_conflito(funcao):
+    """
+    Para serviços que gravam negociações/propostas (recebem ``db`` como primeiro argumento): desfaz a
+    transação e levanta ConflitoConcorrenciaError quando a versão gravada não é mais a lida.
+    """
+
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        db = kwargs["db"] if "db" in kwargs else args[0]
+        try:
+            return funcao(*args, **kwargs)
+        except StaleDataError as exc:
+            db.rollback()
+            raise ConflitoConcorrenciaError("A negociação ou proposta foi alterada por outra requisição; tente novamente") from exc
+
+    return executar
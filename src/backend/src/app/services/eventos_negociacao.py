@@ -0,0 +1,279 @@
+"""
+Log de eventos das negociações (outbox transacional) e despacho para consumidores assíncronos.
+
+Cada mudança de estado de uma negociação grava um evento em ``eventos_negociacao`` na mesma transação
+(``registrar_evento``, sem commit): se a transação for desfeita, o evento some junto. Os efeitos que
+não precisam acontecer dentro da requisição (features de crédito do tomador, faixas de mercado,
+métricas do investidor, ancoragem do contrato na blockchain) são consumidores do log, executados pelo agendador fora do
+caminho do aceite.
+
+Entrega: pelo menos uma vez, em ordem. Cada consumidor guarda em ``consumidores_eventos`` a posição do
+último evento processado e, numa transação, lê o lote seguinte, executa e avança a posição; o que o
+consumidor grava no banco vai no mesmo commit que o avanço (só efeitos fora do banco, como a
+blockchain, podem se repetir se o processo cair entre o efeito e o commit). Os eventos são lidos em
+ordem de (id da transação que gravou, id) e só de transações anteriores ao xmin do snapshot, ou seja,
+já encerradas: um evento de uma transação ainda aberta, que pode ter id menor que eventos já
+visíveis, nunca fica para trás da posição. Uma transação longa no banco atrasa a entrega até terminar.
+
+Vários workers podem despachar o mesmo consumidor: a posição é travada com SKIP LOCKED e quem não a
+obtém deixa o lote para o outro. Um lote que falha é desfeito e refeito só até o primeiro evento do
+consumidor; o evento que falhar ``MAX_TENTATIVAS`` vezes seguidas é descartado (com log de erro) para
+não parar o consumidor.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from sqlalchemy import BigInteger, func, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.models.emprestimo import Emprestimo
+from app.models.evento_negociacao import XID8, ConsumidorEventos, EventoNegociacao
+from app.models.negociacao import Negociacao
+from app.services.blockchain import registrar_hash_na_blockchain
+from app.services.cache_taxas import invalidar_faixa
+from app.services.faixa_mercado import FaixaMercadoService
+from app.services.features_credito import FeaturesCreditoService
+from app.services.metricas import MetricasInvestidorService
+
+
+logger = logging.getLogger(__name__)
+
+# Intervalo da tarefa de despacho de cada consumidor
+INTERVALO_DESPACHO = float(os.getenv("EVENTOS_NEGOCIACAO_INTERVALO_S", "1"))
+# Falhas seguidas no mesmo evento antes de descartá-lo
+MAX_TENTATIVAS = int(os.getenv("EVENTOS_NEGOCIACAO_MAX_TENTATIVAS", "5"))
+# Registro dos contratos na blockchain (desligado por padrão: depende da rede e da carteira configuradas)
+ANCORAGEM_BLOCKCHAIN = os.getenv("ANCORAGEM_BLOCKCHAIN", "0") == "1"
+
+# Tipos de evento
+NEGOCIACAO_CRIADA = "negociacao_criada"
+NEGOCIACAO_ATUALIZADA = "negociacao_atualizada"
+STATUS_ALTERADO = "status_alterado"
+EMPRESTIMO_CRIADO = "emprestimo_criado"
+PROPOSTA_ACEITA = "proposta_aceita"
+
+
+def registrar_evento(db: Session, negociacao_id: int, tipo: str, dados: Optional[Dict[str, Any]] = None) -> None:
+    """Acrescenta um evento ao log na transação corrente (sem commit)."""
+    db.add(EventoNegociacao(id_negociacoes=negociacao_id, tipo=tipo, dados=dados or {}))
+
+
+@dataclass(frozen=True)
+class Consumidor:
+    """
+    ``funcao`` recebe os eventos do lote com os tipos do consumidor e grava na sessão sem commit; pode
+    retornar uma função a executar depois do commit (ex.: invalidar caches).
+    """
+
+    nome: str
+    tipos: FrozenSet[str]
+    funcao: Callable[[Session, List[EventoNegociacao]], Optional[Callable[[], None]]]
+    lote: int = 100
+
+
+CONSUMIDORES: Dict[str, Consumidor] = {}
+
+
+def registrar_consumidor(consumidor: Consumidor) -> None:
+    CONSUMIDORES[consumidor.nome] = consumidor
+
+
+def _pendentes(db: Session, posicao: ConsumidorEventos, lote: int) -> List[EventoNegociacao]:
+    """Próximos eventos depois da posição, só de transações já encerradas (abaixo do xmin do snapshot)."""
+    return (
+        db.query(EventoNegociacao)
+        .filter(
+            tuple_(EventoNegociacao.id_transacao, EventoNegociacao.id)
+            > tuple_(posicao.ultima_transacao, posicao.ultimo_id, types=(XID8(), BigInteger())),
+            EventoNegociacao.id_transacao < func.pg_snapshot_xmin(func.pg_current_snapshot()),
+        )
+        .order_by(EventoNegociacao.id_transacao, EventoNegociacao.id)
+        .limit(lote)
+        .all()
+    )
+
+
+def _registrar_falha(db: Session, consumidor: Consumidor, ultimo_id: int, lote: List[tuple], isolado: bool, erro: Exception) -> None:
+    """
+    Conta a falha na posição do consumidor. Com o evento que falha isolado (último do lote), descarta-o
+    depois de ``MAX_TENTATIVAS`` falhas seguidas.
+    """
+    posicao = (
+        db.query(ConsumidorEventos)
+        .filter(ConsumidorEventos.consumidor == consumidor.nome)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    if posicao.ultimo_id != ultimo_id:
+        # Outro worker já passou deste lote
+        db.rollback()
+        return
+
+    posicao.tentativas += 1
+    posicao.ultimo_erro = f"{type(erro).__name__}: {erro}"
+    posicao.atualizado_em = datetime.utcnow()
+    if isolado and posicao.tentativas >= MAX_TENTATIVAS:
+        id_transacao, evento_id, tipo = lote[-1]
+        logger.error(
+            "Consumidor %s descartou o evento %s (%s) após %s tentativas: %s",
+            consumidor.nome, evento_id, tipo, posicao.tentativas, posicao.ultimo_erro,
+        )
+        posicao.ultima_transacao, posicao.ultimo_id, posicao.tentativas = id_transacao, evento_id, 0
+    else:
+        logger.warning("Consumidor %s falhou (tentativa %s): %s", consumidor.nome, posicao.tentativas, posicao.ultimo_erro)
+    db.commit()
+
+
+def _processar_lote(db: Session, consumidor: Consumidor) -> Optional[int]:
+    """
+    Processa o próximo lote do consumidor numa transação e retorna quantos eventos leu (0: em dia), ou
+    None se o lote falhou ou outro worker está com o consumidor.
+    """
+    posicao = (
+        db.query(ConsumidorEventos)
+        .filter(ConsumidorEventos.consumidor == consumidor.nome)
+        .populate_existing()
+        .one()
+    )
+    eventos = _pendentes(db, posicao, consumidor.lote)
+    if not eventos:
+        db.rollback()
+        return 0
+    relevantes = [evento for evento in eventos if evento.tipo in consumidor.tipos]
+    # Depois de uma falha, o lote vai só até o primeiro evento do consumidor, para isolar o que falha
+    isolado = bool(posicao.tentativas) and bool(relevantes)
+    if isolado:
+        eventos = eventos[: eventos.index(relevantes[0]) + 1]
+        relevantes = relevantes[:1]
+
+    # Só trava a posição (e só então a transação escreve) se houver o que processar e ninguém a tiver
+    # movido desde a leitura; se outro worker estiver com ela, o lote fica com ele
+    ultimo_id = posicao.ultimo_id
+    travada = (
+        db.query(ConsumidorEventos.consumidor)
+        .filter(ConsumidorEventos.consumidor == consumidor.nome, ConsumidorEventos.ultimo_id == ultimo_id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if travada is None:
+        db.rollback()
+        return None
+
+    lidos = [(evento.id_transacao, evento.id, evento.tipo) for evento in eventos]
+    depois_do_commit = None
+    try:
+        if relevantes:
+            depois_do_commit = consumidor.funcao(db, relevantes)
+        db.flush()
+    except Exception as exc:
+        db.rollback()
+        _registrar_falha(db, consumidor, ultimo_id, lidos, isolado, exc)
+        return None
+
+    id_transacao, evento_id, _ = lidos[-1]
+    db.execute(
+        update(ConsumidorEventos)
+        .where(ConsumidorEventos.consumidor == consumidor.nome)
+        .values(
+            ultima_transacao=id_transacao,
+            ultimo_id=evento_id,
+            tentativas=0,
+            ultimo_erro=None,
+            atualizado_em=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if depois_do_commit is not None:
+        depois_do_commit()
+    return len(lidos)
+
+
+def despachar(db: Session, nome: str) -> int:
+    """Entrega ao consumidor ``nome`` os eventos pendentes, em lotes, e retorna quantos foram processados."""
+    consumidor = CONSUMIDORES[nome]
+    if db.get(ConsumidorEventos, nome) is None:
+        db.execute(insert(ConsumidorEventos).values(consumidor=nome).on_conflict_do_nothing())
+        db.commit()
+
+    processados = 0
+    while True:
+        lidos = _processar_lote(db, consumidor)
+        if lidos is None:
+            break
+        processados += lidos
+        if lidos == 0:
+            break
+    return processados
+
+
+def despachar_agendado(nome: str) -> None:
+    """Tarefa do agendador: despacho de um consumidor com sessão própria."""
+    db = SessionLocal()
+    try:
+        despachar(db, nome)
+    finally:
+        db.close()
+
+
+def _atualizar_features_credito(db: Session, eventos: List[EventoNegociacao]) -> None:
+    # A atualização recalcula a negociação inteira: uma vez por negociação do lote basta
+    for negociacao_id in dict.fromkeys(evento.id_negociacoes for evento in eventos):
+        FeaturesCreditoService.atualizar_por_negociacao(db, negociacao_id)
+
+
+def _atualizar_metricas_investidor(db: Session, eventos: List[EventoNegociacao]) -> None:
+    for evento in eventos:
+        MetricasInvestidorService.registrar_emprestimo(
+            db,
+            investidor_id=evento.dados["id_investidor"],
+            tomador_id=evento.dados["id_tomador"],
+            valor=evento.dados["valor"],
+            taxa=evento.dados["taxa"],
+        )
+
+
+def _recalcular_faixas_mercado(db: Session, eventos: List[EventoNegociacao]) -> Callable[[], None]:
+    # Os histogramas já têm os aceites (mesmo commit do aceite): um recálculo por lote basta
+    alteradas = FaixaMercadoService.recalcular_faixas(db)
+
+    def invalidar() -> None:
+        for faixa in alteradas:
+            invalidar_faixa(faixa)
+
+    return invalidar
+
+
+def _ancorar_na_blockchain(db: Session, eventos: List[EventoNegociacao]) -> None:
+    for evento in eventos:
+        emprestimo = db.query(Emprestimo).filter(Emprestimo.id_negociacoes == evento.id_negociacoes).first()
+        # Evento repetido (entrega pelo menos uma vez): o contrato já foi registrado
+        if emprestimo is None or emprestimo.hash_onchain:
+            continue
+        hash_onchain = registrar_hash_na_blockchain(contrato_tx_hash=evento.dados["contrato_tx_hash"])["tx_hash"]
+        emprestimo.hash_onchain = hash_onchain
+        db.execute(
+            update(Negociacao)
+            .where(Negociacao.id == evento.id_negociacoes)
+            .values(hash_onchain=hash_onchain, versao=Negociacao.versao + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+registrar_consumidor(Consumidor(
+    "features_credito",
+    frozenset({NEGOCIACAO_CRIADA, NEGOCIACAO_ATUALIZADA, STATUS_ALTERADO}),
+    _atualizar_features_credito,
+))
+registrar_consumidor(Consumidor("faixas_mercado", frozenset({PROPOSTA_ACEITA}), _recalcular_faixas_mercado))
+registrar_consumidor(Consumidor("metricas_investidor", frozenset({EMPRESTIMO_CRIADO}), _atualizar_metricas_investidor))
+if ANCORAGEM_BLOCKCHAIN:
+    # Um contrato por transação: cada registro espera a confirmação da rede
+    registrar_consumidor(Consumidor("blockchain", frozenset({EMPRESTIMO_CRIADO}), _ancorar_na_blockchain, lote=1))
@@ -0,0 +1,250 @@
+"""
+Faixas de mercado (taxa mínima e máxima aceitas) por decil de score do tomador.
+
+``histogramas_taxas`` guarda, por decil de score (0-99, 100-199, ..., 900-1000), quantas vezes cada taxa
+aparece como ponta da faixa de uma proposta aceita. A faixa de mercado do decil é o intervalo p10-p90
+dessa distribuição (mesma interpolação de ``percentile_cont``), então uma taxa isolada não desloca a
+faixa. Decis com menos de ``MINIMO_AMOSTRAS`` amostras juntam os decis vizinhos até ter amostras
+suficientes. Cada aceite incrementa o histograma no mesmo commit, com um upsert atômico por classe; as
+faixas em ``faixas_mercado`` são recalculadas fora do aceite, pelo consumidor do evento
+``proposta_aceita`` (app/services/eventos_negociacao.py). A reconstrução periódica refaz os histogramas
+a partir das propostas aceitas, corrigindo tomadores que mudaram de decil desde o aceite.
+"""
+
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.models.faixa_mercado import FaixaMercado
+from app.services.cache_taxas import invalidar_faixa
+
+
+# (faixa, score mínimo, score máximo) de cada decil, na ordem dos decis
+FAIXAS_SCORE = tuple(
+    (f"{decil * 100}-{decil * 100 + 99 if decil < 9 else 1000}", decil * 100, decil * 100 + 99 if decil < 9 else 1000)
+    for decil in range(10)
+)
+
+# Faixa usada quando ainda não há propostas aceitas
+TAXA_MIN_PADRAO = 10.0
+TAXA_MAX_PADRAO = 30.0
+
+# Percentis que definem a faixa de mercado
+PERCENTIL_MIN = 0.10
+PERCENTIL_MAX = 0.90
+
+# Amostras mínimas para um decil ter faixa própria (abaixo disso, junta os decis vizinhos)
+MINIMO_AMOSTRAS = int(os.getenv("FAIXAS_MERCADO_MIN_AMOSTRAS", "10"))
+
+INTERVALO_RECONSTRUCAO = float(os.getenv("FAIXAS_MERCADO_INTERVALO_S", "3600"))
+
+# Chave do advisory lock dos histogramas: aceites e recálculo das faixas o pegam compartilhado (não
+# esperam uns pelos outros); só a reconstrução, que apaga e refaz os histogramas, o pega exclusivo
+_CHAVE_LOCK = 5011
+
+# Espera máxima da reconstrução pelos aceites em andamento
+LOCK_TIMEOUT_RECONSTRUCAO = os.getenv("FAIXAS_MERCADO_LOCK_TIMEOUT", "5s")
+
+# Mesma regra de decil_do_score, para s.valor_score
+_DECIL_SQL = "LEAST(GREATEST(FLOOR(s.valor_score / 100), 0), 9)::smallint"
+
+
+def decil_do_score(score: float) -> int:
+    return min(max(int(score // 100), 0), 9)
+
+
+def faixa_do_score(score: float) -> Tuple[str, int, int]:
+    """Faixa de score (nome, mínimo, máximo) do decil do score informado."""
+    return FAIXAS_SCORE[decil_do_score(score)]
+
+
+def centesimos(taxa: float) -> int:
+    """Taxa em centésimos de ponto percentual (classe do histograma)."""
+    return int(round(taxa * 100))
+
+
+def percentil(histograma: Sequence[Tuple[int, int]], p: float) -> float:
+    """
+    Percentil ``p`` (0 a 1) de um histograma [(taxa em centésimos, quantidade)] ordenado pela taxa,
+    com a interpolação linear de ``percentile_cont``.
+    """
+    total = sum(quantidade for _, quantidade in histograma)
+    posicao = p * (total - 1)
+    indices = (math.floor(posicao), math.ceil(posicao))
+    valores = []
+    acumulado = 0
+    for classe, quantidade in histograma:
+        acumulado += quantidade
+        while len(valores) < 2 and indices[len(valores)] < acumulado:
+            valores.append(classe / 100)
+        if len(valores) == 2:
+            break
+    return valores[0] + (posicao - indices[0]) * (valores[1] - valores[0])
+
+
+def faixas_dos_histogramas(histogramas: Dict[int, Dict[int, int]]) -> Dict[int, Optional[Tuple[float, float, int]]]:
+    """(p10, p90, amostras) de cada decil; decis com poucas amostras juntam os vizinhos. None sem amostras."""
+    faixas: Dict[int, Optional[Tuple[float, float, int]]] = {}
+    for decil in range(10):
+        for raio in range(10):
+            juntos: Counter = Counter()
+            for vizinho in range(max(decil - raio, 0), min(decil + raio, 9) + 1):
+                juntos.update(histogramas.get(vizinho, {}))
+            amostras = sum(juntos.values())
+            if amostras >= MINIMO_AMOSTRAS:
+                break
+        if amostras == 0:
+            faixas[decil] = None
+            continue
+        histograma = sorted(juntos.items())
+        faixas[decil] = (
+            round(percentil(histograma, PERCENTIL_MIN), 2),
+            round(percentil(histograma, PERCENTIL_MAX), 2),
+            amostras,
+        )
+    return faixas
+
+
+class FaixaMercadoService:
+    """Leitura e manutenção de ``faixas_mercado`` e ``histogramas_taxas``."""
+
+    @staticmethod
+    def obter_faixa(db: Session, score: float) -> Tuple[float, float]:
+        """(taxa mínima, taxa máxima) da faixa do score; padrão 10-30 se ainda não há aceites."""
+        faixa = db.get(FaixaMercado, faixa_do_score(score)[0])
+        if faixa is None or faixa.taxa_min is None or faixa.taxa_max is None:
+            return TAXA_MIN_PADRAO, TAXA_MAX_PADRAO
+        return faixa.taxa_min, faixa.taxa_max
+
+    @staticmethod
+    def obter_faixas(db: Session) -> Dict[str, Tuple[float, float]]:
+        """(taxa mínima, taxa máxima) de todas as faixas numa consulta, pelo nome da faixa de score."""
+        faixas = {nome: (TAXA_MIN_PADRAO, TAXA_MAX_PADRAO) for nome, _, _ in FAIXAS_SCORE}
+        for faixa in db.query(FaixaMercado).all():
+            if faixa.faixa in faixas and faixa.taxa_min is not None and faixa.taxa_max is not None:
+                faixas[faixa.faixa] = (faixa.taxa_min, faixa.taxa_max)
+        return faixas
+
+    @staticmethod
+    def _recalcular_faixas(db: Session) -> List[str]:
+        """Recalcula ``faixas_mercado`` a partir dos histogramas e retorna as faixas que mudaram. Não faz commit."""
+        histogramas: Dict[int, Dict[int, int]] = {}
+        for decil, classe, quantidade in db.execute(
+            text("SELECT decil, taxa_centesimos, quantidade FROM histogramas_taxas WHERE quantidade > 0")
+        ):
+            histogramas.setdefault(decil, {})[classe] = quantidade
+
+        atuais = {faixa.faixa: faixa for faixa in db.query(FaixaMercado).all()}
+        agora = datetime.utcnow()
+        alteradas = []
+        for decil, calculada in faixas_dos_histogramas(histogramas).items():
+            nome, score_min, score_max = FAIXAS_SCORE[decil]
+            taxa_min, taxa_max, quantidade = calculada or (None, None, 0)
+            faixa = atuais.get(nome)
+            if faixa is None:
+                faixa = FaixaMercado(faixa=nome, score_min=score_min, score_max=score_max)
+                db.add(faixa)
+            elif (faixa.taxa_min, faixa.taxa_max, faixa.quantidade) == (taxa_min, taxa_max, quantidade):
+                continue
+            faixa.taxa_min, faixa.taxa_max, faixa.quantidade = taxa_min, taxa_max, quantidade
+            faixa.atualizado_em = agora
+            alteradas.append(nome)
+        return alteradas
+
+    @staticmethod
+    def registrar_aceite(db: Session, taxa_min: Optional[float], taxa_max: Optional[float], id_tomador: int) -> None:
+        """
+        Soma a taxa aceita ao histograma do decil de score atual do tomador. Não recalcula as faixas
+        (ver recalcular_faixas) nem faz commit.
+        """
+        if taxa_min is None or taxa_max is None:
+            return
+        score = db.execute(
+            text("SELECT valor_score FROM scores_credito WHERE id_usuarios = :id_tomador"),
+            {"id_tomador": id_tomador},
+        ).scalar()
+        if score is None:
+            return
+
+        # Compartilhado: aceites simultâneos não se esperam, só a reconstrução espera por eles
+        db.execute(text("SELECT pg_advisory_xact_lock_shared(:chave)"), {"chave": _CHAVE_LOCK})
+        decil = decil_do_score(float(score))
+        for classe, quantidade in Counter((centesimos(taxa_min), centesimos(taxa_max))).items():
+            db.execute(
+                text(
+                    """
+                    INSERT INTO histogramas_taxas (decil, taxa_centesimos, quantidade)
+                    VALUES (:decil, :classe, :quantidade)
+                    ON CONFLICT (decil, taxa_centesimos) DO UPDATE
+                        SET quantidade = histogramas_taxas.quantidade + EXCLUDED.quantidade
+                    """
+                ),
+                {"decil": decil, "classe": classe, "quantidade": quantidade},
+            )
+
+    @staticmethod
+    def recalcular_faixas(db: Session) -> List[str]:
+        """
+        Recalcula ``faixas_mercado`` a partir dos histogramas (fora do aceite) e retorna as faixas que
+        mudaram, para invalidar caches depois do commit. Não faz commit.
+        """
+        db.execute(text("SELECT pg_advisory_xact_lock_shared(:chave)"), {"chave": _CHAVE_LOCK})
+        return FaixaMercadoService._recalcular_faixas(db)
+
+    @staticmethod
+    def reconstruir(db: Session) -> bool:
+        """
+        Refaz os histogramas a partir das propostas aceitas e do score atual dos tomadores e recalcula
+        as faixas. Espera até ``LOCK_TIMEOUT_RECONSTRUCAO`` pelos aceites em andamento; se não conseguir
+        o lock, retorna False sem fazer nada (tenta de novo na próxima execução).
+        """
+        db.execute(text("SELECT set_config('lock_timeout', :espera, true)"), {"espera": LOCK_TIMEOUT_RECONSTRUCAO})
+        try:
+            db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": _CHAVE_LOCK})
+        except OperationalError:
+            db.rollback()
+            return False
+        db.execute(text("SELECT set_config('lock_timeout', '0', true)"))
+
+        db.execute(text("DELETE FROM histogramas_taxas"))
+        db.execute(
+            text(
+                f"""
+                INSERT INTO histogramas_taxas (decil, taxa_centesimos, quantidade)
+                SELECT {_DECIL_SQL}, ROUND(t.taxa * 100)::int, COUNT(*)
+                FROM propostas p
+                JOIN negociacoes n ON n.id = p.id_negociacoes
+                JOIN scores_credito s ON s.id_usuarios = n.id_tomador
+                CROSS JOIN LATERAL (VALUES (p.taxa_min), (p.taxa_max)) t(taxa)
+                WHERE p.status = 'aceita'
+                    AND p.taxa_min IS NOT NULL
+                GROUP BY 1, 2
+                """
+            )
+        )
+        # Faixas de uma divisão de score anterior
+        db.execute(
+            text("DELETE FROM faixas_mercado WHERE faixa <> ALL(:faixas)"),
+            {"faixas": [nome for nome, _, _ in FAIXAS_SCORE]},
+        )
+        alteradas = FaixaMercadoService._recalcular_faixas(db)
+        db.commit()
+        for faixa in alteradas:
+            invalidar_faixa(faixa)
+        return True
+
+    @staticmethod
+    def reconstruir_agendado() -> None:
+        """Tarefa do agendador: reconstrução com sessão própria."""
+        db = SessionLocal()
+        try:
+            FaixaMercadoService.reconstruir(db)
+        finally:
+            db.close()
@@ -0,0 +1,292 @@
+"""
+Armazenamento incremental das features de crédito.
+
+Cada negociação guarda sua contribuição para os agregados do tomador (``features_credito_negociacoes``);
+quando uma negociação ou suas propostas mudam, a contribuição é recalculada (só aquela negociação) e a
+diferença é aplicada à linha do usuário em ``features_credito``. O score lê uma linha por usuário em vez
+de agregar todo o histórico. Recalcular a mesma negociação duas vezes não altera o resultado.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.models.features_credito import (
+    CONTADORES_FEATURES,
+    FeaturesCredito,
+    FeaturesCreditoNegociacao,
+)
+
+
+# Ponto médio da faixa numérica de p.taxa_sugerida exposto como t.taxa; NULL se a taxa está fora do formato.
+_TAXA_MEDIA_LATERAL_SQL = """
+    CROSS JOIN LATERAL (
+        SELECT (p.taxa_min + p.taxa_max) / 2 AS taxa
+    ) t"""
+
+# Contribuição por negociação para os agregados do tomador. É a única definição das regras das features:
+# o score lê os agregados mantidos com ela e o treino (model/treino_streaming.py) a aplica ao estado do
+# banco no instante de corte. Um empréstimo conta a partir da assinatura (o aceite da proposta assina a
+# negociação) e fica em aberto até ser quitado ou ficar inadimplente.
+_CONTRIBUICOES_SQL = rf"""
+    SELECT n.id AS id_negociacoes,
+           n.id_tomador,
+           (n.assinado_em IS NOT NULL)::int AS emprestimos_contratados,
+           (n.status = 'quitado')::int AS emprestimos_quitados,
+           (n.status = 'inadimplente')::int AS emprestimos_inadimplentes,
+           COALESCE(EXTRACT(EPOCH FROM n.assinado_em), 0)::float AS soma_assinatura_epoch,
+           CASE WHEN n.assinado_em IS NULL THEN 0
+                ELSE COALESCE(SUM(t.taxa) FILTER (WHERE p.status = 'aceita'), 0) END::float AS soma_taxa_juros,
+           CASE WHEN n.assinado_em IS NULL THEN 0
+                ELSE COUNT(t.taxa) FILTER (WHERE p.status = 'aceita') END AS qtd_taxa_juros,
+           CASE WHEN n.assinado_em IS NULL THEN 0
+                ELSE COALESCE(SUM(p.prazo_meses) FILTER (WHERE p.status = 'aceita'), 0) END::float AS soma_prazo,
+           CASE WHEN n.assinado_em IS NULL THEN 0
+                ELSE COUNT(p.prazo_meses) FILTER (WHERE p.status = 'aceita') END AS qtd_prazo,
+           CASE WHEN n.assinado_em IS NULL OR n.status IN ('quitado', 'inadimplente') THEN 0
+                ELSE COALESCE(SUM(p.valor) FILTER (WHERE p.status = 'aceita'), 0) END::float AS divida_aberta,
+           COUNT(p.id) FILTER (WHERE p.autor_tipo = 'tomador') AS propostas_realizadas,
+           CASE WHEN n.assinado_em IS NULL THEN 0
+                ELSE COUNT(p.id) FILTER (WHERE p.autor_tipo = 'tomador' AND p.status = 'aceita') END AS propostas_aceitas,
+           MIN(p.criado_em) FILTER (WHERE p.autor_tipo = 'tomador') AS primeira_proposta_em
+    FROM {{negociacoes}} n
+    LEFT JOIN {{propostas}} p ON p.id_negociacoes = n.id
+    {_TAXA_MEDIA_LATERAL_SQL}
+    WHERE {{filtro}}
+    GROUP BY n.id, n.id_tomador, n.assinado_em, n.status
+"""
+
+# Negociações e propostas como estavam no instante :corte. Sem histórico de status, um desfecho (quitado
+# ou inadimplente) vale a partir do atualizado_em da negociação; antes disso ela estava em andamento.
+# Uma proposta aceita só conta com a negociação assinada, e o aceite assina a negociação: as aceitas
+# depois do corte ficam de fora pelo assinado_em.
+_NEGOCIACOES_NO_CORTE_SQL = """(
+        SELECT id,
+               id_tomador,
+               CASE WHEN assinado_em < :corte THEN assinado_em END AS assinado_em,
+               CASE WHEN status IN ('quitado', 'inadimplente') AND atualizado_em >= :corte THEN 'em_andamento'
+                    ELSE status END AS status
+        FROM negociacoes
+        WHERE criado_em < :corte
+    )"""
+_PROPOSTAS_NO_CORTE_SQL = "(SELECT * FROM propostas WHERE criado_em < :corte)"
+
+
+def contribuicoes_sql(filtro: str, no_corte: bool = False) -> str:
+    """
+    SQL das contribuições das negociações que atendem ``filtro`` (sobre ``n``); com ``no_corte``, do
+    estado do banco no instante do parâmetro ``:corte``.
+    """
+    if no_corte:
+        return _CONTRIBUICOES_SQL.format(
+            negociacoes=_NEGOCIACOES_NO_CORTE_SQL, propostas=_PROPOSTAS_NO_CORTE_SQL, filtro=filtro
+        )
+    return _CONTRIBUICOES_SQL.format(negociacoes="negociacoes", propostas="propostas", filtro=filtro)
+
+
+_COLUNAS = ", ".join(CONTADORES_FEATURES)
+_SOMAS = ", ".join(f"COALESCE(SUM(c.{coluna}), 0)" for coluna in CONTADORES_FEATURES)
+
+
+class FeaturesCreditoService:
+    """Manutenção incremental e leitura das features de crédito."""
+
+    @staticmethod
+    def _contribuicao(db: Session, negociacao_id: int) -> Optional[Dict[str, Any]]:
+        row = db.execute(
+            text(contribuicoes_sql("n.id = :negociacao_id")),
+            {"negociacao_id": negociacao_id},
+        ).mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _aplicar_delta(
+        db: Session,
+        usuario_id: int,
+        delta: Mapping[str, float],
+        primeira_proposta_em: Optional[datetime] = None,
+    ) -> bool:
+        """Soma ``delta`` à linha do usuário; retorna False se a linha ainda não existe."""
+        valores = {coluna: getattr(FeaturesCredito, coluna) + delta[coluna] for coluna in CONTADORES_FEATURES}
+        valores["atualizado_em"] = datetime.utcnow()
+        if primeira_proposta_em is not None:
+            valores["primeira_proposta_em"] = func.least(FeaturesCredito.primeira_proposta_em, primeira_proposta_em)
+        resultado = db.execute(
+            update(FeaturesCredito).where(FeaturesCredito.id_usuarios == usuario_id).values(**valores)
+        )
+        return resultado.rowcount > 0
+
+    @staticmethod
+    def _recalcular_primeira_proposta(db: Session, usuario_id: int) -> None:
+        db.execute(
+            text(
+                """
+                UPDATE features_credito f
+                SET primeira_proposta_em = (
+                    SELECT MIN(c.primeira_proposta_em) FROM features_credito_negociacoes c WHERE c.id_tomador = f.id_usuarios
+                )
+                WHERE f.id_usuarios = :usuario_id
+                """
+            ),
+            {"usuario_id": usuario_id},
+        )
+
+    @staticmethod
+    def inicializar(db: Session, id_inicio: int, id_fim: int) -> None:
+        """
+        Cria as linhas ausentes de ``features_credito`` para os usuários de [id_inicio, id_fim] a partir do
+        histórico (uso na primeira leitura de um usuário ou como backfill). Não faz commit.
+        """
+        params = {"id_inicio": id_inicio, "id_fim": id_fim}
+        filtro = (
+            "n.id_tomador BETWEEN :id_inicio AND :id_fim "
+            "AND NOT EXISTS (SELECT 1 FROM features_credito f WHERE f.id_usuarios = n.id_tomador)"
+        )
+        db.execute(
+            text(
+                f"""
+                INSERT INTO features_credito_negociacoes (id_negociacoes, id_tomador, {_COLUNAS}, primeira_proposta_em)
+                SELECT id_negociacoes, id_tomador, {_COLUNAS}, primeira_proposta_em
+                FROM ({contribuicoes_sql(filtro)}) contribuicoes
+                ON CONFLICT (id_negociacoes) DO NOTHING
+                """
+            ),
+            params,
+        )
+        db.execute(
+            text(
+                f"""
+                INSERT INTO features_credito (id_usuarios, {_COLUNAS}, primeira_proposta_em, atualizado_em)
+                SELECT u.id, {_SOMAS}, MIN(c.primeira_proposta_em), NOW()
+                FROM usuarios u
+                LEFT JOIN features_credito_negociacoes c ON c.id_tomador = u.id
+                WHERE u.id BETWEEN :id_inicio AND :id_fim
+                    AND NOT EXISTS (SELECT 1 FROM features_credito f WHERE f.id_usuarios = u.id)
+                GROUP BY u.id
+                ON CONFLICT (id_usuarios) DO NOTHING
+                """
+            ),
+            params,
+        )
+
+    @staticmethod
+    def reconstruir(db: Session, id_inicio: int, id_fim: int) -> None:
+        """Descarta e recria a partir do histórico as features dos usuários de [id_inicio, id_fim]."""
+        params = {"id_inicio": id_inicio, "id_fim": id_fim}
+        db.execute(text("DELETE FROM features_credito_negociacoes WHERE id_tomador BETWEEN :id_inicio AND :id_fim"), params)
+        db.execute(text("DELETE FROM features_credito WHERE id_usuarios BETWEEN :id_inicio AND :id_fim"), params)
+        FeaturesCreditoService.inicializar(db, id_inicio, id_fim)
+        db.commit()
+
+    @staticmethod
+    def atualizar_por_negociacao(db: Session, negociacao_id: int) -> None:
+        """
+        Recalcula a contribuição da negociação (e de suas propostas) e aplica a diferença nos agregados
+        do tomador. Deve ser chamado na mesma transação da escrita, antes do commit.
+        """
+        db.flush()
+
+        antiga = (
+            db.query(FeaturesCreditoNegociacao)
+            .filter(FeaturesCreditoNegociacao.id_negociacoes == negociacao_id)
+            .with_for_update()
+            .first()
+        )
+        nova = FeaturesCreditoService._contribuicao(db, negociacao_id)
+
+        anterior: Optional[Dict[str, Any]] = None
+        if antiga is not None:
+            anterior = {coluna: getattr(antiga, coluna) for coluna in CONTADORES_FEATURES}
+            tomador_anterior = antiga.id_tomador
+            db.delete(antiga)
+            db.flush()
+
+            # Negociação removida ou transferida para outro tomador: retira a contribuição do anterior
+            if nova is None or nova["id_tomador"] != tomador_anterior:
+                FeaturesCreditoService._aplicar_delta(
+                    db, tomador_anterior, {coluna: -valor for coluna, valor in anterior.items()}
+                )
+                FeaturesCreditoService._recalcular_primeira_proposta(db, tomador_anterior)
+                anterior = None
+
+        if nova is None:
+            return
+
+        delta = {
+            coluna: nova[coluna] - (anterior[coluna] if anterior else 0)
+            for coluna in CONTADORES_FEATURES
+        }
+        if FeaturesCreditoService._aplicar_delta(db, nova["id_tomador"], delta, nova["primeira_proposta_em"]):
+            db.add(FeaturesCreditoNegociacao(**nova))
+            db.flush()
+        else:
+            # Usuário ainda sem linha: monta tudo a partir do histórico (inclui esta negociação)
+            FeaturesCreditoService.inicializar(db, nova["id_tomador"], nova["id_tomador"])
+
+    @staticmethod
+    def _linhas(db: Session, id_inicio: int, id_fim: int) -> List[Mapping[str, Any]]:
+        return db.execute(
+            text(
+                """
+                SELECT u.id,
+                       u.cpf,
+                       EXTRACT(EPOCH FROM (NOW() - u.criado_em)) / 2629800.0 AS tempo_na_plataforma_meses,
+                       COALESCE(u.renda_mensal, 0) AS renda_mensal,
+                       f.id_usuarios AS id_features,
+                       f.*
+                FROM usuarios u
+                LEFT JOIN features_credito f ON f.id_usuarios = u.id
+                WHERE u.id BETWEEN :id_inicio AND :id_fim
+                ORDER BY u.id
+                """
+            ),
+            {"id_inicio": id_inicio, "id_fim": id_fim},
+        ).mappings().all()
+
+    @staticmethod
+    def linhas_features(db: Session, id_inicio: int, id_fim: int) -> List[Mapping[str, Any]]:
+        """Linhas de features (com ``id`` e ``cpf``) dos usuários de [id_inicio, id_fim], inicializando as ausentes."""
+        linhas = FeaturesCreditoService._linhas(db, id_inicio, id_fim)
+        if any(linha["id_features"] is None for linha in linhas):
+            FeaturesCreditoService.inicializar(db, id_inicio, id_fim)
+            linhas = FeaturesCreditoService._linhas(db, id_inicio, id_fim)
+        return linhas
+
+    @staticmethod
+    def analise_de_features(linha: Mapping[str, Any]) -> Dict[str, Any]:
+        """Deriva o dict ``analise`` (colunas FEATURE_COLUMNS do modelo) de uma linha de features."""
+        contratados = linha["emprestimos_contratados"] or 0
+        renda = float(linha["renda_mensal"] or 0)
+        primeira = linha["primeira_proposta_em"]
+
+        media_tempo = 0.0
+        if contratados and primeira is not None:
+            media_assinatura = linha["soma_assinatura_epoch"] / contratados
+            # primeira_proposta_em é "timestamp without time zone", como os demais campos do banco
+            primeira_epoch = (primeira - datetime(1970, 1, 1)).total_seconds()
+            media_tempo = (media_assinatura - primeira_epoch) / 86400.0
+
+        return {
+            "tempo_na_plataforma_meses": linha["tempo_na_plataforma_meses"] or 0,
+            "emprestimos_contratados": contratados,
+            "emprestimos_quitados": linha["emprestimos_quitados"] or 0,
+            "emprestimos_inadimplentes": linha["emprestimos_inadimplentes"] or 0,
+            "taxa_inadimplencia": (linha["emprestimos_inadimplentes"] / contratados) if contratados else 0.0,
+            "media_taxa_juros_paga": round(linha["soma_taxa_juros"] / linha["qtd_taxa_juros"], 2) if linha["qtd_taxa_juros"] else 0.0,
+            "media_prazo_contratado": round(linha["soma_prazo"] / linha["qtd_prazo"], 2) if linha["qtd_prazo"] else 0.0,
+            "renda_mensal": renda,
+            "endividamento_estimado": (linha["divida_aberta"] / renda) if renda else 0.0,
+            "propostas_realizadas": linha["propostas_realizadas"] or 0,
+            "propostas_aceitas": linha["propostas_aceitas"] or 0,
+            "media_tempo_negociacao_dias": media_tempo,
+        }
+
+    @staticmethod
+    def obter_analise(db: Session, usuario_id: int) -> Dict[str, Any]:
+        """Features do usuário lidas de uma única linha; dict vazio se o usuário não existir."""
+        linhas = FeaturesCreditoService.linhas_features(db, usuario_id, usuario_id)
+        if not linhas:
+            return {}
+        return FeaturesCreditoService.analise_de_features(linhas[0])
@@ -0,0 +1,283 @@
+"""
+Feed de eventos de propostas e negociações enviado aos clientes por Server-Sent Events (``GET /eventos``).
+
+Os serviços publicam depois do commit (proposta criada, aceita ou recusada; status da negociação
+alterado) e o broker repassa cada evento às conexões abertas deste processo cujo filtro o aceita:
+  - ``usuario_id``: eventos das propostas e negociações de que o usuário participa;
+  - ``perfil``: ofertas abertas (tipo 'inicial') do outro lado, ou seja, o que entraria ou sairia
+    do feed de recomendações desse perfil (investidor recebe as solicitações de tomadores e vice-versa).
+Sem filtro, a conexão recebe todos os eventos.
+
+Cada evento é serializado uma vez na publicação; a distribuição às conexões é feita no event loop,
+com um ``call_soon_threadsafe`` por loop (não por conexão), e só passa pelas conexões cujo filtro
+aceita o evento (índice por usuário e por perfil). O fluxo envia de uma vez tudo o que estiver na
+fila da conexão. Cada conexão tem uma fila limitada
+(``TAMANHO_FILA``): um cliente lento que a enche perde os eventos pendentes e recebe um único
+evento ``resync``, avisando que deve reler as listagens, sem travar a publicação nem os outros
+clientes. Os últimos ``HISTORICO`` eventos ficam em memória para a reconexão com ``Last-Event-ID``
+retomar de onde parou; se o id não estiver mais no histórico (ou for de outro processo), a conexão
+começa com ``resync``. Cada conexão termina depois de ``DURACAO_MAXIMA`` segundos e o EventSource
+reconecta com o ``Last-Event-ID``, sem perder eventos; isso também limita quanto o desligamento do
+servidor espera pelas conexões abertas.
+
+O broker é do processo: com vários workers, cada conexão só vê as escritas do seu worker.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from app.models.negociacao import Negociacao, NegociacaoResponse
+from app.models.proposta import Proposta, PropostaResponse
+
+
+TAMANHO_FILA = int(os.getenv("FEED_EVENTOS_FILA", "256"))
+HISTORICO = int(os.getenv("FEED_EVENTOS_HISTORICO", "1000"))
+INTERVALO_KEEPALIVE = float(os.getenv("FEED_EVENTOS_KEEPALIVE_S", "15"))
+DURACAO_MAXIMA = float(os.getenv("FEED_EVENTOS_DURACAO_MAX_S", "300"))
+
+PERFIS = ("investidor", "tomador")
+PERFIL_OPOSTO = {"investidor": "tomador", "tomador": "investidor"}
+
+EVENTO_RESYNC = "resync"
+
+# Chave do índice para conexões sem filtro
+_TODOS = ("todos",)
+
+
+@dataclass(frozen=True)
+class Evento:
+    id: int
+    tipo: str
+    usuarios: FrozenSet[int]
+    perfis: FrozenSet[str]
+    texto: str  # mensagem SSE já formatada
+
+    def chaves(self) -> Tuple[Tuple, ...]:
+        """Chaves do índice de conexões que recebem o evento."""
+        return (_TODOS, *(("usuario", usuario) for usuario in self.usuarios), *(("perfil", perfil) for perfil in self.perfis))
+
+    def visivel_para(self, usuario_id: Optional[int], perfil: Optional[str]) -> bool:
+        if usuario_id is None and perfil is None:
+            return True
+        return usuario_id in self.usuarios or perfil in self.perfis
+
+
+def formatar_sse(tipo: str, dados: Any, id_evento: Optional[str] = None) -> str:
+    linhas = [f"id: {id_evento}"] if id_evento is not None else []
+    linhas.append(f"event: {tipo}")
+    linhas.append(f"data: {json.dumps(dados, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(linhas) + "\n\n"
+
+
+@dataclass(eq=False)
+class Assinante:
+    """
+    Uma conexão aberta: filtro e fila limitada de mensagens SSE, consumida no event loop ``loop``.
+    A fila é um deque com um ``asyncio.Event`` de aviso (mais barato que ``asyncio.Queue`` por mensagem).
+    """
+
+    usuario_id: Optional[int]
+    perfil: Optional[str]
+    loop: asyncio.AbstractEventLoop
+    tamanho_fila: int
+    pendentes: Deque[str] = field(default_factory=deque, repr=False)
+    sinal: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    ultimo_id: int = 0
+    descartados: int = 0
+    resyncs: int = 0
+
+    def chaves(self) -> Tuple[Tuple, ...]:
+        """Chaves do índice de conexões em que esta conexão entra."""
+        if self.usuario_id is None and self.perfil is None:
+            return (_TODOS,)
+        return tuple(chave for chave in (("usuario", self.usuario_id), ("perfil", self.perfil)) if chave[1] is not None)
+
+    def cheia(self) -> bool:
+        return len(self.pendentes) >= self.tamanho_fila
+
+    def colocar(self, mensagem: str) -> None:
+        self.pendentes.append(mensagem)
+        if not self.sinal.is_set():
+            self.sinal.set()
+
+    def descartar(self) -> None:
+        self.descartados += len(self.pendentes)
+        self.pendentes.clear()
+
+    async def mensagens(self, keepalive: float, duracao: float):
+        """
+        Mensagens SSE por ``duracao`` segundos. Cada item junta tudo o que estiver na fila (um envio
+        por lote); None a cada ``keepalive`` segundos sem eventos.
+        """
+        fim = self.loop.time() + duracao
+        while (restante := fim - self.loop.time()) > 0:
+            if not self.pendentes:
+                self.sinal.clear()
+                try:
+                    await asyncio.wait_for(self.sinal.wait(), min(keepalive, restante))
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            lote = "".join(self.pendentes)
+            self.pendentes.clear()
+            yield lote
+
+
+class FeedEventos:
+    """Broker em memória dos eventos publicados pelos serviços deste processo."""
+
+    def __init__(self, tamanho_fila: int = TAMANHO_FILA, historico: int = HISTORICO):
+        self.tamanho_fila = tamanho_fila
+        # Identifica o processo nos ids dos eventos (ids de outro processo pedem resync)
+        self.instancia = uuid.uuid4().hex[:8]
+        self._sequencia = itertools.count(1)
+        self._historico: Deque[Evento] = deque(maxlen=historico)
+        # Conexões de cada event loop, indexadas pelas chaves do filtro (ver ``Assinante.chaves``)
+        self._assinantes: Dict[asyncio.AbstractEventLoop, Dict[Tuple, Set[Assinante]]] = {}
+        self._lock = threading.Lock()
+        self.publicados = 0
+
+    def id_externo(self, id_evento: int) -> str:
+        return f"{self.instancia}:{id_evento}"
+
+    def _id_interno(self, ultimo_id: Optional[str]) -> Optional[int]:
+        instancia, _, sequencia = (ultimo_id or "").partition(":")
+        if instancia != self.instancia or not sequencia.isdigit():
+            return None
+        return int(sequencia)
+
+    # -- Publicação (qualquer thread) --
+
+    def publicar(self, tipo: str, dados: Any, usuarios: Iterable[Optional[int]] = (), perfis: Iterable[str] = ()) -> Evento:
+        with self._lock:
+            id_evento = next(self._sequencia)
+            evento = Evento(
+                id=id_evento,
+                tipo=tipo,
+                usuarios=frozenset(usuario for usuario in usuarios if usuario is not None),
+                perfis=frozenset(perfis),
+                texto=formatar_sse(tipo, dados, self.id_externo(id_evento)),
+            )
+            self._historico.append(evento)
+            self.publicados += 1
+            loops = [loop for loop, assinantes in self._assinantes.items() if assinantes]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._distribuir, loop, evento)
+            except RuntimeError:
+                # Loop já fechado (encerramento): as conexões dele não recebem mais nada
+                pass
+        return evento
+
+    # -- Conexões (no event loop) --
+
+    def _distribuir(self, loop: asyncio.AbstractEventLoop, evento: Evento) -> None:
+        indice = self._assinantes.get(loop, {})
+        destinatarios: Set[Assinante] = set()
+        for chave in evento.chaves():
+            destinatarios.update(indice.get(chave, ()))
+        for assinante in destinatarios:
+            self._entregar(assinante, evento)
+
+    def _entregar(self, assinante: Assinante, evento: Evento) -> None:
+        if evento.id <= assinante.ultimo_id:
+            # Já entregue pela retomada do histórico (ou coberto por um resync)
+            return
+        if assinante.cheia():
+            self._resync(assinante, evento.id, "fila cheia")
+            return
+        assinante.colocar(evento.texto)
+        assinante.ultimo_id = evento.id
+
+    def _resync(self, assinante: Assinante, id_evento: int, motivo: str) -> None:
+        """Descarta os eventos pendentes e deixa só um ``resync`` (com o id até onde o cliente deve reler)."""
+        assinante.descartar()
+        assinante.resyncs += 1
+        assinante.ultimo_id = id_evento
+        assinante.colocar(formatar_sse(EVENTO_RESYNC, {"motivo": motivo}, self.id_externo(id_evento)))
+
+    def assinar(self, usuario_id: Optional[int] = None, perfil: Optional[str] = None, ultimo_id: Optional[str] = None) -> Assinante:
+        """
+        Abre uma conexão no event loop atual. Com ``ultimo_id`` (Last-Event-ID), a fila começa com os
+        eventos perdidos desde ele, ou com ``resync`` se não for possível recuperá-los.
+        """
+        if perfil is not None and perfil not in PERFIS:
+            raise ValueError("perfil deve ser 'investidor' ou 'tomador'")
+        loop = asyncio.get_running_loop()
+        assinante = Assinante(usuario_id, perfil, loop, self.tamanho_fila)
+        with self._lock:
+            ultimo_publicado = self._historico[-1].id if self._historico else 0
+            assinante.ultimo_id = ultimo_publicado
+            if ultimo_id is not None:
+                self._retomar(assinante, self._id_interno(ultimo_id), ultimo_publicado)
+            indice = self._assinantes.setdefault(loop, {})
+            for chave in assinante.chaves():
+                indice.setdefault(chave, set()).add(assinante)
+        return assinante
+
+    def _retomar(self, assinante: Assinante, desde: Optional[int], ultimo_publicado: int) -> None:
+        if desde is None or desde > ultimo_publicado:
+            self._resync(assinante, ultimo_publicado, "reconexão sem histórico")
+            return
+        mais_antigo = self._historico[0].id if self._historico else ultimo_publicado + 1
+        if desde + 1 < mais_antigo:
+            self._resync(assinante, ultimo_publicado, "reconexão sem histórico")
+            return
+        assinante.ultimo_id = desde
+        for evento in self._historico:
+            if evento.id > desde and evento.visivel_para(assinante.usuario_id, assinante.perfil):
+                self._entregar(assinante, evento)
+
+    def cancelar(self, assinante: Assinante) -> None:
+        with self._lock:
+            indice = self._assinantes.get(assinante.loop, {})
+            for chave in assinante.chaves():
+                grupo = indice.get(chave)
+                if grupo is not None:
+                    grupo.discard(assinante)
+                    if not grupo:
+                        del indice[chave]
+            if not indice:
+                self._assinantes.pop(assinante.loop, None)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            assinantes = {assinante for indice in self._assinantes.values() for grupo in indice.values() for assinante in grupo}
+        return {
+            "conexoes": len(assinantes),
+            "publicados": self.publicados,
+            "historico": len(self._historico),
+            "descartados": sum(assinante.descartados for assinante in assinantes),
+            "resyncs": sum(assinante.resyncs for assinante in assinantes),
+        }
+
+
+# Broker do processo da API
+feed_eventos = FeedEventos()
+
+
+def publicar_proposta(tipo: str, proposta: Proposta, negociacao: Optional[Negociacao] = None) -> Evento:
+    """
+    Publica um evento de proposta (``proposta_criada``, ``proposta_aceita``, ``proposta_recusada``)
+    para o autor, as partes da negociação e, se for oferta aberta, o perfil do outro lado.
+    """
+    usuarios = {proposta.id_autor}
+    if negociacao is not None:
+        usuarios.update((negociacao.id_tomador, negociacao.id_investidor))
+    perfis = {PERFIL_OPOSTO[proposta.autor_tipo]} if proposta.tipo == "inicial" and proposta.autor_tipo in PERFIL_OPOSTO else set()
+    dados = PropostaResponse.model_validate(proposta).model_dump(mode="json")
+    return feed_eventos.publicar(tipo, dados, usuarios, perfis)
+
+
+def publicar_negociacao(negociacao: Negociacao, status_anterior: Optional[str] = None) -> Evento:
+    """Publica ``negociacao_atualizada`` para o tomador e o investidor da negociação."""
+    dados = NegociacaoResponse.model_validate(negociacao).model_dump(mode="json")
+    dados["status_anterior"] = status_anterior
+    return feed_eventos.publicar("negociacao_atualizada", dados, (negociacao.id_tomador, negociacao.id_investidor))
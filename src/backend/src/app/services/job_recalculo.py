@@ -0,0 +1,346 @@
+"""
+Jobs assíncronos de recálculo de score.
+
+``POST /score/recalcular`` apenas registra o job e suas partições (faixas de ``usuarios.id`` com
+quantidades parecidas de usuários, via NTILE) e responde na hora. Uma thread coordenadora envia cada
+partição para um pool de processos; cada worker pontua a sua faixa em lotes de ``tamanho_lote`` e grava
+os scores junto com o progresso da partição (``ultimo_id``/``processados``) no mesmo commit. Se a API
+cair no meio do job, ele é retomado na inicialização a partir do último lote confirmado.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal, engine
+from app.models.job_recalculo import JobRecalculo, JobRecalculoParticao
+from app.services.score_lote import ScoreLoteService
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_ATIVOS = ("pendente", "executando")
+
+# Primeira chave dos advisory locks dos jobs: pg_try_advisory_lock(_CLASSE_LOCK, job_id)
+_CLASSE_LOCK = 5005
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor() -> ProcessPoolExecutor:
+    """Pool de processos compartilhado pelos jobs (spawn: cada worker abre seu próprio engine)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=JobRecalculoService.WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _descartar_executor(executor: ProcessPoolExecutor) -> None:
+    """Remove um pool quebrado (worker morto) para que o próximo job crie outro."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _pontuar_ids(db: Session, ids: List[int]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Pontua o lote inteiro; se falhar, tenta cada usuário separadamente para isolar os problemáticos.
+    Retorna (quantidade pontuada, falhas por usuário). Não faz commit.
+    """
+    try:
+        with db.begin_nested():
+            return len(ScoreLoteService.pontuar_lote(db, ids[0], ids[-1])), []
+    except Exception:
+        logger.warning("Falha no lote %s-%s; pontuando usuário a usuário", ids[0], ids[-1], exc_info=True)
+
+    pontuados = 0
+    falhas: List[Dict[str, Any]] = []
+    for usuario_id in ids:
+        try:
+            with db.begin_nested():
+                pontuados += len(ScoreLoteService.pontuar_lote(db, usuario_id, usuario_id))
+        except Exception as exc:
+            falhas.append({"id_usuario": usuario_id, "erro": str(exc)[:500]})
+    return pontuados, falhas
+
+
+def processar_particao(particao_id: int) -> int:
+    """
+    Executado no processo worker: pontua a partição a partir de ``ultimo_id`` até ``id_fim``.
+    Scores e progresso de cada lote são confirmados juntos. Retorna quantos usuários foram pontuados.
+    """
+    db = SessionLocal()
+    try:
+        particao = db.get(JobRecalculoParticao, particao_id)
+        if particao is None or particao.status == "concluido":
+            return 0
+
+        tamanho_lote = db.query(JobRecalculo.tamanho_lote).filter(JobRecalculo.id == particao.id_job).scalar()
+        particao.status = "executando"
+        particao.atualizado_em = datetime.utcnow()
+        db.commit()
+
+        pontuados = 0
+        while True:
+            ultimo_id = particao.ultimo_id if particao.ultimo_id is not None else particao.id_inicio - 1
+            ids = ScoreLoteService.proximos_ids(db, ultimo_id, particao.id_fim, tamanho_lote)
+            if not ids:
+                break
+
+            quantidade, falhas = _pontuar_ids(db, ids)
+            particao.ultimo_id = ids[-1]
+            particao.processados += quantidade
+            if falhas:
+                particao.falhas = list(particao.falhas or []) + falhas
+            particao.atualizado_em = datetime.utcnow()
+            db.commit()
+            pontuados += quantidade
+
+        particao.status = "concluido"
+        particao.atualizado_em = datetime.utcnow()
+        db.commit()
+        return pontuados
+    finally:
+        db.close()
+
+
+class JobRecalculoService:
+    """Criação, execução em segundo plano e acompanhamento dos jobs de recálculo."""
+
+    WORKERS = int(os.getenv("SCORE_JOB_WORKERS", str(os.cpu_count() or 1)))
+
+    @staticmethod
+    def criar_job(
+        db: Session,
+        tamanho_lote: Optional[int] = None,
+        particoes: Optional[int] = None,
+    ) -> JobRecalculo:
+        """
+        Registra um job com as partições por faixa de id. Se já houver um job ativo, ele é retornado
+        em vez de criar outro (dois jobs simultâneos gravariam os mesmos scores).
+        """
+        ativo = (
+            db.query(JobRecalculo)
+            .filter(JobRecalculo.status.in_(STATUS_ATIVOS))
+            .order_by(JobRecalculo.id)
+            .first()
+        )
+        if ativo is not None:
+            return ativo
+
+        tamanho_lote = tamanho_lote or ScoreLoteService.TAMANHO_LOTE
+        particoes = particoes or JobRecalculoService.WORKERS
+        faixas = db.execute(
+            text(
+                """
+                SELECT MIN(id) AS id_inicio, MAX(id) AS id_fim, COUNT(*) AS total
+                FROM (SELECT id, NTILE(:particoes) OVER (ORDER BY id) AS faixa FROM usuarios) f
+                GROUP BY faixa
+                ORDER BY faixa
+                """
+            ),
+            {"particoes": particoes},
+        ).all()
+
+        agora = datetime.utcnow()
+        job = JobRecalculo(
+            status="pendente",
+            tamanho_lote=tamanho_lote,
+            total_usuarios=sum(faixa.total for faixa in faixas),
+            criado_em=agora,
+            atualizado_em=agora,
+        )
+        if not faixas:
+            job.status = "concluido"
+            job.iniciado_em = agora
+            job.concluido_em = agora
+        db.add(job)
+        db.flush()
+
+        db.add_all(
+            JobRecalculoParticao(
+                id_job=job.id,
+                id_inicio=faixa.id_inicio,
+                id_fim=faixa.id_fim,
+                total_usuarios=faixa.total,
+                processados=0,
+                falhas=[],
+                status="pendente",
+                atualizado_em=agora,
+            )
+            for faixa in faixas
+        )
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def iniciar(job_id: int) -> None:
+        """Dispara a coordenação do job em uma thread de segundo plano."""
+        threading.Thread(
+            target=JobRecalculoService._coordenar,
+            args=(job_id,),
+            name=f"job-recalculo-{job_id}",
+            daemon=True,
+        ).start()
+
+    @staticmethod
+    def _coordenar(job_id: int) -> None:
+        # O advisory lock (de sessão) garante um único coordenador por job entre processos da API;
+        # se o processo morrer, a conexão cai e o lock é liberado para a retomada.
+        with engine.connect() as conexao:
+            travado = conexao.execute(
+                text("SELECT pg_try_advisory_lock(:classe, :job_id)"),
+                {"classe": _CLASSE_LOCK, "job_id": job_id},
+            ).scalar()
+            conexao.commit()
+            if not travado:
+                return
+
+            try:
+                JobRecalculoService._executar(job_id)
+            except Exception:
+                logger.exception("Job de recálculo %s interrompido", job_id)
+            finally:
+                conexao.execute(
+                    text("SELECT pg_advisory_unlock(:classe, :job_id)"),
+                    {"classe": _CLASSE_LOCK, "job_id": job_id},
+                )
+                conexao.commit()
+
+    @staticmethod
+    def _executar(job_id: int) -> None:
+        db = SessionLocal()
+        try:
+            job = db.get(JobRecalculo, job_id)
+            if job is None or job.status not in STATUS_ATIVOS:
+                return
+
+            agora = datetime.utcnow()
+            job.status = "executando"
+            job.iniciado_em = job.iniciado_em or agora
+            job.atualizado_em = agora
+            db.commit()
+
+            pendentes = [
+                particao_id
+                for (particao_id,) in db.query(JobRecalculoParticao.id)
+                .filter(
+                    JobRecalculoParticao.id_job == job_id,
+                    JobRecalculoParticao.status != "concluido",
+                )
+                .order_by(JobRecalculoParticao.id_inicio)
+            ]
+            db.commit()
+
+            erros: List[str] = []
+            executor = _obter_executor()
+            futuros = {executor.submit(processar_particao, particao_id): particao_id for particao_id in pendentes}
+            for futuro in as_completed(futuros):
+                particao_id = futuros[futuro]
+                try:
+                    futuro.result()
+                except Exception as exc:
+                    logger.exception("Falha na partição %s do job %s", particao_id, job_id)
+                    erros.append(f"partição {particao_id}: {exc}")
+                    db.query(JobRecalculoParticao).filter(JobRecalculoParticao.id == particao_id).update(
+                        {"status": "falhou", "atualizado_em": datetime.utcnow()},
+                        synchronize_session=False,
+                    )
+                    db.commit()
+                    if isinstance(exc, BrokenProcessPool):
+                        _descartar_executor(executor)
+
+            job = db.get(JobRecalculo, job_id)
+            agora = datetime.utcnow()
+            job.status = "falhou" if erros else "concluido"
+            job.erro = "; ".join(erros)[:2000] if erros else None
+            job.atualizado_em = agora
+            job.concluido_em = agora
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def obter_status(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+        """Status do job com progresso agregado das partições, vazão (usuários/s) e falhas."""
+        job = db.get(JobRecalculo, job_id)
+        if job is None:
+            return None
+
+        particoes = (
+            db.query(JobRecalculoParticao)
+            .filter(JobRecalculoParticao.id_job == job_id)
+            .order_by(JobRecalculoParticao.id_inicio)
+            .all()
+        )
+        processados = sum(particao.processados for particao in particoes)
+        falhas = [falha for particao in particoes for falha in (particao.falhas or [])]
+
+        atualizado_em = max([job.atualizado_em] + [particao.atualizado_em for particao in particoes])
+        usuarios_por_segundo = None
+        if job.iniciado_em is not None:
+            fim = job.concluido_em or atualizado_em
+            duracao = (fim - job.iniciado_em).total_seconds()
+            if duracao > 0:
+                usuarios_por_segundo = round(processados / duracao, 2)
+
+        concluidos = processados + len(falhas)
+        return {
+            "id": job.id,
+            "status": job.status,
+            "tamanho_lote": job.tamanho_lote,
+            "total_usuarios": job.total_usuarios,
+            "processados": processados,
+            "progresso": round(min(concluidos / job.total_usuarios, 1.0), 4) if job.total_usuarios else 1.0,
+            "usuarios_por_segundo": usuarios_por_segundo,
+            "erro": job.erro,
+            "criado_em": job.criado_em,
+            "iniciado_em": job.iniciado_em,
+            "atualizado_em": atualizado_em,
+            "concluido_em": job.concluido_em,
+            "particoes": particoes,
+            "falhas": falhas,
+        }
+
+    @staticmethod
+    def retomar_pendentes() -> List[int]:
+        """Na inicialização da API, retoma os jobs que não terminaram (continuam do último lote confirmado)."""
+        db = SessionLocal()
+        try:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(JobRecalculo.id)
+                .filter(JobRecalculo.status.in_(STATUS_ATIVOS))
+                .order_by(JobRecalculo.id)
+            ]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            JobRecalculoService.iniciar(job_id)
+        return job_ids
+
+    @staticmethod
+    def encerrar() -> None:
+        """Desliga o pool no encerramento da API; jobs em andamento ficam ativos e são retomados depois."""
+        global _executor
+        with _executor_lock:
+            executor, _executor = _executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
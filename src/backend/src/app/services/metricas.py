@@ -1,14 +1,26 @@
 """Serviços para métricas de investidor."""
 
+from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
 
 from app.models.metricas_investidor import MetricasInvestidor
+from app.models.score import ScoreCredito
+from app.models.usuario import Usuario
+
+
+def _media_ponderada(media: Optional[float], peso: float, valor: Optional[float], peso_valor: float) -> Optional[float]:
+    """Inclui ``valor`` (com peso ``peso_valor``) numa média ponderada que tinha peso total ``peso``."""
+    if valor is None:
+        return media
+    if media is None or peso <= 0:
+        return valor
+    return (media * peso + valor * peso_valor) / (peso + peso_valor)
 
 
 class MetricasInvestidorService:
-    """Operações de leitura das métricas dos investidores."""
+    """Operações das métricas dos investidores."""
 
     @staticmethod
     def obter_por_usuario(db: Session, usuario_id: int) -> Optional[MetricasInvestidor]:
@@ -18,3 +30,29 @@ class MetricasInvestidorService:
             .order_by(MetricasInvestidor.atualizado_em.desc())
             .first()
         )
+
+    @staticmethod
+    def registrar_emprestimo(db: Session, investidor_id: int, tomador_id: int, valor: float, taxa: float) -> None:
+        """
+        Soma um empréstimo contratado às métricas do investidor, sem commit: valor investido, e
+        rentabilidade e risco (probabilidade de default do tomador) médios ponderados pelo valor. O
+        patrimônio não muda (o saldo virou empréstimo); sem métricas ainda, parte do saldo atual.
+        """
+        metricas = MetricasInvestidorService.obter_por_usuario(db, investidor_id)
+        if metricas is None:
+            usuario = db.get(Usuario, investidor_id)
+            metricas = MetricasInvestidor(
+                id_usuarios=investidor_id,
+                valor_total_investido=0.0,
+                rentabilidade_media_am=0.0,
+                patrimonio=(usuario.saldo_cc if usuario else 0.0) + valor,
+            )
+            db.add(metricas)
+
+        investido = metricas.valor_total_investido or 0.0
+        risco = db.query(ScoreCredito.risco).filter(ScoreCredito.id_usuarios == tomador_id).scalar()
+
+        metricas.rentabilidade_media_am = _media_ponderada(metricas.rentabilidade_media_am, investido, taxa, valor)
+        metricas.risco_medio = _media_ponderada(metricas.risco_medio, investido, risco, valor)
+        metricas.valor_total_investido = investido + valor
+        metricas.atualizado_em = datetime.utcnow()
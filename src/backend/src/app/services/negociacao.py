@@ -2,15 +2,31 @@
 Este arquivo é responsável pelas lógicas de salvamento dos dados de negociação de empréstimos, incluindo a criação, atualização e consulta de negociações no banco de dados.
 """
 
+from sqlalchemy import and_, insert, or_, select, tuple_, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.database.database import SessionLocal
 from app.models.negociacao import Negociacao, NegociacaoCreate
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple
 import hashlib
-from app.services.blockchain import registrar_hash_na_blockchain
+import os
+from app.services.concorrencia import detectar_conflito, verificar_versao
 from app.services.usuario import UsuarioService
+from app.services.eventos_negociacao import (
+    EMPRESTIMO_CRIADO,
+    NEGOCIACAO_ATUALIZADA,
+    STATUS_ALTERADO,
+    registrar_evento,
+)
+from app.services.feed_eventos import publicar_negociacao
+from app.services.paginacao import decodificar_cursor, fatiar_pagina, validar_limite
 # from app.services.blockchain import registrar_hash_na_blockchain
-from app.models.emprestimo import EmprestimoCreate, Emprestimo
+from app.models.emprestimo import Emprestimo
+from app.models.evento_negociacao import EventoNegociacao
+
+# Intervalo da tarefa que grava as negociações expiradas
+INTERVALO_EXPIRACAO = float(os.getenv("NEGOCIACOES_EXPIRACAO_INTERVALO_S", "300"))
 
 class NegociacaoService:
 
@@ -18,43 +34,100 @@ class NegociacaoService:
     EXPIRABLE_STATUSES = {"em_negociacao", "pendente", "em_andamento"}
 
     @staticmethod
-    def _aplicar_regra_expiracao(db: Session, negociacoes: List[Negociacao]) -> List[Negociacao]:
-        """Atualiza o status das negociações expiradas (>=48h sem conclusão)."""
+    def _limite_expiracao(agora: Optional[datetime] = None) -> datetime:
+        """Negociações em aberto criadas até este instante estão expiradas."""
+        return (agora or datetime.utcnow()) - NegociacaoService.EXPIRATION_WINDOW
 
-        if not negociacoes:
-            return negociacoes
+    @staticmethod
+    def _vencida(negociacao: Negociacao, limite: datetime) -> bool:
+        return (
+            negociacao.status in NegociacaoService.EXPIRABLE_STATUSES
+            and negociacao.criado_em is not None
+            and negociacao.criado_em <= limite
+        )
 
-        agora = datetime.utcnow()
-        houve_atualizacao = False
+    @staticmethod
+    def _filtro_status(status: str, limite: datetime):
+        """Filtro pelo status efetivo (considera expiradas as vencidas que a tarefa ainda não gravou)."""
+        if status == "expirada":
+            return or_(
+                Negociacao.status == "expirada",
+                and_(Negociacao.status.in_(NegociacaoService.EXPIRABLE_STATUSES), Negociacao.criado_em <= limite),
+            )
+        if status in NegociacaoService.EXPIRABLE_STATUSES:
+            return and_(Negociacao.status == status, Negociacao.criado_em > limite)
+        return Negociacao.status == status
 
+    @staticmethod
+    def _aplicar_regra_expiracao(negociacoes: List[Negociacao], limite: Optional[datetime] = None) -> List[Negociacao]:
+        """
+        Mostra como expiradas (>=48h sem conclusão) as negociações que a tarefa de expiração ainda não
+        gravou. Só altera o valor carregado na sessão (sem marcar a linha como modificada): a leitura
+        não escreve no banco.
+        """
+        limite = limite or NegociacaoService._limite_expiracao()
         for negociacao in negociacoes:
-            if (
-                negociacao.status in NegociacaoService.EXPIRABLE_STATUSES
-                and negociacao.criado_em
-                and agora - negociacao.criado_em >= NegociacaoService.EXPIRATION_WINDOW
-            ):
-                if negociacao.status != "expirada":
-                    negociacao.status = "expirada"
-                    negociacao.atualizado_em = agora
-                    houve_atualizacao = True
-
-        if houve_atualizacao:
-            db.commit()
-            for negociacao in negociacoes:
-                db.refresh(negociacao)
-
+            if NegociacaoService._vencida(negociacao, limite):
+                set_committed_value(negociacao, "status", "expirada")
         return negociacoes
 
     @staticmethod
-    def atualizar_negociacao(db: Session, negociacao_id: int, negociacao_update: dict) -> Optional[Negociacao]:
+    def expirar_vencidas(db: Session) -> int:
         """
-        Atualiza os dados de uma negociação existente.
-        negociacao_update: dicionário com os campos a serem atualizados.
+        Grava ``expirada`` em todas as negociações em aberto há 48h ou mais, num único UPDATE (índice
+        em status, criado_em) que também incrementa a versão, grava os eventos no log na mesma transação
+        e os publica no feed depois do commit. Linhas bloqueadas por outra transação (ex.: um aceite em
+        andamento) ficam para a próxima execução. Retorna quantas expirou.
         """
-        negociacao = db.query(Negociacao).filter(Negociacao.id == negociacao_id).first()
-        if not negociacao:
-            return None
+        agora = datetime.utcnow()
+        vencidas = (
+            select(Negociacao.id, Negociacao.status)
+            .where(
+                Negociacao.status.in_(NegociacaoService.EXPIRABLE_STATUSES),
+                Negociacao.criado_em <= NegociacaoService._limite_expiracao(agora),
+            )
+            .with_for_update(skip_locked=True)
+            .cte("vencidas")
+        )
+        expiradas = db.execute(
+            update(Negociacao)
+            .where(Negociacao.id == vencidas.c.id)
+            .values(status="expirada", atualizado_em=agora, versao=Negociacao.versao + 1)
+            .returning(Negociacao.id, vencidas.c.status)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if expiradas:
+            db.execute(insert(EventoNegociacao), [
+                {"id_negociacoes": negociacao_id, "tipo": STATUS_ALTERADO,
+                 "dados": {"status_anterior": status_anterior, "status": "expirada"}}
+                for negociacao_id, status_anterior in expiradas
+            ])
+        db.commit()
+
+        if expiradas:
+            status_anteriores = dict(expiradas)
+            for negociacao in db.query(Negociacao).filter(Negociacao.id.in_(status_anteriores)).populate_existing():
+                publicar_negociacao(negociacao, status_anteriores[negociacao.id])
+        return len(expiradas)
 
+    @staticmethod
+    def expirar_agendado() -> None:
+        """Tarefa do agendador: expiração com sessão própria."""
+        db = SessionLocal()
+        try:
+            NegociacaoService.expirar_vencidas(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def aplicar_atualizacao(db: Session, negociacao: Negociacao, negociacao_update: dict) -> str:
+        """
+        Aplica os campos de negociacao_update e os efeitos de uma conclusão (hash do contrato,
+        transferência do valor e criação do empréstimo) na transação corrente, sem commit, e grava os
+        eventos no log (app/services/eventos_negociacao.py), de onde os demais efeitos (features de
+        crédito, métricas, blockchain) são processados depois: quem chama grava tudo num único commit e
+        publica o evento no feed depois dele. Retorna o status anterior.
+        """
         status_anterior = negociacao.status
 
         for key, value in negociacao_update.items():
@@ -96,67 +169,138 @@ class NegociacaoService:
                 valor=negociacao.valor,
             )
 
-  
-            emprestimo = Emprestimo(
-            id_negociacoes=negociacao.id,
-            id_tomador=negociacao.id_tomador,
-            id_investidor=negociacao.id_investidor,
-            valor=negociacao.valor or 0.0,
-            taxa=negociacao.taxa or 0.0,
-            prazo=negociacao.prazo if negociacao.prazo is not None else 0,
-            parcela=negociacao.parcela or 0.0,
-            contrato_tx_hash=negociacao.contrato_tx_hash,
-            hash_onchain=negociacao.hash_onchain, 
-            status="ativo",
-            liquidado=False
-            )
-
-            db.add(emprestimo)
-            db.commit()
-            db.refresh(emprestimo)
+            # hash_onchain fica vazio até o contrato ser registrado na blockchain
+            db.add(Emprestimo(
+                id_negociacoes=negociacao.id,
+                id_tomador=negociacao.id_tomador,
+                id_investidor=negociacao.id_investidor,
+                valor=negociacao.valor or 0.0,
+                taxa=negociacao.taxa or 0.0,
+                prazo=negociacao.prazo if negociacao.prazo is not None else 0,
+                parcela=negociacao.parcela or 0.0,
+                contrato_tx_hash=negociacao.contrato_tx_hash,
+                hash_onchain=negociacao.hash_onchain,
+                status="ativo",
+                liquidado=False,
+            ))
+            # O registro do hash na blockchain é feito pelo consumidor do evento
+            registrar_evento(db, negociacao.id, EMPRESTIMO_CRIADO, {
+                "id_tomador": negociacao.id_tomador,
+                "id_investidor": negociacao.id_investidor,
+                "valor": negociacao.valor,
+                "taxa": negociacao.taxa or 0.0,
+                "contrato_tx_hash": negociacao.contrato_tx_hash,
+            })
         negociacao.atualizado_em = datetime.utcnow()
 
-        # Chama a função para registrar o hash na blockchain
-        # registrar_hash_na_blockchain(contrato_tx_hash=negociacao.contrato_tx_hash)
+        if status_atual != status_anterior:
+            registrar_evento(db, negociacao.id, STATUS_ALTERADO, {"status_anterior": status_anterior, "status": status_atual})
+        else:
+            registrar_evento(db, negociacao.id, NEGOCIACAO_ATUALIZADA, {"status": status_atual})
+        return status_anterior
+
+    @staticmethod
+    @detectar_conflito
+    def atualizar_negociacao(db: Session, negociacao_id: int, negociacao_update: dict) -> Optional[Negociacao]:
+        """
+        Atualiza os dados de uma negociação existente, num único commit.
+        negociacao_update: dicionário com os campos a serem atualizados; com ``versao``, só atualiza se a
+        negociação ainda estiver nessa versão (senão levanta ConflitoConcorrenciaError).
+        """
+        negociacao = db.get(Negociacao, negociacao_id)
+        if not negociacao:
+            return None
+
+        negociacao_update = dict(negociacao_update)
+        verificar_versao(negociacao, negociacao_update.pop("versao", None))
+        status_anterior = NegociacaoService.aplicar_atualizacao(db, negociacao, negociacao_update)
         db.commit()
-        db.refresh(negociacao)
+        if negociacao.status != status_anterior:
+            publicar_negociacao(negociacao, status_anterior)
         return negociacao
 
     @staticmethod
-    def listar_negociacoes(db: Session, status: Optional[str] = None) -> List[Negociacao]:
-        """Lista negociações, opcionalmente filtrando pelo status."""
-        
-        query = db.query(Negociacao)
-        
-        if status:
-            query = query.filter(Negociacao.status == status)
-            
-        negociacoes = query.all()
-        return NegociacaoService._aplicar_regra_expiracao(db, negociacoes)
-    
-    @staticmethod
-    def listar_por_tomador(db: Session, tomador_id: int, status: Optional[str] = None) -> List[Negociacao]:
-        """Lista negociações associadas a um tomador específico."""
+    def _listar(
+        db: Session,
+        filtros: tuple,
+        status: Optional[str],
+        desde: Optional[datetime],
+        ate: Optional[datetime],
+        limite: Optional[int],
+        cursor: Optional[str],
+    ) -> Tuple[List[Negociacao], Optional[str]]:
+        """
+        Página de negociações ordenada por (atualizado_em, id) decrescente, filtrada pelo status efetivo
+        e por atualizado_em em [desde, ate), e o cursor da próxima página (None na última). Sem
+        ``limite``, retorna todas as negociações depois do cursor, sem próxima página.
+        """
+        if limite is not None:
+            validar_limite(limite)
+        if desde and ate and desde >= ate:
+            raise ValueError("desde deve ser anterior a ate")
 
-        query = db.query(Negociacao).filter(Negociacao.id_tomador == tomador_id)
+        corte = NegociacaoService._limite_expiracao()
+        chave = (Negociacao.atualizado_em, Negociacao.id)
+        query = db.query(Negociacao).filter(*filtros)
 
         if status:
-            query = query.filter(Negociacao.status == status)
-
-        negociacoes = query.order_by(Negociacao.atualizado_em.desc()).all()
-        return NegociacaoService._aplicar_regra_expiracao(db, negociacoes)
+            query = query.filter(NegociacaoService._filtro_status(status, corte))
+        if desde:
+            query = query.filter(Negociacao.atualizado_em >= desde)
+        if ate:
+            query = query.filter(Negociacao.atualizado_em < ate)
+        if cursor:
+            query = query.filter(tuple_(*chave) < tuple_(*decodificar_cursor(cursor, len(chave))))
+
+        query = query.order_by(*(coluna.desc() for coluna in chave))
+        if limite is None:
+            return NegociacaoService._aplicar_regra_expiracao(query.all(), corte), None
+
+        linhas = query.limit(limite + 1).all()
+        negociacoes, proximo_cursor = fatiar_pagina(linhas, limite, lambda linha: (linha.atualizado_em, linha.id))
+        return NegociacaoService._aplicar_regra_expiracao(negociacoes, corte), proximo_cursor
 
     @staticmethod
-    def listar_por_investidor(db: Session, investidor_id: int, status: Optional[str] = None) -> List[Negociacao]:
-        """Lista negociações associadas a um investidor específico."""
-
-        query = db.query(Negociacao).filter(Negociacao.id_investidor == investidor_id)
-
-        if status:
-            query = query.filter(Negociacao.status == status)
+    def listar_negociacoes(
+        db: Session,
+        status: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None,
+        limite: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Negociacao], Optional[str]]:
+        """Lista negociações (paginadas se houver ``limite``), opcionalmente filtrando pelo status e pela data de atualização."""
+        return NegociacaoService._listar(db, (), status, desde, ate, limite, cursor)
+    
+    @staticmethod
+    def listar_por_tomador(
+        db: Session,
+        tomador_id: int,
+        status: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None,
+        limite: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Negociacao], Optional[str]]:
+        """Lista negociações (paginadas se houver ``limite``) associadas a um tomador específico."""
+        return NegociacaoService._listar(
+            db, (Negociacao.id_tomador == tomador_id,), status, desde, ate, limite, cursor
+        )
 
-        negociacoes = query.order_by(Negociacao.atualizado_em.desc()).all()
-        return NegociacaoService._aplicar_regra_expiracao(db, negociacoes)
+    @staticmethod
+    def listar_por_investidor(
+        db: Session,
+        investidor_id: int,
+        status: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        ate: Optional[datetime] = None,
+        limite: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Negociacao], Optional[str]]:
+        """Lista negociações (paginadas se houver ``limite``) associadas a um investidor específico."""
+        return NegociacaoService._listar(
+            db, (Negociacao.id_investidor == investidor_id,), status, desde, ate, limite, cursor
+        )
 
     @staticmethod
     def obter_negociacao_por_id(db: Session, negociacao_id: int) -> Optional[Negociacao]:
@@ -165,8 +309,17 @@ class NegociacaoService:
         if not negociacao:
             return None
 
-        negociacoes = NegociacaoService._aplicar_regra_expiracao(db, [negociacao])
-        return negociacoes[0]
+        return NegociacaoService._aplicar_regra_expiracao([negociacao])[0]
+
+    @staticmethod
+    def listar_eventos(db: Session, negociacao_id: int) -> List[EventoNegociacao]:
+        """Eventos de uma negociação, na ordem em que foram gravados."""
+        return (
+            db.query(EventoNegociacao)
+            .filter(EventoNegociacao.id_negociacoes == negociacao_id)
+            .order_by(EventoNegociacao.id)
+            .all()
+        )
 
     # @staticmethod
     # def registrar_negociacao_na_blockchain(db: Session, negociacao_id: int):
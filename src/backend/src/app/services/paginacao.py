@@ -0,0 +1,71 @@
+"""
+Paginação por cursor (keyset) das listagens da API.
+
+O cursor é opaco para o cliente: base64 (url-safe) de um JSON com os valores da chave de ordenação da
+última linha devolvida. A página seguinte filtra as linhas estritamente depois dessa chave, então o custo
+não cresce com o número da página e inserções entre as páginas não duplicam nem pulam linhas. As
+listagens devolvem a página como lista (mesmo formato de antes) e o cursor da próxima página no
+cabeçalho ``X-Proximo-Cursor`` (ausente na última página).
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+
+CABECALHO_PROXIMO_CURSOR = "X-Proximo-Cursor"
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+T = TypeVar("T")
+
+
+def _codificar_valor(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return {"t": valor.isoformat()}
+    return valor
+
+
+def _decodificar_valor(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return datetime.fromisoformat(valor["t"])
+    return valor
+
+
+def codificar_cursor(chave: Sequence[Any]) -> str:
+    """Cursor opaco para a chave de ordenação (ints, floats, textos e datetimes)."""
+    dados = json.dumps([_codificar_valor(valor) for valor in chave], separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, tamanho: int) -> List[Any]:
+    """Valores da chave de ordenação do cursor. Levanta ValueError se o cursor for inválido."""
+    try:
+        dados = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        chave = [_decodificar_valor(valor) for valor in json.loads(dados)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+    if len(chave) != tamanho:
+        raise ValueError("Cursor inválido")
+    return chave
+
+
+def validar_limite(limite: int) -> int:
+    """Levanta ValueError fora de 1..LIMITE_MAXIMO."""
+    if limite < 1 or limite > LIMITE_MAXIMO:
+        raise ValueError(f"limite deve estar entre 1 e {LIMITE_MAXIMO}")
+    return limite
+
+
+def fatiar_pagina(linhas: Sequence[T], limite: int, chave: Callable[[T], Sequence[Any]]) -> Tuple[List[T], Optional[str]]:
+    """
+    Recebe até ``limite + 1`` linhas já ordenadas e retorna a página (``limite`` linhas) e o cursor da
+    próxima página, ou None se não houver mais linhas.
+    """
+    pagina = list(linhas[:limite])
+    if len(linhas) <= limite:
+        return pagina, None
+    return pagina, codificar_cursor(chave(pagina[-1]))
@@ -0,0 +1,103 @@
+"""
+Perfil de carteira dos investidores, usado pela pontuação de diversidade das recomendações.
+
+O perfil guarda só os valores, prazos e taxas distintos da carteira (``perfis_carteira``) e é atualizado
+no mesmo commit em que o investidor cria ou aceita uma proposta, então a recomendação não relê o
+histórico do investidor. Investidores ainda sem linha têm o perfil calculado do histórico na leitura
+(sem gravar) e gravado na primeira atualização. As leituras passam por um cache LRU/TTL em memória,
+invalidado depois do commit de cada atualização.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.perfil_carteira import PerfilCarteira
+from app.services.cache import CacheTTL
+from app.services.resumo_carteira import ResumoCarteira
+
+
+cache_perfis = CacheTTL(
+    max_itens=int(os.getenv("PERFIL_CARTEIRA_CACHE_MAX_ITENS", "5000")),
+    ttl=float(os.getenv("PERFIL_CARTEIRA_CACHE_TTL", "600")),
+)
+
+# Propostas da carteira: criadas pelo investidor e solicitações de tomadores que ele aceitou
+_HISTORICO_SQL = text(
+    """
+    SELECT p.valor, p.prazo_meses, p.taxa_min, p.taxa_max
+    FROM propostas p
+    WHERE p.id_autor = :id_investidor AND p.autor_tipo = 'investidor'
+    UNION ALL
+    SELECT p.valor, p.prazo_meses, p.taxa_min, p.taxa_max
+    FROM propostas p
+    JOIN negociacoes n ON n.id = p.id_negociacoes
+    WHERE n.id_investidor = :id_investidor AND p.autor_tipo = 'tomador' AND p.status = 'aceita'
+    """
+)
+
+
+class PerfilCarteiraService:
+    """Leitura e atualização incremental de ``perfis_carteira``."""
+
+    @staticmethod
+    def _do_historico(db: Session, id_investidor: int) -> ResumoCarteira:
+        return ResumoCarteira().com(db.execute(_HISTORICO_SQL, {"id_investidor": id_investidor}).fetchall())
+
+    @staticmethod
+    def _carregar(db: Session, id_investidor: int) -> ResumoCarteira:
+        perfil = db.get(PerfilCarteira, id_investidor)
+        if perfil is None:
+            return PerfilCarteiraService._do_historico(db, id_investidor)
+        return ResumoCarteira(frozenset(perfil.valores), frozenset(perfil.prazos), frozenset(perfil.taxas))
+
+    @staticmethod
+    def obter(db: Session, id_investidor: int) -> ResumoCarteira:
+        """Resumo da carteira do investidor (do cache, da tabela ou, sem linha, do histórico)."""
+        return cache_perfis.obter_ou_calcular(id_investidor, lambda: PerfilCarteiraService._carregar(db, id_investidor))
+
+    @staticmethod
+    def registrar_proposta(
+        db: Session,
+        id_investidor: int,
+        valor: Optional[float],
+        prazo: Optional[int],
+        taxa_min: Optional[float],
+        taxa_max: Optional[float],
+    ) -> None:
+        """
+        Acrescenta uma proposta ao perfil do investidor (criando o perfil a partir do histórico se preciso).
+        Não faz commit; chame ``invalidar`` depois do commit.
+        """
+        db.flush()
+        db.execute(
+            insert(PerfilCarteira)
+            .values(id_usuarios=id_investidor, valores=[], prazos=[], taxas=[], atualizado_em=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["id_usuarios"])
+        )
+        perfil = (
+            db.query(PerfilCarteira)
+            .filter(PerfilCarteira.id_usuarios == id_investidor)
+            .populate_existing()
+            .with_for_update()
+            .one()
+        )
+        if not (perfil.valores or perfil.prazos or perfil.taxas):
+            # Perfil recém-criado (ou carteira vazia): parte do histórico, que já inclui a proposta
+            resumo = PerfilCarteiraService._do_historico(db, id_investidor)
+        else:
+            resumo = ResumoCarteira(frozenset(perfil.valores), frozenset(perfil.prazos), frozenset(perfil.taxas))
+        resumo = resumo.com([(valor, prazo, taxa_min, taxa_max)])
+
+        perfil.valores = sorted(resumo.valores)
+        perfil.prazos = sorted(resumo.prazos)
+        perfil.taxas = sorted(resumo.taxas)
+        perfil.atualizado_em = datetime.utcnow()
+
+    @staticmethod
+    def invalidar(id_investidor: int) -> None:
+        cache_perfis.invalidar(id_investidor)
@@ -3,40 +3,34 @@ Este arquivo é responsável pelas lógicas relacionadas às propostas e contrap
 """
 
 
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
-from app.models.proposta import Proposta, PropostaCreate
-from typing import Optional, List
-from app.services.calculo_taxas_juros import parse_taxa_range
+from app.models.proposta import Proposta, PropostaCreate, faixa_taxa
+from typing import Optional, List, Tuple
 from app.models.negociacao import Negociacao, NegociacaoCreate
 from app.services.negociacao import NegociacaoService
+from app.services.concorrencia import detectar_conflito, verificar_versao
+from app.services.eventos_negociacao import NEGOCIACAO_CRIADA, PROPOSTA_ACEITA, registrar_evento
+from app.services.faixa_mercado import FaixaMercadoService
+from app.services.cache_taxas import invalidar_usuario
+from app.services.perfil_carteira import PerfilCarteiraService
+from app.services.ranking_propostas import pontuar, pool_candidatos, top_k
+from app.services.feed_eventos import publicar_negociacao, publicar_proposta
+from app.services.paginacao import LIMITE_PADRAO, decodificar_cursor, fatiar_pagina, validar_limite
 from datetime import datetime
 
 
-def _parse_taxa_media(taxa_sugerida: Optional[str]) -> Optional[float]:
-    """Normaliza a taxa sugerida para uso na negociação (em pontos percentuais)."""
-    if not taxa_sugerida:
-        return None
-
-    taxa_limpa = taxa_sugerida.replace('%', '').strip()
-
-    if not taxa_limpa:
-        return None
-
-    if '-' in taxa_limpa:
-        try:
-            minimo, maximo = parse_taxa_range(taxa_limpa)
-            return round((minimo + maximo) / 2, 4)
-        except Exception:
-            return None
-
-    try:
-        return float(taxa_limpa)
-    except ValueError:
+def _parse_taxa_media(taxa: Optional[str]) -> Optional[float]:
+    """Ponto médio de uma taxa em texto ('12-15', '10%'), em pontos percentuais."""
+    faixa = faixa_taxa(taxa)
+    if faixa is None:
         return None
+    return round((faixa[0] + faixa[1]) / 2, 4)
 
 class PropostaService:
     
     @staticmethod
+    @detectar_conflito
     def criar_proposta(db: Session, proposta_data: PropostaCreate) -> Proposta:
         """Cria uma proposta no banco de dados e automaticamente cria uma negociação relacionada."""
         proposta_dict = proposta_data.model_dump()
@@ -78,20 +72,24 @@ class PropostaService:
                 db_negociacao = Negociacao(**negociacao_data.model_dump())
                 db.add(db_negociacao)
                 db.flush()
+                registrar_evento(db, db_negociacao.id, NEGOCIACAO_CRIADA, {"status": db_negociacao.status})
 
                 proposta_dict["id_negociacoes"] = db_negociacao.id
                 negociacao_criada = True
 
         # Se existe negociação (referenciada ou recém-criada), atualiza campos relevantes
+        status_anterior = None
         if proposta_dict.get("id_negociacoes"):
             negociacao_id = proposta_dict.get("id_negociacoes")
-            negociacao_existente = db.query(Negociacao).filter(
-                Negociacao.id == negociacao_id
-            ).first()
+            negociacao_existente = db.get(Negociacao, negociacao_id)
 
             if negociacao_existente:
                 taxa_media = _parse_taxa_media(proposta_data.taxa_sugerida)
-                atualizacoes = {"quant_propostas": (negociacao_existente.quant_propostas or 0) + 1, "atualizado_em": datetime.utcnow()}
+                # Incremento no próprio UPDATE (quant_propostas = quant_propostas + 1), conferindo a versão
+                atualizacoes = {
+                    "quant_propostas": func.coalesce(Negociacao.quant_propostas, 0) + 1,
+                    "atualizado_em": datetime.utcnow(),
+                }
 
                 if taxa_media is not None:
                     atualizacoes["taxa"] = taxa_media
@@ -105,7 +103,7 @@ class PropostaService:
                 if getattr(proposta_data, "parcela", None) is not None:
                     atualizacoes["parcela"] = proposta_data.parcela
 
-                NegociacaoService.atualizar_negociacao(db, negociacao_existente.id, atualizacoes)
+                status_anterior = NegociacaoService.aplicar_atualizacao(db, negociacao_existente, atualizacoes)
 
         # Remove campos auxiliares não persistidos (se existirem)
         proposta_dict.pop("id_tomador_destino", None)
@@ -114,11 +112,21 @@ class PropostaService:
         # Cria a proposta
         db_proposta = Proposta(**proposta_dict)
         db.add(db_proposta)
+        if db_proposta.autor_tipo == "investidor":
+            PerfilCarteiraService.registrar_proposta(
+                db, db_proposta.id_autor, db_proposta.valor, db_proposta.prazo_meses, db_proposta.taxa_min, db_proposta.taxa_max
+            )
         db.commit()
-        db.refresh(db_proposta)
+        if db_proposta.autor_tipo == "investidor":
+            PerfilCarteiraService.invalidar(db_proposta.id_autor)
+        pool_candidatos.registrar(db_proposta)
+        if negociacao_existente is not None and negociacao_existente.status != status_anterior:
+            publicar_negociacao(negociacao_existente, status_anterior)
+        publicar_proposta("proposta_criada", db_proposta, negociacao_existente)
         return db_proposta
 
     @staticmethod
+    @detectar_conflito
     def iniciar_negociacao_para_proposta(
         db: Session,
         proposta_id: int,
@@ -145,7 +153,7 @@ class PropostaService:
             raise ValueError("O tomador não pode ser o mesmo usuário que criou a proposta")
 
         taxa_media = (
-            _parse_taxa_media(proposta.taxa_sugerida)
+            proposta.taxa_media
             or _parse_taxa_media(proposta.taxa_analisada)
             or 0.0
         )
@@ -166,24 +174,29 @@ class PropostaService:
         db.flush()
 
         proposta.id_negociacoes = db_negociacao.id
+        registrar_evento(db, db_negociacao.id, NEGOCIACAO_CRIADA, {"status": db_negociacao.status})
         db.commit()
-        db.refresh(proposta)
-        db.refresh(db_negociacao)
 
         return db_negociacao
 
     @staticmethod
+    @detectar_conflito
     def aceitar_proposta(
         db: Session,
         proposta_id: int,
         usuario_id: int,
         perfil: str,
+        versao: Optional[int] = None,
     ) -> Negociacao:
-        """Aceita uma proposta e garante que a negociação correspondente esteja ativa."""
+        """
+        Aceita uma proposta e garante que a negociação correspondente esteja ativa. Aceites e recusas
+        simultâneos da mesma proposta: só o primeiro grava, os demais levantam ConflitoConcorrenciaError.
+        """
 
         proposta = db.query(Proposta).filter(Proposta.id == proposta_id).first()
         if not proposta:
             raise ValueError("Proposta não encontrada")
+        verificar_versao(proposta, versao)
 
         if perfil not in {"investidor", "tomador"}:
             raise ValueError("Perfil inválido para aceitação")
@@ -202,7 +215,7 @@ class PropostaService:
             raise ValueError("Tipo de proposta inválido")
 
         taxa_media = (
-            _parse_taxa_media(proposta.taxa_sugerida)
+            proposta.taxa_media
             or _parse_taxa_media(proposta.taxa_analisada)
             or 0.0
         )
@@ -210,7 +223,7 @@ class PropostaService:
         negociacao: Optional[Negociacao] = None
 
         if proposta.id_negociacoes:
-            negociacao = db.query(Negociacao).filter(Negociacao.id == proposta.id_negociacoes).first()
+            negociacao = db.get(Negociacao, proposta.id_negociacoes)
             if not negociacao:
                 raise ValueError("Negociação vinculada não encontrada")
             if perfil == "investidor" and negociacao.id_investidor and negociacao.id_investidor != usuario_id:
@@ -233,10 +246,22 @@ class PropostaService:
             db.flush()
             proposta.id_negociacoes = negociacao.id
 
+        recem_aceita = proposta.status != "aceita"
+        if recem_aceita:
+            # As faixas de mercado são recalculadas pelo consumidor do evento, fora do aceite
+            FaixaMercadoService.registrar_aceite(db, proposta.taxa_min, proposta.taxa_max, id_tomador)
+            registrar_evento(db, negociacao.id, PROPOSTA_ACEITA, {"id_proposta": proposta.id, "id_tomador": id_tomador})
         proposta.status = "aceita"
         if proposta.negociavel:
             proposta.negociavel = False
 
+        # Solicitação de tomador aceita por investidor: entra na carteira do investidor
+        entra_na_carteira = recem_aceita and proposta.autor_tipo == "tomador"
+        if entra_na_carteira:
+            PerfilCarteiraService.registrar_proposta(
+                db, id_investidor, proposta.valor, proposta.prazo_meses, proposta.taxa_min, proposta.taxa_max
+            )
+
         atualizacoes = {
             "status": "aceita",
             "id_tomador": id_tomador,
@@ -249,27 +274,38 @@ class PropostaService:
             "assinado_em": datetime.utcnow(),
         }
 
-        negociacao_atualizada = NegociacaoService.atualizar_negociacao(
-            db,
-            negociacao.id,
-            atualizacoes,
-        )
+        # Aceite, transferência, empréstimo e negociação num único commit
+        status_anterior = NegociacaoService.aplicar_atualizacao(db, negociacao, atualizacoes)
+        db.commit()
+
+        # Depois do commit: o aceite entra no histórico do autor
+        if recem_aceita:
+            invalidar_usuario(proposta.id_autor)
+        if entra_na_carteira:
+            PerfilCarteiraService.invalidar(id_investidor)
 
-        db.refresh(proposta)
-        return negociacao_atualizada
+        pool_candidatos.registrar(proposta)
+        if negociacao.status != status_anterior:
+            publicar_negociacao(negociacao, status_anterior)
+        if recem_aceita:
+            publicar_proposta("proposta_aceita", proposta, negociacao)
+        return negociacao
 
     @staticmethod
+    @detectar_conflito
     def recusar_proposta(
         db: Session,
         proposta_id: int,
         usuario_id: int,
         perfil: str,
+        versao: Optional[int] = None,
     ) -> Negociacao:
         """Recusa uma proposta e cancela a negociação associada."""
 
         proposta = db.query(Proposta).filter(Proposta.id == proposta_id).first()
         if not proposta:
             raise ValueError("Proposta não encontrada")
+        verificar_versao(proposta, versao)
 
         if perfil not in {"investidor", "tomador"}:
             raise ValueError("Perfil inválido para recusa")
@@ -286,7 +322,7 @@ class PropostaService:
         if proposta.id_negociacoes is None:
             raise ValueError("Proposta não vinculada a uma negociação")
 
-        negociacao = db.query(Negociacao).filter(Negociacao.id == proposta.id_negociacoes).first()
+        negociacao = db.get(Negociacao, proposta.id_negociacoes)
         if not negociacao:
             raise ValueError("Negociação vinculada não encontrada")
         if perfil == "investidor" and negociacao.id_investidor and negociacao.id_investidor != usuario_id:
@@ -302,62 +338,57 @@ class PropostaService:
             "atualizado_em": datetime.utcnow(),
         }
 
-        negociacao_atualizada = NegociacaoService.atualizar_negociacao(
-            db,
-            negociacao.id,
-            atualizacoes,
-        )
+        status_anterior = NegociacaoService.aplicar_atualizacao(db, negociacao, atualizacoes)
+        db.commit()
 
-        db.refresh(proposta)
-        return negociacao_atualizada
+        pool_candidatos.registrar(proposta)
+        if negociacao.status != status_anterior:
+            publicar_negociacao(negociacao, status_anterior)
+        publicar_proposta("proposta_recusada", proposta, negociacao)
+        return negociacao
 
     @staticmethod
     def get_propostas_recomendadas(
         db: Session,
         user_id: int,
-        perfil: str  # "investidor" ou "tomador"
-    ) -> List[Proposta]:
+        perfil: str,  # "investidor" ou "tomador"
+        limite: int = LIMITE_PADRAO,
+        cursor: Optional[str] = None,
+        diversidade: str = "exata",
+    ) -> Tuple[List[Proposta], Optional[str]]:
         """
-        Retorna propostas do tipo 'inicial' e status 'pendente' ordenadas por lógica de recomendação.
-        Para investidores: prioriza diversidade em relação à carteira.
-        Para tomadores: retorna todas ordenadas por data.
+        Retorna uma página de propostas do tipo 'inicial' e status 'pendente' ordenadas por lógica de
+        recomendação, e o cursor da próxima página (None na última).
+        Para investidores: prioriza diversidade em relação à carteira (ver app/services/ranking_propostas.py).
+        Para tomadores: retorna todas ordenadas por data, paginadas no banco.
         """
-        query = db.query(Proposta).filter(Proposta.tipo == "inicial", Proposta.status == "pendente")
-        propostas = query.all()
+        validar_limite(limite)
+        filtros = (Proposta.tipo == "inicial", Proposta.status == "pendente")
 
         if perfil == "investidor":
-            propostas_investidas = db.query(Proposta.valor, Proposta.prazo_meses, Proposta.taxa_sugerida).filter(Proposta.id_autor == user_id, Proposta.autor_tipo == "investidor").all()
-            valores_investidos = set([float(p[0]) for p in propostas_investidas if p[0] is not None])
-            prazos_investidos = set([int(p[1]) for p in propostas_investidas if p[1] is not None])
-            taxas_investidas = set()
-            for p in propostas_investidas:
-                if p[2] is not None:
-                    min_t, max_t = parse_taxa_range(p[2])
-                    taxas_investidas.add(round(min_t,2))
-                    taxas_investidas.add(round(max_t,2))
-
-            def diversidade_score(proposta: Proposta) -> float:
-                score = 0.0
-                if proposta.valor is not None and proposta.valor not in valores_investidos:
-                    score += 1.0
-                if proposta.prazo_meses is not None and proposta.prazo_meses not in prazos_investidos:
-                    score += 1.0
-                if proposta.taxa_sugerida is not None:
-                    try:
-                        min_t, max_t = parse_taxa_range(proposta.taxa_sugerida)
-                        if round(min_t,2) not in taxas_investidas:
-                            score += 0.5
-                        if round(max_t,2) not in taxas_investidas:
-                            score += 0.5
-                    except Exception:
-                        pass
-                return score
-
-            propostas_ordenadas = sorted(propostas, key=diversidade_score, reverse=True)
-            return propostas_ordenadas
+            carteira = PerfilCarteiraService.obter(db, user_id)
+            candidatos = pool_candidatos.obter(db)
+            pontos = pontuar(candidatos, carteira, diversidade)
+            apos = decodificar_cursor(cursor, 3) if cursor else None
+            indices = top_k(candidatos, pontos, limite + 1, apos)
+            chaves = [
+                (float(pontos[i]), int(candidatos.criado_em[i]), int(candidatos.ids[i]))
+                for i in indices
+            ]
+            chaves_pagina, proximo_cursor = fatiar_pagina(chaves, limite, lambda chave: chave)
+
+            # O pool pode estar atrasado em relação a outros workers: só devolve as que seguem abertas
+            ids_pagina = [chave[2] for chave in chaves_pagina]
+            por_id = {p.id: p for p in db.query(Proposta).filter(Proposta.id.in_(ids_pagina), *filtros)}
+            return [por_id[id_proposta] for id_proposta in ids_pagina if id_proposta in por_id], proximo_cursor
 
         # Para tomador, retorna todas ordenadas por data
-        return sorted(propostas, key=lambda p: p.criado_em, reverse=True)
+        chave = (Proposta.criado_em, Proposta.id)
+        query = db.query(Proposta).filter(*filtros)
+        if cursor:
+            query = query.filter(tuple_(*chave) < tuple_(*decodificar_cursor(cursor, len(chave))))
+        linhas = query.order_by(*(coluna.desc() for coluna in chave)).limit(limite + 1).all()
+        return fatiar_pagina(linhas, limite, lambda linha: (linha.criado_em, linha.id))
     
 
     @staticmethod
@@ -0,0 +1,266 @@
+"""
+Ranking de diversidade das propostas abertas (tipo 'inicial', status 'pendente') para investidores.
+
+As propostas abertas ficam em memória como colunas NumPy (id, valor, prazo, taxa mínima e máxima com
+2 casas, criado_em em microssegundos). O pool é atualizado na hora pelas operações deste worker
+(proposta criada, aceita ou recusada) e recarregado do banco a cada ``RECARGA_POOL`` segundos para
+incorporar as dos outros workers. Pontuar todas as propostas contra o perfil da carteira é uma
+passada vetorizada, e a página sai de ``argpartition`` (top-k) sem ordenar o pool inteiro.
+
+Modos de diversidade (em meios pontos, no máximo 6):
+  - ``exata``: +2 para valor e prazo fora da carteira, +1 para cada ponta da faixa de taxa fora das
+    taxas da carteira (igualdade exata, como antes);
+  - ``distancia``: os mesmos pesos multiplicados pela distância ao valor mais próximo da carteira,
+    normalizada e limitada a 1 (valor: diferença relativa / ``ESCALA_VALOR``; prazo: meses /
+    ``ESCALA_PRAZO``; taxa: pontos percentuais / ``ESCALA_TAXA``).
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.resumo_carteira import ResumoCarteira, arredondar_taxa
+
+
+MODOS_DIVERSIDADE = ("exata", "distancia")
+
+ESCALA_VALOR = 0.5
+ESCALA_PRAZO = 12.0
+ESCALA_TAXA = 0.5
+
+RECARGA_POOL = float(os.getenv("RANKING_POOL_RECARGA_S", "30"))
+
+_EPOCA = datetime(1970, 1, 1)
+_MICROSSEGUNDO = timedelta(microseconds=1)
+
+_ABERTAS_SQL = text(
+    """
+    SELECT p.id,
+           p.valor::float8,
+           p.prazo_meses,
+           ROUND(p.taxa_min::numeric, 2)::float8,
+           ROUND(p.taxa_max::numeric, 2)::float8,
+           p.criado_em
+    FROM propostas p
+    WHERE p.tipo = 'inicial' AND p.status = 'pendente'
+    """
+)
+
+
+def microssegundos(data: datetime) -> int:
+    return (data - _EPOCA) // _MICROSSEGUNDO
+
+
+def _coluna(valores, dtype=np.float64) -> np.ndarray:
+    return np.array([np.nan if valor is None else valor for valor in valores], dtype=dtype)
+
+
+@dataclass(frozen=True)
+class Candidatos:
+    """Colunas das propostas abertas (mesmo índice em todos os arrays; NaN onde o valor é nulo)."""
+
+    ids: np.ndarray
+    valores: np.ndarray
+    prazos: np.ndarray
+    taxas_min: np.ndarray
+    taxas_max: np.ndarray
+    criado_em: np.ndarray
+
+    @classmethod
+    def de_linhas(cls, linhas: Sequence[Tuple]) -> "Candidatos":
+        """Linhas (id, valor, prazo, taxa_min, taxa_max, criado_em), com as taxas já arredondadas."""
+        colunas = list(zip(*linhas)) if linhas else [()] * 6
+        return cls(
+            ids=np.array(colunas[0], dtype=np.int64),
+            valores=_coluna(colunas[1]),
+            prazos=_coluna(colunas[2]),
+            taxas_min=_coluna(colunas[3]),
+            taxas_max=_coluna(colunas[4]),
+            criado_em=np.array([microssegundos(data) for data in colunas[5]], dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def com(self, linha: Tuple) -> "Candidatos":
+        """Cópia com a proposta acrescentada (substituindo a de mesmo id)."""
+        base = self.sem(linha[0])
+        nova = Candidatos.de_linhas([linha])
+        return Candidatos(*(np.concatenate((getattr(base, campo), getattr(nova, campo))) for campo in self.__dataclass_fields__))
+
+    def sem(self, id_proposta: int) -> "Candidatos":
+        """Cópia sem a proposta (ou a própria instância se ela não está no pool)."""
+        manter = self.ids != id_proposta
+        if manter.all():
+            return self
+        return Candidatos(*(getattr(self, campo)[manter] for campo in self.__dataclass_fields__))
+
+
+def _distancia_mais_proxima(x: np.ndarray, referencia: np.ndarray) -> np.ndarray:
+    """Distância absoluta de cada x ao elemento mais próximo de ``referencia`` (ordenada, não vazia)."""
+    posicao = np.searchsorted(referencia, x)
+    esquerda = referencia[np.clip(posicao - 1, 0, len(referencia) - 1)]
+    direita = referencia[np.clip(posicao, 0, len(referencia) - 1)]
+    return np.minimum(np.abs(x - esquerda), np.abs(x - direita))
+
+
+def pontuar(candidatos: Candidatos, carteira: ResumoCarteira, modo: str = "exata") -> np.ndarray:
+    """Pontos de diversidade de cada candidato (0 a 6) em relação ao perfil da carteira."""
+    if modo not in MODOS_DIVERSIDADE:
+        raise ValueError(f"diversidade deve ser uma de {', '.join(MODOS_DIVERSIDADE)}")
+
+    def componente(coluna: np.ndarray, distintos, pontos: float, escala) -> np.ndarray:
+        presente = ~np.isnan(coluna)
+        referencia = np.array(sorted(distintos), dtype=np.float64)
+        if len(referencia) == 0:
+            return np.where(presente, pontos, 0.0)
+        if modo == "exata":
+            return np.where(presente & ~np.isin(coluna, referencia), pontos, 0.0)
+        distancia = _distancia_mais_proxima(np.where(presente, coluna, 0.0), referencia)
+        return np.where(presente, pontos * np.minimum(escala(coluna, distancia), 1.0), 0.0)
+
+    def relativa(coluna, distancia):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.nan_to_num(distancia / (np.abs(coluna) * ESCALA_VALOR), nan=0.0, posinf=1.0)
+
+    return (
+        componente(candidatos.valores, carteira.valores, 2.0, relativa)
+        + componente(candidatos.prazos, carteira.prazos, 2.0, lambda _, d: d / ESCALA_PRAZO)
+        + componente(candidatos.taxas_min, carteira.taxas, 1.0, lambda _, d: d / ESCALA_TAXA)
+        + componente(candidatos.taxas_max, carteira.taxas, 1.0, lambda _, d: d / ESCALA_TAXA)
+    )
+
+
+def _maiores(indices: np.ndarray, chave: np.ndarray, k: int) -> np.ndarray:
+    """Índices com ``chave`` maior ou igual à k-ésima maior (os empatados no corte entram todos)."""
+    if len(indices) <= k:
+        return indices
+    valores = chave[indices]
+    corte = valores[np.argpartition(-valores, k - 1)[k - 1]]
+    return indices[valores >= corte]
+
+
+def top_k(
+    candidatos: Candidatos,
+    pontos: np.ndarray,
+    k: int,
+    apos: Optional[Sequence] = None,
+) -> np.ndarray:
+    """
+    Índices dos k melhores candidatos na ordem (pontos, criado_em, id) decrescente, considerando só os
+    que vêm depois da chave ``apos`` (pontos, criado_em, id) nessa ordem.
+    """
+    indices = np.arange(len(candidatos))
+    if apos is not None:
+        pontos_apos, criado_apos, id_apos = apos
+        depois = (pontos < pontos_apos) | (
+            (pontos == pontos_apos)
+            & ((candidatos.criado_em < criado_apos) | ((candidatos.criado_em == criado_apos) & (candidatos.ids < id_apos)))
+        )
+        indices = indices[depois]
+
+    indices = _maiores(indices, pontos, k)
+    if len(indices) > k:
+        # Muitos empatados no ponto de corte: entre eles, ficam os mais recentes
+        corte = pontos[indices].min()
+        acima = indices[pontos[indices] > corte]
+        empatados = _maiores(indices[pontos[indices] == corte], candidatos.criado_em, k - len(acima))
+        indices = np.concatenate((acima, empatados))
+    ordem = np.lexsort((-candidatos.ids[indices], -candidatos.criado_em[indices], -pontos[indices]))
+    return indices[ordem][:k]
+
+
+def _aplicar(candidatos: Candidatos, id_proposta: int, linha: Optional[Tuple]) -> Candidatos:
+    """Candidatos com a proposta acrescentada (``linha``) ou retirada (``linha`` None)."""
+    return candidatos.sem(id_proposta) if linha is None else candidatos.com(linha)
+
+
+class PoolCandidatos:
+    """
+    Propostas abertas em colunas, compartilhadas pelas requisições do worker.
+
+    A recarga roda fora do lock e por uma requisição de cada vez; as outras seguem com o pool atual. As
+    alterações registradas enquanto a consulta da recarga roda são guardadas e reaplicadas sobre o
+    resultado antes da troca (aplicar de novo uma alteração que a consulta já viu não muda nada), para
+    que uma proposta criada ou fechada nesse intervalo não se perca até a recarga seguinte.
+    """
+
+    def __init__(self, recarga: float = RECARGA_POOL):
+        self.recarga = recarga
+        self._candidatos: Optional[Candidatos] = None
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+        self._recarga = threading.Lock()
+        # Alterações (id, linha ou None) registradas durante a recarga em curso; None fora dela
+        self._durante_recarga: Optional[List[Tuple[int, Optional[Tuple]]]] = None
+
+    def _atual(self) -> Optional[Candidatos]:
+        if self._candidatos is not None and time.monotonic() - self._carregado_em < self.recarga:
+            return self._candidatos
+        return None
+
+    def obter(self, db: Session) -> Candidatos:
+        """Pool atual; recarrega do banco se nunca foi carregado ou passou de ``recarga`` segundos."""
+        with self._lock:
+            atual = self._atual()
+        if atual is not None:
+            return atual
+
+        # Com um pool (mesmo vencido), quem não obtém a recarga segue com ele; sem pool, espera a carga
+        if not self._recarga.acquire(blocking=self._candidatos is None):
+            with self._lock:
+                return self._candidatos
+        try:
+            with self._lock:
+                atual = self._atual()
+                if atual is not None:
+                    return atual
+                self._durante_recarga = []
+            try:
+                candidatos = Candidatos.de_linhas(db.execute(_ABERTAS_SQL).fetchall())
+            except Exception:
+                with self._lock:
+                    self._durante_recarga = None
+                raise
+            with self._lock:
+                for id_proposta, linha in self._durante_recarga:
+                    candidatos = _aplicar(candidatos, id_proposta, linha)
+                self._durante_recarga = None
+                self._candidatos = candidatos
+                self._carregado_em = time.monotonic()
+            return candidatos
+        finally:
+            self._recarga.release()
+
+    def registrar(self, proposta) -> None:
+        """Reflete no pool o estado de uma proposta gravada (entra se estiver aberta, sai caso contrário)."""
+        linha = None
+        if proposta.tipo == "inicial" and proposta.status == "pendente":
+            linha = (
+                proposta.id,
+                None if proposta.valor is None else float(proposta.valor),
+                proposta.prazo_meses,
+                None if proposta.taxa_min is None else arredondar_taxa(proposta.taxa_min),
+                None if proposta.taxa_max is None else arredondar_taxa(proposta.taxa_max),
+                proposta.criado_em,
+            )
+        with self._lock:
+            if self._durante_recarga is not None:
+                self._durante_recarga.append((proposta.id, linha))
+            if self._candidatos is not None:
+                self._candidatos = _aplicar(self._candidatos, proposta.id, linha)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._candidatos = None
+
+
+# Pool do processo da API
+pool_candidatos = PoolCandidatos()
@@ -0,0 +1,33 @@
+"""
+Resumo da carteira de um investidor (valores, prazos e taxas distintos), base da pontuação de diversidade
+das recomendações. Sem dependência do banco: o armazenamento fica em app/services/perfil_carteira.py.
+"""
+
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import FrozenSet, Iterable, Tuple
+
+
+def arredondar_taxa(taxa: float) -> float:
+    """Taxa com 2 casas, arredondando como ``round(taxa::numeric, 2)`` no Postgres."""
+    return float(Decimal(repr(float(taxa))).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+@dataclass(frozen=True)
+class ResumoCarteira:
+    valores: FrozenSet[float] = frozenset()
+    prazos: FrozenSet[int] = frozenset()
+    taxas: FrozenSet[float] = frozenset()
+
+    def com(self, propostas: Iterable[Tuple[object, object, object, object]]) -> "ResumoCarteira":
+        """Resumo acrescido das propostas (valor, prazo, taxa_min, taxa_max)."""
+        valores, prazos, taxas = set(self.valores), set(self.prazos), set(self.taxas)
+        for valor, prazo, taxa_min, taxa_max in propostas:
+            if valor is not None:
+                valores.add(float(valor))
+            if prazo is not None:
+                prazos.add(int(prazo))
+            if taxa_min is not None and taxa_max is not None:
+                taxas.add(arredondar_taxa(taxa_min))
+                taxas.add(arredondar_taxa(taxa_max))
+        return ResumoCarteira(frozenset(valores), frozenset(prazos), frozenset(taxas))
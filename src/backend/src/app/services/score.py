@@ -1,6 +1,15 @@
+import hashlib
+import json
+
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+# Casas decimais das features no fingerprint; o tempo na plataforma cresce continuamente,
+# então entra em décimos de mês (~3 dias)
+CASAS_FINGERPRINT = 4
+CASAS_FINGERPRINT_TEMPO = 1
+
 def tempo_na_plataforma_meses(user_id: int, db: Session) -> float:
     """
     Calcula o tempo em meses que o usuário está na plataforma, baseado no campo criado_em da tabela usuarios.
@@ -27,7 +36,32 @@ def calcular_score_final(score_modelo: float, score_serasa: float, user_id: int,
         float: Score final
     """
     tempo_meses = float(tempo_na_plataforma_meses(user_id, db))
-    peso_serasa = max(0.1, 0.4 * (0.95 ** tempo_meses))
+    return int(combinar_scores(score_modelo, score_serasa, tempo_meses))
+
+def combinar_scores(score_modelo, score_serasa, tempo_meses):
+    """
+    Média ponderada modelo/Serasa; aceita escalares ou arrays NumPy (recálculo em lote).
+    O peso do Serasa decai com o tempo na plataforma, com piso de 10%.
+    Returns:
+        Score final truncado (int ou array de int)
+    """
+    peso_serasa = np.maximum(0.1, 0.4 * (0.95 ** np.asarray(tempo_meses, dtype=float)))
     peso_modelo = 1 - peso_serasa
-    score_final = score_modelo * peso_modelo + score_serasa * peso_serasa
-    return int(score_final)
+    score_final = np.asarray(score_modelo, dtype=float) * peso_modelo + np.asarray(score_serasa, dtype=float) * peso_serasa
+    return np.trunc(score_final).astype(int)
+
+def fingerprint_score(analise: dict, versao_modelo: str, cpf: str) -> str:
+    """
+    Hash (sha256) das entradas do score: features do ``analise`` quantizadas, versão do modelo e CPF
+    consultado no Serasa. Fingerprint igual ao gravado em ``scores_credito`` => mesmo resultado.
+    """
+    quantizada = {
+        chave: round(float(valor or 0.0), CASAS_FINGERPRINT_TEMPO if chave == "tempo_na_plataforma_meses" else CASAS_FINGERPRINT)
+        for chave, valor in analise.items()
+    }
+    conteudo = json.dumps(
+        {"analise": quantizada, "versao_modelo": versao_modelo, "cpf": cpf},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
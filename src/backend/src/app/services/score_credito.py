@@ -1,21 +1,30 @@
 """Serviços para consulta e cálculo dos scores de crédito."""
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
 
-from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from model.model_analise_credito import predict_default_probability, score_from_probability
+from model.model_analise_credito import (
+    model_version,
+    predict_default_probability,
+    score_from_probability,
+)
+from app.database.database import SessionLocal
 from app.models.score import ScoreCredito
-from app.services.api_score import montar_analise_usuario
-from app.services.score import calcular_score_final
+from app.services.features_credito import FeaturesCreditoService
+from app.services.score import combinar_scores, fingerprint_score
+from app.services.score_lote import ScoreLoteService
 from app.services.serasa import get_serasa_score
 
 
 class ScoreCreditoService:
     """Operações relacionadas aos scores de crédito."""
 
+    # Mesmo com entradas iguais, o score gravado é recalculado depois deste prazo (o Serasa muda)
+    VALIDADE_FINGERPRINT = timedelta(hours=float(os.getenv("SCORE_FINGERPRINT_VALIDADE_HORAS", "24")))
+
     @staticmethod
     def obter_por_usuario(db: Session, usuario_id: int) -> Optional[ScoreCredito]:
         return (
@@ -26,12 +35,20 @@ class ScoreCreditoService:
         )
 
     @staticmethod
-    def calcular_score_usuario(db: Session, usuario_id: int) -> Dict[str, Any]:
-        """Recalcula o score do usuário com base no modelo interno e dados externos."""
+    def calcular_score_usuario(db: Session, usuario_id: int, force: bool = False) -> Dict[str, Any]:
+        """
+        Recalcula o score do usuário com base no modelo interno e dados externos.
+
+        Se o fingerprint das entradas (features, versão do modelo e CPF) for igual ao do score gravado e
+        ele tiver menos de ``VALIDADE_FINGERPRINT``, devolve o registro gravado sem rodar o modelo,
+        consultar o Serasa ou escrever no banco. ``force=True`` sempre recalcula.
+        """
 
-        analise = montar_analise_usuario(usuario_id, db)
-        if not analise:
+        linhas = FeaturesCreditoService.linhas_features(db, usuario_id, usuario_id)
+        if not linhas:
             raise ValueError("Não foi possível montar a análise do usuário para cálculo de score")
+        analise = FeaturesCreditoService.analise_de_features(linhas[0])
+        cpf = linhas[0]["cpf"] or "00000000000"
 
         analise_normalizada: Dict[str, float] = {}
         for chave, valor in analise.items():
@@ -40,32 +57,45 @@ class ScoreCreditoService:
             else:
                 analise_normalizada[chave] = float(valor)
 
+        versao = model_version()
+        fingerprint = fingerprint_score(analise_normalizada, versao, cpf)
+
+        registro = ScoreCreditoService.obter_por_usuario(db, usuario_id)
+        if (
+            not force
+            and registro is not None
+            and registro.fingerprint == fingerprint
+            and registro.score_modelo is not None
+            and datetime.utcnow() - registro.atualizado_em < ScoreCreditoService.VALIDADE_FINGERPRINT
+        ):
+            return {
+                "score": registro,
+                "score_modelo": float(registro.score_modelo),
+                "score_serasa": float(registro.score_serasa),
+                "prob_default": float(registro.risco),
+                "analise": registro.analise,
+                "versao_modelo": versao,
+                "reaproveitado": True,
+            }
+
         prob_default = float(predict_default_probability(analise_normalizada))
         score_modelo = int(score_from_probability(prob_default))
+        score_serasa = float(get_serasa_score(cpf))
 
-        cpf = db.execute(
-            text("SELECT cpf FROM usuarios WHERE id = :usuario_id"),
-            {"usuario_id": usuario_id},
-        ).scalar()
-        score_serasa = float(get_serasa_score(cpf or "00000000000"))
-
-        valor_score = float(calcular_score_final(score_modelo, score_serasa, usuario_id, db))
+        valor_score = float(
+            combinar_scores(score_modelo, score_serasa, analise_normalizada["tempo_na_plataforma_meses"])
+        )
 
-        registro = ScoreCreditoService.obter_por_usuario(db, usuario_id)
         if registro is None:
-            registro = ScoreCredito(
-                id_usuarios=usuario_id,
-                valor_score=valor_score,
-                atualizado_em=datetime.utcnow(),
-                analise=analise_normalizada,
-                risco=prob_default,
-            )
+            registro = ScoreCredito(id_usuarios=usuario_id)
             db.add(registro)
-        else:
-            registro.valor_score = valor_score
-            registro.atualizado_em = datetime.utcnow()
-            registro.analise = analise_normalizada
-            registro.risco = prob_default
+        registro.valor_score = valor_score
+        registro.atualizado_em = datetime.utcnow()
+        registro.analise = analise_normalizada
+        registro.risco = prob_default
+        registro.fingerprint = fingerprint
+        registro.score_modelo = score_modelo
+        registro.score_serasa = score_serasa
 
         db.commit()
         db.refresh(registro)
@@ -76,17 +106,21 @@ class ScoreCreditoService:
             "score_serasa": score_serasa,
             "prob_default": prob_default,
             "analise": analise_normalizada,
+            "versao_modelo": versao,
+            "reaproveitado": False,
         }
 
     @staticmethod
-    def recalcular_todos(db: Session) -> List[Dict[str, Any]]:
-        """Executa o recálculo de score para todos os usuários cadastrados."""
-
-        usuarios_ids = list(db.execute(text("SELECT id FROM usuarios")).scalars())
-        resultados: List[Dict[str, Any]] = []
-
-        for usuario_id in usuarios_ids:
-            resultado = ScoreCreditoService.calcular_score_usuario(db, usuario_id)
-            resultados.append(resultado)
-
-        return resultados
+    def recalcular_em_fluxo(tamanho_lote: Optional[int] = None, tamanho_inicial: int = 16) -> Iterator[Dict[str, Any]]:
+        """
+        Recalcula todos os scores gerando um resultado por usuário assim que o lote dele é gravado.
+        Abre a própria sessão (a da requisição já foi fechada quando a resposta em streaming começa) e
+        mantém em memória apenas o lote corrente.
+        """
+
+        db = SessionLocal()
+        try:
+            for lote in ScoreLoteService.iterar_lotes(db, tamanho_lote=tamanho_lote, tamanho_inicial=tamanho_inicial):
+                yield from lote
+        finally:
+            db.close()
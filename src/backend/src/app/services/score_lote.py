@@ -0,0 +1,161 @@
+"""
+Motor de recálculo de score em lote.
+
+Lê a matriz de features de um intervalo de usuários do armazenamento incremental (features_credito),
+pontua o lote com uma única chamada vetorizada ao modelo e grava ``scores_credito`` com um upsert
+em massa, com commit por lote.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from model.model_analise_credito import (
+    FEATURE_COLUMNS,
+    model_version,
+    predict_default_probabilities,
+)
+from app.models.score import ScoreCredito
+from app.services.features_credito import FeaturesCreditoService
+from app.services.score import combinar_scores, fingerprint_score
+from app.services.serasa import get_serasa_scores
+
+
+class ScoreLoteService:
+    """Recálculo de scores por intervalos de ``usuarios.id``."""
+
+    TAMANHO_LOTE = int(os.getenv("SCORE_TAMANHO_LOTE", "1000"))
+
+    @staticmethod
+    def carregar_features(db: Session, id_inicio: int, id_fim: int) -> pd.DataFrame:
+        """
+        Retorna um DataFrame indexado por id do usuário com as colunas de ``FEATURE_COLUMNS`` e ``cpf``,
+        para todos os usuários com id em [id_inicio, id_fim], lidos do armazenamento de features.
+        """
+        linhas = FeaturesCreditoService.linhas_features(db, id_inicio, id_fim)
+
+        df = pd.DataFrame(
+            [FeaturesCreditoService.analise_de_features(linha) for linha in linhas],
+            index=pd.Index([linha["id"] for linha in linhas], name="id"),
+            columns=FEATURE_COLUMNS,
+        ).astype(float)
+        df["cpf"] = [linha["cpf"] for linha in linhas]
+        return df
+
+    @staticmethod
+    def pontuar_lote(db: Session, id_inicio: int, id_fim: int) -> List[Dict[str, Any]]:
+        """Pontua e grava (upsert) todos os usuários de [id_inicio, id_fim], sem commit."""
+
+        features = ScoreLoteService.carregar_features(db, id_inicio, id_fim)
+        if features.empty:
+            return []
+
+        prob_default = predict_default_probabilities(features[FEATURE_COLUMNS])
+        scores_modelo = np.round(1000 * (1 - prob_default)).astype(int)
+        cpfs = [cpf or "00000000000" for cpf in features["cpf"]]
+        serasa_por_cpf = get_serasa_scores(cpfs)
+        scores_serasa = np.array([float(serasa_por_cpf[cpf]) for cpf in cpfs], dtype=float)
+        valores_score = combinar_scores(scores_modelo, scores_serasa, features["tempo_na_plataforma_meses"].to_numpy())
+
+        agora = datetime.utcnow()
+        versao = model_version()
+        analises = features[FEATURE_COLUMNS].to_dict(orient="records")
+        linhas = [
+            {
+                "id_usuarios": int(usuario_id),
+                "valor_score": float(valor_score),
+                "atualizado_em": agora,
+                "analise": analise,
+                "risco": float(prob),
+                "fingerprint": fingerprint_score(analise, versao, cpf),
+                "score_modelo": float(score_modelo),
+                "score_serasa": float(score_serasa),
+            }
+            for usuario_id, valor_score, analise, prob, cpf, score_modelo, score_serasa in zip(
+                features.index, valores_score, analises, prob_default, cpfs, scores_modelo, scores_serasa
+            )
+        ]
+
+        stmt = insert(ScoreCredito.__table__).values(linhas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ScoreCredito.id_usuarios],
+            set_={
+                "valor_score": stmt.excluded.valor_score,
+                "atualizado_em": stmt.excluded.atualizado_em,
+                "analise": stmt.excluded.analise,
+                "risco": stmt.excluded.risco,
+                "fingerprint": stmt.excluded.fingerprint,
+                "score_modelo": stmt.excluded.score_modelo,
+                "score_serasa": stmt.excluded.score_serasa,
+            },
+        ).returning(*ScoreCredito.__table__.columns)
+
+        registros = {row.id_usuarios: dict(row._mapping) for row in db.execute(stmt)}
+
+        return [
+            {
+                "score": registros[linha["id_usuarios"]],
+                "score_modelo": float(score_modelo),
+                "score_serasa": float(score_serasa),
+                "prob_default": linha["risco"],
+                "analise": linha["analise"],
+                "versao_modelo": versao,
+            }
+            for linha, score_modelo, score_serasa in zip(linhas, scores_modelo, scores_serasa)
+        ]
+
+    @staticmethod
+    def processar_lote(db: Session, id_inicio: int, id_fim: int) -> List[Dict[str, Any]]:
+        """Pontua e grava todos os usuários de [id_inicio, id_fim]; faz um commit ao final do lote."""
+        resultados = ScoreLoteService.pontuar_lote(db, id_inicio, id_fim)
+        db.commit()
+        return resultados
+
+    @staticmethod
+    def proximos_ids(db: Session, ultimo_id: Optional[int], id_fim: Optional[int], limite: int) -> List[int]:
+        """Próximos ``limite`` ids de usuário após ``ultimo_id`` (até ``id_fim``), em ordem crescente."""
+        return list(db.execute(
+            text(
+                """
+                SELECT id FROM usuarios
+                WHERE (CAST(:ultimo_id AS INT) IS NULL OR id > :ultimo_id)
+                    AND (CAST(:id_fim AS INT) IS NULL OR id <= :id_fim)
+                ORDER BY id
+                LIMIT :limite
+                """
+            ),
+            {"ultimo_id": ultimo_id, "id_fim": id_fim, "limite": limite},
+        ).scalars())
+
+    @staticmethod
+    def iterar_lotes(
+        db: Session,
+        id_inicio: Optional[int] = None,
+        id_fim: Optional[int] = None,
+        tamanho_lote: Optional[int] = None,
+        tamanho_inicial: Optional[int] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Percorre os usuários em ordem de id, em lotes de ``tamanho_lote``, gerando o resultado de cada lote.
+        Com ``tamanho_inicial``, o primeiro lote tem esse tamanho e os seguintes dobram até ``tamanho_lote``
+        (o primeiro resultado sai rápido sem abrir mão da vetorização nos lotes seguintes).
+        """
+
+        tamanho_lote = tamanho_lote or ScoreLoteService.TAMANHO_LOTE
+        tamanho_atual = min(tamanho_inicial or tamanho_lote, tamanho_lote)
+        ultimo_id = (id_inicio - 1) if id_inicio is not None else None
+
+        while True:
+            ids = ScoreLoteService.proximos_ids(db, ultimo_id, id_fim, tamanho_atual)
+            if not ids:
+                return
+
+            yield ScoreLoteService.processar_lote(db, ids[0], ids[-1])
+            ultimo_id = ids[-1]
+            tamanho_atual = min(tamanho_atual * 2, tamanho_lote)
@@ -1,17 +1,209 @@
-import requests
+"""
+Cliente do bureau de crédito (Serasa).
+
+Sem ``SERASA_API_URL`` configurada, mantém o mock do hackathon (score aleatório). Com a URL, as consultas
+usam uma sessão HTTP keep-alive compartilhada, cache TTL por CPF, lotes com concorrência limitada,
+timeouts e circuit breaker, para que a latência do bureau não se multiplique em cada score/lote.
+
+Variáveis de ambiente:
+    SERASA_API_URL            URL base; a consulta é ``POST {url}/score`` com ``{"cpf": ...}`` -> ``{"score": int}``
+    SERASA_TIMEOUT_CONEXAO    timeout de conexão em segundos (padrão 1)
+    SERASA_TIMEOUT_LEITURA    timeout de leitura em segundos (padrão 2)
+    SERASA_CONCORRENCIA       máximo de requisições simultâneas por processo (padrão 8)
+    SERASA_CACHE_TTL          validade do score em cache, em segundos (padrão 3600)
+"""
+
+import os
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.cache import CacheTTL
+
+
+class SerasaIndisponivelError(RuntimeError):
+    """Bureau fora do ar, lento demais, com resposta inválida ou com o circuito aberto."""
+
+
+class CircuitBreaker:
+    """
+    Após ``limite_falhas`` falhas seguidas, abre o circuito e recusa chamadas por ``tempo_aberto``
+    segundos; depois deixa passar uma chamada de teste (meio-aberto) que fecha ou reabre o circuito.
+    """
+
+    def __init__(self, limite_falhas: int = 5, tempo_aberto: float = 30.0):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self._falhas_seguidas = 0
+        self._aberto_ate: Optional[float] = None
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._aberto_ate is None:
+                return "fechado"
+            return "aberto" if time.monotonic() < self._aberto_ate else "meio-aberto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._aberto_ate is None:
+                return True
+            if time.monotonic() < self._aberto_ate or self._teste_em_andamento:
+                return False
+            self._teste_em_andamento = True
+            return True
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self._falhas_seguidas = 0
+            self._aberto_ate = None
+            self._teste_em_andamento = False
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._falhas_seguidas += 1
+            self._teste_em_andamento = False
+            if self._aberto_ate is not None or self._falhas_seguidas >= self.limite_falhas:
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+
+
+_AUSENTE = object()
+
+
+class ClienteSerasa:
+    """Cliente HTTP do bureau com pool de conexões, cache por CPF e concorrência limitada."""
+
+    def __init__(
+        self,
+        url_base: str,
+        timeout: Tuple[float, float] = (1.0, 2.0),
+        concorrencia: int = 8,
+        cache: Optional[CacheTTL] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url_score = url_base.rstrip("/") + "/score"
+        self.timeout = timeout
+        self.cache = cache or CacheTTL(max_itens=100000, ttl=3600.0)
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=concorrencia, max_retries=0)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self._executor = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="serasa")
+
+    def _requisitar(self, cpf: str) -> int:
+        if not self.breaker.permitir():
+            raise SerasaIndisponivelError("Serasa indisponível (circuito aberto)")
+
+        try:
+            resposta = self.session.post(self.url_score, json={"cpf": cpf}, timeout=self.timeout)
+        except requests.RequestException as exc:
+            self.breaker.registrar_falha()
+            raise SerasaIndisponivelError(f"Falha ao consultar o Serasa: {exc}") from exc
+
+        if resposta.status_code >= 500:
+            self.breaker.registrar_falha()
+            raise SerasaIndisponivelError(f"Serasa respondeu {resposta.status_code}")
+
+        # 4xx é erro da consulta, não do bureau: não conta para o circuito
+        self.breaker.registrar_sucesso()
+        try:
+            resposta.raise_for_status()
+            return int(resposta.json()["score"])
+        except (requests.HTTPError, ValueError, KeyError, TypeError) as exc:
+            raise SerasaIndisponivelError(f"Resposta inválida do Serasa para o CPF: {exc}") from exc
+
+    def consultar(self, cpf: str) -> int:
+        return self.cache.obter_ou_calcular(cpf, lambda: self._requisitar(cpf))
+
+    def consultar_lote(self, cpfs: Iterable[str]) -> Dict[str, int]:
+        """
+        Score de cada CPF distinto. Os que não estão em cache são consultados em paralelo (no máximo
+        ``concorrencia`` por vez). Se alguma consulta falhar, as bem-sucedidas ficam no cache e a primeira
+        falha é propagada.
+        """
+        resultado: Dict[str, int] = {}
+        pendentes = []
+        for cpf in dict.fromkeys(cpfs):
+            score = self.cache.obter(cpf, _AUSENTE)
+            if score is _AUSENTE:
+                pendentes.append(cpf)
+            else:
+                resultado[cpf] = score
+
+        futuros = {cpf: self._executor.submit(self._requisitar, cpf) for cpf in pendentes}
+        erro: Optional[SerasaIndisponivelError] = None
+        for cpf, futuro in futuros.items():
+            try:
+                score = futuro.result()
+            except SerasaIndisponivelError as exc:
+                erro = erro or exc
+                continue
+            self.cache.definir(cpf, score)
+            resultado[cpf] = score
+
+        if erro is not None:
+            raise erro
+        return resultado
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_cliente: Optional[ClienteSerasa] = None
+_cliente_lock = threading.Lock()
+
+
+def obter_cliente() -> Optional[ClienteSerasa]:
+    """Cliente compartilhado do processo, ou ``None`` quando ``SERASA_API_URL`` não está configurada (mock)."""
+    global _cliente
+    if _cliente is None:
+        url = os.getenv("SERASA_API_URL")
+        if not url:
+            return None
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = ClienteSerasa(
+                    url,
+                    timeout=(
+                        float(os.getenv("SERASA_TIMEOUT_CONEXAO", "1")),
+                        float(os.getenv("SERASA_TIMEOUT_LEITURA", "2")),
+                    ),
+                    concorrencia=int(os.getenv("SERASA_CONCORRENCIA", "8")),
+                    cache=CacheTTL(max_itens=100000, ttl=float(os.getenv("SERASA_CACHE_TTL", "3600"))),
+                )
+    return _cliente
+
 
 def get_serasa_score(cpf: str) -> int:
     """
-    Mock da chamada à API do Serasa. Substitua por integração real depois.
+    Score do Serasa (0-1000) do CPF.
     Args:
         cpf (str): CPF do usuário
     Returns:
         int: Score do Serasa (0-1000)
+    Raises:
+        SerasaIndisponivelError: bureau indisponível (somente com ``SERASA_API_URL`` configurada)
     """
-    # Exemplo de chamada real:
-    # response = requests.post('https://api.serasa.com/score', json={'cpf': cpf}, headers={...})
-    # score = response.json().get('score', 0)
-    # return score
-    # Mock para hackathon:
-    return random.randint(300, 900)
+    cliente = obter_cliente()
+    if cliente is None:
+        # Mock para hackathon:
+        return random.randint(300, 900)
+    return cliente.consultar(cpf)
+
+
+def get_serasa_scores(cpfs: Iterable[str]) -> Dict[str, int]:
+    """Versão em lote de ``get_serasa_score``: retorna ``{cpf: score}`` para cada CPF distinto."""
+    cliente = obter_cliente()
+    if cliente is None:
+        return {cpf: random.randint(300, 900) for cpf in dict.fromkeys(cpfs)}
+    return cliente.consultar_lote(cpfs)
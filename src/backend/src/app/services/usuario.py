@@ -104,8 +104,28 @@ class UsuarioService:
         if valor is None or valor <= 0:
             return
 
-        UsuarioService.ajustar_saldo(db, investidor_id, -valor)
-        UsuarioService.ajustar_saldo(db, tomador_id, valor)
+        # Trava as duas contas numa consulta, sempre em ordem de id: transferências simultâneas em
+        # sentidos opostos entre os mesmos usuários esperam uma pela outra em vez de travarem (deadlock)
+        usuarios = {
+            usuario.id: usuario
+            for usuario in db.query(Usuario)
+            .filter(Usuario.id.in_((investidor_id, tomador_id)))
+            .order_by(Usuario.id)
+            .with_for_update()
+            .populate_existing()
+        }
+        for usuario_id in (investidor_id, tomador_id):
+            if usuario_id not in usuarios:
+                raise ValueError(f"Usuário {usuario_id} não encontrado para ajuste de saldo.")
+
+        investidor, tomador = usuarios[investidor_id], usuarios[tomador_id]
+        ajuste = Decimal(str(valor))
+        saldo_investidor = Decimal(str(investidor.saldo_cc or 0)) - ajuste
+        if saldo_investidor < Decimal("0"):
+            raise ValueError(f"Usuário {investidor_id} não possui saldo suficiente para a operação.")
+
+        investidor.saldo_cc = float(saldo_investidor)
+        tomador.saldo_cc = float(Decimal(str(tomador.saldo_cc or 0)) + ajuste)
         
 
     @staticmethod
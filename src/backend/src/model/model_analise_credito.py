@@ -9,11 +9,59 @@ import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 import joblib
+import json
+import logging
 import os
+import tempfile
+from datetime import datetime
+
+try:
+	from model.model_numpy import MotorLogisticoNumpy, amostra_validacao
+	from model.model_registry import ModelRegistry
+except ImportError:  # execução direta do script a partir de src/model
+	from model_numpy import MotorLogisticoNumpy, amostra_validacao
+	from model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
 
 
 MODEL_PATH = "../app/model/model_credit.joblib"
 SCALER_PATH = "../app/model/scaler_credit.joblib"
+# Cada versão em versoes/<versao>/; o manifesto aponta a publicada (par avulso acima só sem manifesto)
+DIRETORIO_VERSOES = os.path.join(os.path.dirname(MODEL_PATH), "versoes")
+MANIFESTO_PATH = os.path.join(os.path.dirname(MODEL_PATH), "atual.json")
+
+# Ordem das features do dict ``analise`` usada no treino
+FEATURE_COLUMNS = [
+	"tempo_na_plataforma_meses",
+	"emprestimos_contratados",
+	"emprestimos_quitados",
+	"emprestimos_inadimplentes",
+	"taxa_inadimplencia",
+	"media_taxa_juros_paga",
+	"media_prazo_contratado",
+	"renda_mensal",
+	"endividamento_estimado",
+	"propostas_realizadas",
+	"propostas_aceitas",
+	"media_tempo_negociacao_dias",
+]
+
+def _preparar_motor(model, scaler):
+	"""
+	Exporta o par carregado para o motor NumPy e confere contra o sklearn; se o modelo não for
+	uma regressão logística compatível ou divergir, a inferência segue pelo sklearn.
+	"""
+	try:
+		motor = MotorLogisticoNumpy.de_sklearn(model, scaler, FEATURE_COLUMNS)
+		motor.validar(model, scaler, amostra_validacao(scaler, FEATURE_COLUMNS))
+	except (AttributeError, ValueError) as exc:
+		logger.warning("Motor NumPy desativado, usando sklearn: %s", exc)
+		return None
+	return motor
+
+# Artefatos carregados uma vez por worker e recarregados quando mudam em disco
+registry = ModelRegistry(MODEL_PATH, SCALER_PATH, preparar=_preparar_motor, manifesto_path=MANIFESTO_PATH)
 
 def train_model(df: pd.DataFrame, label_col: str = "default"):
 	"""
@@ -30,22 +78,57 @@ def train_model(df: pd.DataFrame, label_col: str = "default"):
 	save_artifacts(model, scaler)
 	return model, scaler
 
+def gravar_versao(model, scaler) -> str:
+	"""Grava o par num diretório novo em ``versoes/`` (sem publicar) e retorna o diretório."""
+	versao = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+	diretorio = os.path.join(DIRETORIO_VERSOES, versao)
+	os.makedirs(diretorio, exist_ok=False)
+	joblib.dump(model, os.path.join(diretorio, os.path.basename(MODEL_PATH)))
+	joblib.dump(scaler, os.path.join(diretorio, os.path.basename(SCALER_PATH)))
+	return diretorio
+
+def publicar_versao(diretorio: str):
+	"""
+	Aponta o manifesto para a versão do diretório: grava em arquivo temporário no mesmo diretório e
+	troca com um único os.replace (atômico), então o registro vê o par antigo ou o novo, nunca misturado.
+	"""
+	base = os.path.dirname(os.path.abspath(MANIFESTO_PATH))
+	manifesto = {
+		"versao": os.path.basename(os.path.normpath(diretorio)),
+		"diretorio": os.path.relpath(os.path.abspath(diretorio), base),
+		"modelo": os.path.basename(MODEL_PATH),
+		"scaler": os.path.basename(SCALER_PATH),
+	}
+	fd, tmp_path = tempfile.mkstemp(dir=base, suffix=".tmp")
+	try:
+		with os.fdopen(fd, "w", encoding="utf-8") as arquivo:
+			json.dump(manifesto, arquivo)
+		os.replace(tmp_path, MANIFESTO_PATH)
+	except Exception:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		raise
+
 def save_artifacts(model, scaler):
-	joblib.dump(model, MODEL_PATH)
-	joblib.dump(scaler, SCALER_PATH)
+	publicar_versao(gravar_versao(model, scaler))
 
 def load_artifacts():
-	if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-		raise FileNotFoundError("Modelo ou scaler não encontrado. Treine antes.")
-	model = joblib.load(MODEL_PATH)
-	scaler = joblib.load(SCALER_PATH)
-	return model, scaler
+	artefatos = registry.get()
+	return artefatos.model, artefatos.scaler
+
+def model_version() -> str:
+	"""Versão (hash do conteúdo) dos artefatos atualmente carregados."""
+	return registry.get().versao
 
 def predict_default_probability(analise: dict):
 	"""
 	Recebe o dict do campo analise do backend, retorna probabilidade de default.
 	"""
-	model, scaler = load_artifacts()
+	artefatos = registry.get()
+	if artefatos.motor is not None:
+		return artefatos.motor.probabilidade(analise)
+
+	model, scaler = artefatos.model, artefatos.scaler
 	# Limpa NaN/None do dict analise
 	for k, v in analise.items():
 		if v is None or (isinstance(v, float) and np.isnan(v)):
@@ -55,6 +138,20 @@ def predict_default_probability(analise: dict):
 	prob_default = model.predict_proba(X_scaled)[0][1]
 	return prob_default
 
+def predict_default_probabilities(X: pd.DataFrame) -> np.ndarray:
+	"""
+	Versão em lote: recebe um DataFrame com uma linha por usuário (colunas FEATURE_COLUMNS)
+	e retorna o array de probabilidades de default numa única chamada ao modelo.
+	"""
+	artefatos = registry.get()
+	if artefatos.motor is not None:
+		return artefatos.motor.probabilidades(X[FEATURE_COLUMNS].to_numpy(dtype=float))
+
+	model, scaler = artefatos.model, artefatos.scaler
+	X = X[FEATURE_COLUMNS].astype(float).fillna(0.0)
+	X_scaled = scaler.transform(X)
+	return model.predict_proba(X_scaled)[:, 1]
+
 def score_from_probability(prob_default: float) -> int:
 	"""
 	Converte probabilidade de default para score (0-1000)
@@ -0,0 +1,94 @@
+"""
+Inferência da regressão logística em NumPy puro.
+
+O StandardScaler é embutido nos coeficientes (w' = w / escala, b' = b - soma(w * média / escala)),
+então pontuar uma linha é um produto escalar seguido da sigmoide, sem DataFrame nem sklearn no caminho.
+A equivalência com ``scaler.transform`` + ``model.predict_proba`` é conferida na carga do modelo.
+"""
+
+from typing import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# Diferença máxima aceita entre as probabilidades do motor NumPy e as do sklearn
+TOLERANCIA = 1e-9
+
+
+def _sigmoide(z):
+	# Forma com tanh: estável para |z| grande, sem overflow em exp
+	return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+class MotorLogisticoNumpy:
+	"""Pesos e intercepto já com a padronização embutida, em ordem fixa de colunas."""
+
+	def __init__(self, pesos: np.ndarray, intercepto: float, colunas: Sequence[str]):
+		self.pesos = np.ascontiguousarray(pesos, dtype=np.float64)
+		self.intercepto = float(intercepto)
+		self.colunas = tuple(colunas)
+		self._indice = {coluna: i for i, coluna in enumerate(self.colunas)}
+
+	@classmethod
+	def de_sklearn(cls, model, scaler, colunas: Sequence[str]) -> "MotorLogisticoNumpy":
+		"""Exporta um par StandardScaler + LogisticRegression binária para a ordem ``colunas``."""
+		coef = np.asarray(model.coef_, dtype=np.float64)
+		if coef.shape[0] != 1:
+			raise ValueError("Apenas regressão logística binária é suportada")
+		coef = coef[0]
+
+		n = coef.shape[0]
+		media = np.zeros(n) if not getattr(scaler, "with_mean", True) or scaler.mean_ is None else scaler.mean_
+		escala = np.ones(n) if not getattr(scaler, "with_std", True) or scaler.scale_ is None else scaler.scale_
+
+		# O scaler pode ter sido treinado com outra ordem de colunas: alinha pelos nomes
+		nomes = getattr(scaler, "feature_names_in_", None)
+		ordem = [list(nomes).index(coluna) for coluna in colunas] if nomes is not None else list(range(n))
+		if len(ordem) != n:
+			raise ValueError("Quantidade de colunas diferente da usada no treino")
+
+		pesos = coef / escala
+		intercepto = float(model.intercept_[0]) - float(np.dot(pesos, media))
+		return cls(pesos[ordem], intercepto, colunas)
+
+	def vetor(self, analise: Mapping[str, object]) -> np.ndarray:
+		"""Converte o dict ``analise`` para o vetor na ordem das colunas (None/NaN viram 0)."""
+		x = np.array([analise.get(coluna) or 0.0 for coluna in self.colunas], dtype=np.float64)
+		return np.nan_to_num(x, nan=0.0, copy=False)
+
+	def probabilidade(self, analise: Mapping[str, object]) -> float:
+		"""Probabilidade de default de uma linha."""
+		return float(_sigmoide(self.vetor(analise) @ self.pesos + self.intercepto))
+
+	def probabilidades(self, X: np.ndarray) -> np.ndarray:
+		"""Probabilidades de default de N linhas (matriz N x colunas, já na ordem de ``colunas``)."""
+		X = np.nan_to_num(np.asarray(X, dtype=np.float64), nan=0.0)
+		return _sigmoide(X @ self.pesos + self.intercepto)
+
+	def validar(self, model, scaler, X: np.ndarray, tolerancia: float = TOLERANCIA) -> float:
+		"""
+		Compara com o sklearn numa amostra (matriz na ordem de ``colunas``) e retorna a maior diferença.
+		Levanta ValueError se passar de ``tolerancia``.
+		"""
+		X = np.asarray(X, dtype=np.float64)
+		nomes = getattr(scaler, "feature_names_in_", None)
+		if nomes is not None:
+			X_sklearn = pd.DataFrame(X[:, [self._indice[nome] for nome in nomes]], columns=list(nomes))
+		else:
+			X_sklearn = X
+		esperado = model.predict_proba(scaler.transform(X_sklearn))[:, 1]
+		diferenca = float(np.max(np.abs(esperado - self.probabilidades(X))))
+		if diferenca > tolerancia:
+			raise ValueError(f"Motor NumPy diverge do sklearn em {diferenca:.3e} (tolerância {tolerancia:.0e})")
+		return diferenca
+
+
+def amostra_validacao(scaler, colunas: Sequence[str], linhas: int = 64, semente: int = 0) -> np.ndarray:
+	"""Linhas sintéticas em torno da distribuição de treino (média ± 3 desvios), na ordem ``colunas``."""
+	nomes = getattr(scaler, "feature_names_in_", None)
+	ordem = [list(nomes).index(coluna) for coluna in colunas] if nomes is not None else list(range(len(colunas)))
+	media = np.zeros(len(ordem)) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)[ordem]
+	escala = np.ones(len(ordem)) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)[ordem]
+	gerador = np.random.default_rng(semente)
+	return media + escala * gerador.uniform(-3.0, 3.0, size=(linhas, len(colunas)))
@@ -0,0 +1,146 @@
+"""
+Registro em memória dos artefatos do modelo de crédito (modelo + scaler).
+Carrega os arquivos joblib uma única vez por worker, versiona o par carregado pelo hash
+do conteúdo e faz hot-reload atômico quando o par publicado muda em disco. Um hook opcional
+(``preparar``) deriva estruturas de inferência do par carregado, publicadas junto com ele.
+
+O par publicado é o do manifesto (``atual.json``): cada versão fica no seu diretório, que não muda
+depois de gravado, e a publicação troca só o manifesto (um ``os.replace``), de modo que modelo e
+scaler sempre vêm da mesma versão. Sem manifesto, usa os dois arquivos avulsos (imagem inicial).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+
+
+@dataclass(frozen=True)
+class ArtefatosModelo:
+	"""Par modelo/scaler carregado, imutável enquanto estiver publicado no registro."""
+
+	model: Any
+	scaler: Any
+	versao: str
+	assinatura: Tuple
+	caminhos: Tuple[str, str]
+	carregado_em: datetime = field(default_factory=datetime.utcnow)
+	motor: Any = None
+
+
+class ModelRegistry:
+	"""
+	Mantém os artefatos do modelo em memória.
+
+	A cada acesso compara a assinatura do par publicado (versão do manifesto ou, sem manifesto,
+	(mtime, tamanho) dos arquivos) com a carregada; a checagem é limitada a uma vez por
+	``intervalo_checagem`` segundos. Se mudou, calcula o hash do conteúdo e, apenas se o hash for
+	diferente, carrega o novo par e o publica com uma única atribuição.
+	"""
+
+	def __init__(
+		self,
+		model_path: str,
+		scaler_path: str,
+		intervalo_checagem: float = 2.0,
+		preparar: Optional[Callable[[Any, Any], Any]] = None,
+		manifesto_path: Optional[str] = None,
+	):
+		self.model_path = model_path
+		self.scaler_path = scaler_path
+		self.manifesto_path = manifesto_path
+		self.intervalo_checagem = intervalo_checagem
+		self.preparar = preparar
+		self._artefatos: Optional[ArtefatosModelo] = None
+		self._ultima_checagem = 0.0
+		self._lock = threading.Lock()
+
+	def _resolver(self) -> Tuple[Tuple, Tuple[str, str]]:
+		"""Assinatura e caminhos (modelo, scaler) do par publicado."""
+		if self.manifesto_path and os.path.exists(self.manifesto_path):
+			with open(self.manifesto_path, encoding="utf-8") as arquivo:
+				manifesto = json.load(arquivo)
+			diretorio = os.path.join(os.path.dirname(self.manifesto_path), manifesto["diretorio"])
+			caminhos = (os.path.join(diretorio, manifesto["modelo"]), os.path.join(diretorio, manifesto["scaler"]))
+			return ("manifesto", manifesto["versao"]), caminhos
+
+		if not os.path.exists(self.model_path) or not os.path.exists(self.scaler_path):
+			raise FileNotFoundError("Modelo ou scaler não encontrado. Treine antes.")
+		stat_model = os.stat(self.model_path)
+		stat_scaler = os.stat(self.scaler_path)
+		assinatura = (
+			(stat_model.st_mtime_ns, stat_model.st_size),
+			(stat_scaler.st_mtime_ns, stat_scaler.st_size),
+		)
+		return assinatura, (self.model_path, self.scaler_path)
+
+	@staticmethod
+	def _calcular_versao(caminhos: Tuple[str, str]) -> str:
+		digest = hashlib.sha256()
+		for caminho in caminhos:
+			with open(caminho, "rb") as arquivo:
+				for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+					digest.update(bloco)
+		return digest.hexdigest()[:12]
+
+	def _carregar(self, assinatura, caminhos: Tuple[str, str], tentativas: int = 3) -> ArtefatosModelo:
+		for _ in range(tentativas):
+			versao = self._calcular_versao(caminhos)
+			atual = self._artefatos
+			if atual is not None and atual.versao == versao:
+				# Publicação sem mudança de conteúdo: só atualiza a assinatura
+				return replace(atual, assinatura=assinatura, caminhos=caminhos)
+
+			model = joblib.load(caminhos[0])
+			scaler = joblib.load(caminhos[1])
+
+			# Sem manifesto, um arquivo trocado durante a leitura pode misturar o par: lê de novo
+			assinatura_final, caminhos_finais = self._resolver()
+			if assinatura_final == assinatura:
+				motor = self.preparar(model, scaler) if self.preparar is not None else None
+				return ArtefatosModelo(model, scaler, versao, assinatura, caminhos, motor=motor)
+			assinatura, caminhos = assinatura_final, caminhos_finais
+
+		raise RuntimeError("Artefatos do modelo mudaram durante o carregamento. Tente novamente.")
+
+	def get(self) -> ArtefatosModelo:
+		"""Retorna os artefatos atuais, recarregando se os arquivos mudaram em disco."""
+		artefatos = self._artefatos
+		agora = time.monotonic()
+		if artefatos is not None and agora - self._ultima_checagem < self.intervalo_checagem:
+			return artefatos
+
+		with self._lock:
+			artefatos = self._artefatos
+			if artefatos is not None and agora - self._ultima_checagem < self.intervalo_checagem:
+				return artefatos
+			assinatura, caminhos = self._resolver()
+			if artefatos is None or artefatos.assinatura != assinatura:
+				artefatos = self._carregar(assinatura, caminhos)
+				self._artefatos = artefatos
+			self._ultima_checagem = time.monotonic()
+			return artefatos
+
+	def recarregar(self) -> ArtefatosModelo:
+		"""Força a releitura da assinatura do par publicado no próximo acesso."""
+		with self._lock:
+			self._ultima_checagem = 0.0
+		return self.get()
+
+	def info(self) -> Dict[str, Any]:
+		"""Informações da versão carregada (para diagnóstico/API)."""
+		artefatos = self.get()
+		return {
+			"versao": artefatos.versao,
+			"carregado_em": artefatos.carregado_em,
+			"model_path": os.path.abspath(artefatos.caminhos[0]),
+			"scaler_path": os.path.abspath(artefatos.caminhos[1]),
+			"modelo": type(artefatos.model).__name__,
+			"motor": type(artefatos.motor).__name__ if artefatos.motor is not None else None,
+		}
@@ -0,0 +1,226 @@
+"""
+Treino do modelo de crédito em streaming a partir do banco de produção.
+
+Lê as linhas rotuladas (features do ``analise`` no instante de corte, com as mesmas regras do score, +
+rótulo de default na janela seguinte, sem vazar o desfecho para as features) em blocos com cursor no
+servidor.
+Uma primeira passada ajusta o StandardScaler com ``partial_fit``; as passadas seguintes (épocas) ajustam
+uma regressão logística via SGDClassifier(log_loss) com ``partial_fit``. A memória depende do tamanho
+do bloco, não do histórico. A separação treino/teste é por hash do id do usuário (estável entre épocas e
+entre treinos). Cada treino grava uma versão em ``versoes/<versao>/`` (modelo, scaler e metricas.json);
+com ``--promover`` o manifesto passa a apontar a versão e o ModelRegistry recarrega sozinho.
+
+Uso (a partir de src, com DATABASE_URL apontando para o banco):
+	python -m model.treino_streaming --lote 5000 --epocas 5 --corte 2025-01-01 --janela-dias 180 --promover
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import text
+
+from app.models.features_credito import CONTADORES_FEATURES
+from app.services.features_credito import FeaturesCreditoService, contribuicoes_sql
+from model.model_analise_credito import FEATURE_COLUMNS, gravar_versao, publicar_versao
+
+# Percentual dos usuários (por hash do id) reservado para avaliação
+PERCENTUAL_TESTE = 20
+
+# Janela padrão do rótulo: empréstimos encerrados nos últimos JANELA_DIAS dias
+JANELA_DIAS = 180
+
+# Linhas rotuladas no instante ``corte``: as features são as do score (mesmas regras por negociação de
+# app/services/features_credito.py), aplicadas ao estado do banco no corte, e o rótulo vem dos
+# empréstimos contratados antes do corte e encerrados na janela [corte, fim): 1 se algum terminou
+# inadimplente. Sem histórico de status, a data do desfecho é o atualizado_em da negociação. Entram os
+# tomadores com ao menos um empréstimo encerrado na janela.
+LINHAS_ROTULADAS_SQL = text(
+	f"""
+	WITH alvo AS (
+		SELECT u.id,
+		       EXTRACT(EPOCH FROM (CAST(:corte AS timestamp) - u.criado_em)) / 2629800.0 AS tempo_na_plataforma_meses,
+		       COALESCE(u.renda_mensal, 0) AS renda_mensal
+		FROM usuarios u
+		WHERE u.criado_em < :corte
+	),
+	desfecho AS (
+		SELECT n.id_tomador AS id,
+		       COUNT(*) FILTER (WHERE n.status = 'inadimplente') AS inadimplentes
+		FROM negociacoes n
+		WHERE n.assinado_em < :corte
+		  AND n.status IN ('quitado', 'inadimplente')
+		  AND n.atualizado_em >= :corte AND n.atualizado_em < :fim
+		GROUP BY n.id_tomador
+	),
+	contribuicoes AS (
+		{contribuicoes_sql("n.id_tomador IN (SELECT id FROM desfecho)", no_corte=True)}
+	),
+	agregados AS (
+		SELECT c.id_tomador AS id,
+		       {", ".join(f"SUM(c.{coluna})::float AS {coluna}" for coluna in CONTADORES_FEATURES)},
+		       MIN(c.primeira_proposta_em) AS primeira_proposta_em
+		FROM contribuicoes c
+		GROUP BY c.id_tomador
+	)
+	SELECT a.id,
+	       a.tempo_na_plataforma_meses,
+	       a.renda_mensal,
+	       {", ".join(f"COALESCE(g.{coluna}, 0) AS {coluna}" for coluna in CONTADORES_FEATURES)},
+	       g.primeira_proposta_em,
+	       (d.inadimplentes > 0)::int AS rotulo
+	FROM alvo a
+	JOIN desfecho d ON d.id = a.id
+	LEFT JOIN agregados g ON g.id = a.id
+	ORDER BY a.id
+	"""
+)
+
+
+def _em_teste(ids: np.ndarray) -> np.ndarray:
+	# Hash multiplicativo (Knuth) do id: separação estável e sem correlação com a ordem de cadastro
+	return (ids.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) % 100 < PERCENTUAL_TESTE
+
+
+def iterar_blocos(
+	conexao, tamanho_lote: int, corte: datetime, fim: datetime
+) -> Iterator[Tuple[pd.DataFrame, np.ndarray, np.ndarray]]:
+	"""Gera (X, y, máscara de teste) por bloco de ``tamanho_lote`` linhas, lidas com cursor no servidor."""
+	resultado = conexao.execution_options(stream_results=True, yield_per=tamanho_lote).execute(
+		LINHAS_ROTULADAS_SQL,
+		{"corte": corte, "fim": fim},
+	)
+	for linhas in resultado.mappings().partitions():
+		X = pd.DataFrame([FeaturesCreditoService.analise_de_features(linha) for linha in linhas], columns=FEATURE_COLUMNS).astype(float).fillna(0.0)
+		y = np.fromiter((linha["rotulo"] for linha in linhas), dtype=np.int64, count=len(linhas))
+		ids = np.fromiter((linha["id"] for linha in linhas), dtype=np.int64, count=len(linhas))
+		yield X, y, _em_teste(ids)
+
+
+def treinar_streaming(
+	engine,
+	tamanho_lote: int = 5000,
+	epocas: int = 5,
+	semente: int = 42,
+	corte: Optional[datetime] = None,
+	janela_dias: int = JANELA_DIAS,
+):
+	"""
+	Treina scaler e modelo sem materializar o dataset. Retorna (model, scaler, metricas).
+	``corte`` (padrão: agora menos a janela) separa features (antes) e rótulo (janela depois).
+	Levanta ValueError se não houver linhas de treino com as duas classes.
+	"""
+	inicio = time.perf_counter()
+	janela = timedelta(days=janela_dias)
+	corte = corte or datetime.utcnow() - janela
+	fim = corte + janela
+	scaler = StandardScaler()
+	linhas_treino = linhas_teste = positivos_treino = 0
+	with engine.connect() as conexao:
+		for X, y, teste in iterar_blocos(conexao, tamanho_lote, corte, fim):
+			treino = ~teste
+			if treino.any():
+				scaler.partial_fit(X[treino])
+			linhas_treino += int(treino.sum())
+			linhas_teste += int(teste.sum())
+			positivos_treino += int(y[treino].sum())
+
+	if linhas_treino == 0 or positivos_treino in (0, linhas_treino):
+		raise ValueError("O treino precisa de linhas rotuladas das duas classes (quitado e inadimplente)")
+
+	classes = np.array([0, 1])
+	gerador = np.random.default_rng(semente)
+	model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=semente)
+	for _ in range(epocas):
+		with engine.connect() as conexao:
+			for X, y, teste in iterar_blocos(conexao, tamanho_lote, corte, fim):
+				treino = np.flatnonzero(~teste)
+				if treino.size == 0:
+					continue
+				gerador.shuffle(treino)
+				model.partial_fit(scaler.transform(X.iloc[treino]), y[treino], classes=classes)
+
+	# Avaliação: só rótulo e probabilidade das linhas de teste ficam em memória
+	y_teste, prob_teste = [], []
+	with engine.connect() as conexao:
+		for X, y, teste in iterar_blocos(conexao, tamanho_lote, corte, fim):
+			if teste.any():
+				y_teste.append(y[teste])
+				prob_teste.append(model.predict_proba(scaler.transform(X[teste]))[:, 1])
+
+	metricas: Dict[str, Any] = {
+		"modelo": "SGDClassifier(log_loss)",
+		"corte": corte.isoformat(),
+		"janela_dias": janela_dias,
+		"epocas": epocas,
+		"tamanho_lote": tamanho_lote,
+		"linhas_treino": linhas_treino,
+		"linhas_teste": linhas_teste,
+		"taxa_default_treino": round(positivos_treino / linhas_treino, 4),
+		"acuracia_teste": None,
+		"auc_teste": None,
+		"log_loss_teste": None,
+	}
+	if y_teste:
+		y_teste = np.concatenate(y_teste)
+		prob_teste = np.concatenate(prob_teste)
+		metricas["acuracia_teste"] = round(float(accuracy_score(y_teste, prob_teste >= 0.5)), 4)
+		metricas["log_loss_teste"] = round(float(log_loss(y_teste, prob_teste, labels=classes)), 4)
+		if len(np.unique(y_teste)) == 2:
+			metricas["auc_teste"] = round(float(roc_auc_score(y_teste, prob_teste)), 4)
+	metricas["duracao_s"] = round(time.perf_counter() - inicio, 2)
+	return model, scaler, metricas
+
+
+def salvar_versao(model, scaler, metricas: Dict[str, Any]) -> str:
+	"""Grava modelo, scaler e metricas.json em ``versoes/<versao>/`` e retorna o diretório."""
+	diretorio = gravar_versao(model, scaler)
+	versao = os.path.basename(diretorio)
+	metricas = {"versao": versao, "treinado_em": datetime.utcnow().isoformat(), "features": FEATURE_COLUMNS, **metricas}
+	with open(os.path.join(diretorio, "metricas.json"), "w", encoding="utf-8") as arquivo:
+		json.dump(metricas, arquivo, ensure_ascii=False, indent=2)
+	return diretorio
+
+
+def promover_versao(diretorio: str) -> None:
+	"""Publica a versão como artefato de produção (troca atômica do manifesto)."""
+	publicar_versao(diretorio)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--lote", type=int, default=5000, help="linhas por bloco lido do banco")
+	parser.add_argument("--epocas", type=int, default=5)
+	parser.add_argument("--promover", action="store_true", help="publica a versão como artefato de produção")
+	parser.add_argument("--auc-minima", type=float, default=0.0, help="não promove se a AUC de teste ficar abaixo")
+	parser.add_argument("--corte", type=datetime.fromisoformat, default=None,
+		help="data de corte (AAAA-MM-DD): features antes dela, rótulo na janela seguinte (padrão: hoje menos a janela)")
+	parser.add_argument("--janela-dias", type=int, default=JANELA_DIAS, help="janela do rótulo após o corte")
+	args = parser.parse_args()
+
+	from app.database.database import engine
+
+	print("[INFO] Treinando modelo em streaming a partir do banco...")
+	model, scaler, metricas = treinar_streaming(
+		engine, tamanho_lote=args.lote, epocas=args.epocas, corte=args.corte, janela_dias=args.janela_dias
+	)
+	diretorio = salvar_versao(model, scaler, metricas)
+	print(f"[INFO] Versão salva em {diretorio}")
+	print(json.dumps(metricas, ensure_ascii=False, indent=2))
+
+	if args.promover:
+		if metricas["auc_teste"] is None:
+			print("[INFO] AUC de teste não calculada (teste sem as duas classes): versão não promovida.")
+		elif metricas["auc_teste"] < args.auc_minima:
+			print(f"[INFO] AUC {metricas['auc_teste']} abaixo de {args.auc_minima}: versão não promovida.")
+		else:
+			promover_versao(diretorio)
+			print("[INFO] Versão promovida para produção.")
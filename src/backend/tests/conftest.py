@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os testes importam o pacote ``app`` de src/, como a API e os benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,108 @@
+"""
+Testes do ranking de recomendações (app/services/ranking_propostas.py), sem banco.
+
+Uso (a partir de src/backend):
+    python -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.paginacao import decodificar_cursor, fatiar_pagina
+from app.services.ranking_propostas import Candidatos, PoolCandidatos, pontuar, top_k
+from app.services.resumo_carteira import ResumoCarteira, arredondar_taxa
+
+
+def gerar_linhas(quantidade, semente):
+    """Linhas (id, valor, prazo, taxa_min, taxa_max, criado_em) com muitos empates e alguns nulos."""
+    rng = np.random.default_rng(semente)
+    inicio = datetime(2025, 1, 1)
+    linhas = []
+    for id_proposta in rng.permutation(np.arange(1, quantidade + 1)):
+        taxa_min = round(float(rng.choice([1.0, 1.5, 2.0])), 1)
+        linhas.append((
+            int(id_proposta),
+            None if rng.random() < 0.05 else float(rng.choice([1000, 5000, 10000])),
+            None if rng.random() < 0.05 else int(rng.choice([12, 24])),
+            arredondar_taxa(taxa_min),
+            arredondar_taxa(taxa_min + float(rng.choice([0.5, 1.0]))),
+            # Poucos instantes distintos: empates em (pontos, criado_em) desempatados pelo id
+            inicio + timedelta(minutes=int(rng.integers(0, 5))),
+        ))
+    return linhas
+
+
+def paginar(candidatos, pontos, limite):
+    """Percorre as páginas como PropostaService.get_propostas_recomendadas, passando pelo cursor opaco."""
+    paginas, cursor = [], None
+    while True:
+        apos = decodificar_cursor(cursor, 3) if cursor else None
+        indices = top_k(candidatos, pontos, limite + 1, apos)
+        chaves = [(float(pontos[i]), int(candidatos.criado_em[i]), int(candidatos.ids[i])) for i in indices]
+        pagina, proximo = fatiar_pagina(chaves, limite, lambda chave: chave)
+        paginas.append([chave[2] for chave in pagina])
+        if proximo is None:
+            return paginas
+        cursor = proximo
+
+
+@pytest.mark.parametrize("modo", ["exata", "distancia"])
+@pytest.mark.parametrize("limite", [1, 3, 7, 60, 200])
+def test_paginas_do_top_k_reproduzem_a_ordenacao_completa(modo, limite):
+    candidatos = Candidatos.de_linhas(gerar_linhas(60, semente=limite))
+    carteira = ResumoCarteira().com([(5000, 12, 1.5, 2.0), (1000, 24, 1.0, 2.0)])
+    pontos = pontuar(candidatos, carteira, modo)
+
+    esperado = sorted(
+        range(len(candidatos)),
+        key=lambda i: (pontos[i], candidatos.criado_em[i], candidatos.ids[i]),
+        reverse=True,
+    )
+    paginas = paginar(candidatos, pontos, limite)
+
+    assert [id_proposta for pagina in paginas for id_proposta in pagina] == candidatos.ids[esperado].tolist()
+    assert all(len(pagina) == limite for pagina in paginas[:-1])
+    assert 0 < len(paginas[-1]) <= limite
+
+
+def test_top_k_sem_candidatos():
+    candidatos = Candidatos.de_linhas([])
+    assert top_k(candidatos, pontuar(candidatos, ResumoCarteira()), 10).tolist() == []
+
+
+class _SessaoRecarga:
+    """Sessão falsa: a consulta da recarga devolve ``linhas`` e, enquanto roda, executa ``durante``."""
+
+    def __init__(self, linhas, durante):
+        self.linhas, self.durante = linhas, durante
+
+    def execute(self, _consulta):
+        self.durante()
+        return SimpleNamespace(fetchall=lambda: self.linhas)
+
+
+def _proposta(linha, status="pendente"):
+    id_proposta, valor, prazo, taxa_min, taxa_max, criado_em = linha
+    return SimpleNamespace(
+        id=id_proposta, tipo="inicial", status=status, valor=valor, prazo_meses=prazo,
+        taxa_min=taxa_min, taxa_max=taxa_max, criado_em=criado_em,
+    )
+
+
+def test_recarga_preserva_alteracoes_registradas_durante_a_consulta():
+    linhas = gerar_linhas(5, semente=1)
+    criada = (99,) + linhas[0][1:]
+    pool = PoolCandidatos(recarga=0)
+    pool.obter(_SessaoRecarga(linhas, lambda: None))
+
+    # A consulta não vê a proposta criada nem o fechamento de linhas[1], feitos enquanto ela roda
+    def durante():
+        pool.registrar(_proposta(criada))
+        pool.registrar(_proposta(linhas[1], status="aceita"))
+
+    candidatos = pool.obter(_SessaoRecarga(linhas, durante))
+
+    assert sorted(candidatos.ids.tolist()) == sorted([99] + [linha[0] for linha in linhas if linha is not linhas[1]])